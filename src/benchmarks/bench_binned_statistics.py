@@ -0,0 +1,105 @@
+# Benchmark of the aggregations behind the large-data mode of plot_scatter_matrix, plot_gg and plot_histograms
+# (pair_histograms, binned_kde, correlation_matrix, stratified_sample) on a synthetic movie table. They are
+# checked against np.histogram/np.histogram2d, scipy's gaussian_kde (the KDE of seaborn, on a sample) and
+# pearsonr, and compared with the per-point work of the default mode. Peak memory is measured in a fresh
+# process (before the checks), with and without the aggregations.
+#
+# Usage: python src/benchmarks/bench_binned_statistics.py [n_rows] [kde_rows]
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from bench_utils import measure_in_subprocess
+from binned_statistics import binned_kde, correlation_matrix, pair_histograms, stratified_sample
+
+COLUMNS = ["log_budget", "log_revenue", "log_numVotes_imdb", "averageRating_imdb", "runtime"]
+
+def synthetic_movies(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "log_budget": rng.normal(15, 2, n_rows),
+        "log_numVotes_imdb": rng.gamma(4, 1.5, n_rows),
+        "averageRating_imdb": np.clip(rng.normal(6.2, 1.1, n_rows), 1, 10),
+        "runtime": rng.lognormal(4.5, 0.25, n_rows),
+        "decade": rng.choice([1950, 1970, 1990, 2010], n_rows, p=[0.1, 0.2, 0.3, 0.4]),
+    })
+    df["log_revenue"] = 0.9*df["log_budget"] + rng.normal(2, 1.5, n_rows)
+    df.loc[rng.random(n_rows) < 0.2, "log_revenue"] = np.nan
+    return df
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+def aggregations(df):
+    # Everything the large-data plots compute, for all the columns
+    counts, edges = pair_histograms(df, COLUMNS)
+    densities = [binned_kde(df, col) for col in COLUMNS]
+    corr, p_values = correlation_matrix(df, COLUMNS)
+    return counts, edges, densities, corr, p_values
+
+def build_only(n_rows):
+    return len(synthetic_movies(n_rows))
+
+def build_and_aggregate(n_rows):
+    aggregations(synthetic_movies(n_rows))
+    return n_rows
+
+def check(df, kde_rows):
+    counts, edges, densities, corr, p_values = aggregations(df)
+    complete = df[COLUMNS].dropna()
+    for i, x in enumerate(COLUMNS):
+        expected, expected_edges = np.histogram(df[x].dropna(), bins=100)
+        assert (counts[x] == expected).all() and np.allclose(edges[x], expected_edges)
+        for y in COLUMNS[i + 1:]:
+            pair = df[[x, y]].dropna()
+            expected, _, _ = np.histogram2d(pair[x], pair[y], bins=[edges[x], edges[y]])
+            assert (counts[(x, y)] == expected).all()
+            r, p = stats.pearsonr(complete[x], complete[y])
+            np.testing.assert_allclose([corr.loc[x, y], p_values.loc[x, y]], [r, p], rtol=1e-8, atol=1e-12)
+
+    # The binned KDE is compared with the exact one on a sample (same bandwidth rule)
+    sample = df.sample(kde_rows, random_state=0)
+    for col in COLUMNS:
+        grid, density = binned_kde(sample, col)
+        kde_time, expected = timed(stats.gaussian_kde(sample[col].dropna()), grid)
+        error = np.abs(density - expected).max()/expected.max()
+        assert error < 1e-3, (col, error)
+    print(f"binned KDE within {error:.1e} of gaussian_kde ({kde_rows} rows, {kde_time:.2f} s per column)")
+
+    strata = stratified_sample(df, 10_000, "decade")["decade"].value_counts(normalize=True)
+    np.testing.assert_allclose(strata.sort_index(), df["decade"].value_counts(normalize=True).sort_index(), atol=1e-3)
+
+def run(n_rows=10_000_000, kde_rows=100_000):
+    # Measured first, so that the forked processes do not inherit the memory of the checks
+    _, base_peak, _ = measure_in_subprocess(build_only, n_rows)
+    _, peak, _ = measure_in_subprocess(build_and_aggregate, n_rows)
+    print(f"peak memory: data {base_peak:.0f} MB, data + aggregations {peak:.0f} MB")
+
+    df = synthetic_movies(n_rows)
+    check(df, kde_rows)
+    print(f"rows: {n_rows}, same histograms, correlations and p-values as numpy/scipy")
+
+    pair_time, _ = timed(pair_histograms, df, COLUMNS)
+    kde_time, _ = timed(lambda: [binned_kde(df, col) for col in COLUMNS])
+    corr_time, _ = timed(correlation_matrix, df, COLUMNS)
+    pearson_time, _ = timed(lambda: [stats.pearsonr(*df[[x, y]].dropna().T.to_numpy())
+                                     for i, x in enumerate(COLUMNS) for y in COLUMNS[i + 1:]])
+    n_pairs = len(COLUMNS)*(len(COLUMNS) - 1)//2
+    print(f"scatter matrix: {n_pairs} 2D histograms in {pair_time:.2f} s "
+          f"(instead of {n_pairs*2*n_rows/1e6:.0f}M scatter points)")
+    print(f"diagonal: {len(COLUMNS)} binned KDEs in {kde_time:.2f} s")
+    print(f"correlations: one covariance matrix {corr_time:.2f} s, one pearsonr per pair {pearson_time:.2f} s")
+
+if __name__ == "__main__":
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    kde_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    run(n_rows, kde_rows)
@@ -0,0 +1,61 @@
+# Benchmark of the vectorized bootstrap (resampling.py) against a loop drawing one replicate
+# at a time. Checks that replicates do not depend on the number of processes and that the
+# two approaches agree on the confidence intervals.
+#
+# Usage: python src/benchmarks/bench_bootstrap.py [n_replicates] [n_jobs]
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from data_utils import bootstrap
+from resampling import bootstrap_ci, bootstrap_replicates, confidence_interval
+
+def loop_diff_of_means(x, y, n_replicates, seed):
+    rng = np.random.default_rng(seed)
+    return np.array([rng.choice(x, len(x)).mean() - rng.choice(y, len(y)).mean() for _ in range(n_replicates)])
+
+def compare(x, y, n_replicates, n_jobs):
+
+    start = time.perf_counter()
+    reference = loop_diff_of_means(x, y, n_replicates, 0)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    replicates = bootstrap_replicates((x, y), "diff_means", n_replicates, seed=0)
+    vectorized_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parallel = bootstrap_replicates((x, y), "diff_means", n_replicates, seed=0, n_jobs=n_jobs)
+    parallel_time = time.perf_counter() - start
+
+    # Same replicates whatever the number of processes, same interval as the loop up to Monte Carlo error
+    assert np.array_equal(replicates, parallel)
+    lower, upper = confidence_interval(replicates)
+    ref_lower, ref_upper = confidence_interval(reference)
+    tolerance = 0.05*(ref_upper - ref_lower)
+    assert abs(lower - ref_lower) < tolerance and abs(upper - ref_upper) < tolerance
+
+    print(f"replicates: {n_replicates}, samples of {len(x)} and {len(y)} observations")
+    print(f"loop:                    {loop_time:.2f} s")
+    print(f"index matrix:            {vectorized_time:.2f} s")
+    print(f"index matrix, {n_jobs} processes: {parallel_time:.2f} s")
+    print(f"difference of means: 95% CI [{lower:.1f}, {upper:.1f}] (loop [{ref_lower:.1f}, {ref_upper:.1f}])")
+
+def run(n_replicates=10_000, n_jobs=2):
+    rng = np.random.default_rng(0)
+    for n in [50, 3_000]:
+        compare(rng.lognormal(9.6, 1, n), rng.lognormal(9.3, 1, n + n//5), n_replicates, n_jobs)
+
+    x, y = rng.normal(size=100), rng.normal(size=120)
+    result = bootstrap_ci(x, "median", n_replicates, seed=0)
+    assert result["lower"] <= result["estimate"] <= result["upper"]
+    shortest, longest = bootstrap(x, y)
+    assert len(shortest) == len(longest) == len(y)
+
+if __name__ == "__main__":
+    run(*(int(x) for x in sys.argv[1:3]))
@@ -0,0 +1,126 @@
+# Benchmark of compute_cast_features against the per-feature cells of results.ipynb (groupby.agg with Python
+# functions, value_counts dictionaries and apply lambdas) on a synthetic movie x person table, and of the
+# cached load from the dataset store. Features are checked to be equal.
+#
+# Usage: python src/benchmarks/bench_cast_features.py [n_movies] [CACHE_PATH]
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from cast_features import CAST_FEATURES, compute_cast_features, load_cast_features
+from data_utils import compute_age
+from dataset_store import DatasetStore
+
+COUNTRIES = ["United States of America", "France", "Germany", "Italy", "Japan", "India", "Canada", "Spain"]
+
+# Previous implementation (results.ipynb), kept as reference
+def cast_features_notebook(complete_df):
+    movies_complete = pd.DataFrame({"freebase_id_movie": complete_df["freebase_id_movie"].unique()})
+
+    mean_age_df = compute_age(complete_df, 'year_of_birth', 'release_year', 'age_at_release')
+    mean_age_df = mean_age_df.dropna(subset = 'age_at_release')
+    mean_age_df = mean_age_df.groupby('freebase_id_movie').agg( mean_age=('age_at_release','mean'),
+                                                                       std_age=('age_at_release','std')).reset_index()
+    movies_complete = pd.merge(movies_complete, mean_age_df, how="left", on="freebase_id_movie")
+
+    def shannon_entropy(data):
+        values, counts = np.unique(data, return_counts=True)
+        freq = counts / counts.sum()
+        return stats.entropy(freq, base=2)
+
+    entropies_df = complete_df[complete_df.role != "director"].dropna(subset="country").groupby(by="freebase_id_movie").agg(
+        cast_country_count=('country', pd.Series.nunique),
+        cast_country_entropy=('country', shannon_entropy)
+    ).reset_index()
+    movies_complete = pd.merge(movies_complete, entropies_df, how="left", on="freebase_id_movie")
+
+    def gender_balance_score(data):
+        if len(data) < 4:
+            return pd.NA
+        values, counts = np.unique(data, return_counts=True)
+        freq_dict = dict(zip(values, counts / counts.sum()))
+        return freq_dict["F"] if "F" in freq_dict.keys() else 0.
+
+    gender_scores_df = complete_df[complete_df.role != "director"].dropna(subset="gender") \
+                .groupby(by="freebase_id_movie").agg({'gender': gender_balance_score}).reset_index()
+    gender_scores_dict = dict(zip(gender_scores_df.iloc[:, 0], gender_scores_df.iloc[:, 1]))
+    movies_complete["female_score"] = movies_complete.freebase_id_movie.apply(lambda x: gender_scores_dict[x] if x in gender_scores_dict.keys() else pd.NA)
+    movies_complete["female_score"] = pd.to_numeric(movies_complete["female_score"], errors='coerce')
+    movies_complete["gender_score"] = movies_complete["female_score"].apply(lambda x: pd.NA if pd.isna(x) else 2*abs(x-0.5))
+    movies_complete["gender_score"] = pd.to_numeric(movies_complete["gender_score"], errors='coerce')
+
+    for role, name, mask in [("director", "director_fame", complete_df.role == "director"),
+                             ("actor", "actor_fame", complete_df.role != "director")]:
+        num_dict = (complete_df[mask][["freebase_id_movie", "univocal_id_actor"]]
+                        .drop_duplicates()["univocal_id_actor"].value_counts().to_dict())
+        complete_df[name] = complete_df.univocal_id_actor.apply(lambda x: num_dict[x] if x in num_dict.keys() else 0)
+        num_df = complete_df.groupby(by="freebase_id_movie").agg({name: 'max'}).reset_index()
+        num_dict = dict(zip(num_df.iloc[:, 0], num_df.iloc[:, 1]))
+        movies_complete[name] = movies_complete.freebase_id_movie.apply(lambda x: num_dict[x] if x in num_dict.keys() else 0).replace(0, 1)
+        movies_complete[name + "_bool"] = movies_complete[name] > 1
+    return movies_complete
+
+def synthetic_cast(n_movies, seed=0):
+    rng = np.random.default_rng(seed)
+    n_people = n_movies*3
+    n_rows = n_movies*12
+    movie = rng.integers(0, n_movies, n_rows)
+    person = rng.zipf(1.6, n_rows) % n_people
+    df = pd.DataFrame({
+        "freebase_id_movie": pd.Series([f"/m/{i:07d}" for i in movie], dtype=object),
+        "univocal_id_actor": pd.Series([f"p{i}" for i in person], dtype=object).where(rng.random(n_rows) >= 0.02),
+        "role": np.where(rng.random(n_rows) < 0.1, "director", "actor"),
+        "release_year": (1920 + movie % 100).astype(float),
+        "year_of_birth": np.where(rng.random(n_rows) < 0.3, np.nan, 1880 + person % 130),
+        "country": pd.Series(np.array(COUNTRIES)[person % len(COUNTRIES)], dtype=object).where(rng.random(n_rows) >= 0.4),
+        "gender": pd.Series(np.where(person % 3 == 0, "F", "M"), dtype=object).where(rng.random(n_rows) >= 0.2),
+    })
+    # Movies without cast after the left merges
+    df.loc[df["univocal_id_actor"].isna(), ["role", "year_of_birth", "country", "gender"]] = np.nan
+    return df
+
+def run(n_movies=20_000, cache_path=None):
+    df = synthetic_cast(n_movies)
+
+    start = time.perf_counter()
+    reference = cast_features_notebook(df.copy())
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    features = compute_cast_features(df)
+    fast_time = time.perf_counter() - start
+
+    features = features.set_index("freebase_id_movie").loc[reference["freebase_id_movie"]].reset_index()
+    for col in CAST_FEATURES:
+        if features[col].dtype == bool:
+            assert (features[col] == reference[col]).all(), col
+        else:
+            assert np.allclose(features[col].astype(float), reference[col].astype(float), equal_nan=True), col
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = cache_path or tmp
+        source_path = os.path.join(cache_path, "cast_table.pkl")
+        df.to_pickle(source_path)
+        store = DatasetStore(cache_path)
+        build = lambda: pd.read_pickle(source_path)
+        load_cast_features(store, [source_path], build)
+        start = time.perf_counter()
+        cached = load_cast_features(store, [source_path], build)
+        cached_time = time.perf_counter() - start
+        assert len(cached) == len(features)
+
+    print(f"rows: {len(df)}, movies: {len(features)}")
+    print(f"notebook cells:        {reference_time:.2f} s")
+    print(f"compute_cast_features: {fast_time:.3f} s ({reference_time/fast_time:.0f}x)")
+    print(f"cached load:           {cached_time:.3f} s")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000, sys.argv[2] if len(sys.argv) > 2 else None)
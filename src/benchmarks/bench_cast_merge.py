@@ -0,0 +1,131 @@
+# Benchmark of merge_casts against the per-movie loop previously used in
+# cast_dataset_generation.ipynb, on synthetic Wikidata/MovieSummaries casts.
+# The two implementations must return the same rows.
+#
+# Usage: python src/benchmarks/bench_cast_merge.py [n_movies]
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from auxiliary_functions_for_merging import create_key_series, merge_casts
+
+NAMES = np.array(["Tom Hanks", "Zoë Kravitz", "Penélope Cruz", "Brad Pitt", "Meryl Streep", "Jean Reno",
+                  "Gérard Depardieu", "Monica Bellucci", "Toshirō Mifune", "Cate Blanchett", "Ken Watanabe",
+                  "Sophia Loren", "Marcello Mastroianni", "Song Kang-ho", "Gong Li", "Bae Doona"])
+
+def make_casts(n_movies, seed=0):
+    rng = np.random.default_rng(seed)
+    n_rows = 8*n_movies
+    movies = rng.integers(0, n_movies, n_rows)
+    actors = rng.integers(0, 4*n_movies, n_rows)
+    names = rng.choice(NAMES, n_rows) + " " + (actors % 50).astype(str)
+    wikidata = pd.DataFrame({
+        "wikidata_id_movie": [f"Q{m}" for m in movies],
+        "freebase_id_movie": [f"/m/{m:x}" for m in movies],
+        "imdb_id_movie": [f"tt{m:07d}" for m in movies],
+        "title_movie": [f"Movie {m}" for m in movies],
+        "wikidata_id_actor": [f"Q{a}a" for a in actors],
+        "freebase_id_actor": [f"/m/a{a:x}" for a in actors],
+        "imdb_id_actor": [f"nm{a:07d}" for a in actors],
+        "name_actor": names,
+        "role": rng.choice(["actor", "director"], n_rows, p=[0.9, 0.1]),
+        "character_name": rng.choice(["Hero", "Villain", None], n_rows),
+    })
+    wikidata.loc[rng.random(n_rows) < 0.3, "freebase_id_actor"] = np.nan
+    wikidata.loc[rng.random(n_rows) < 0.02, "name_actor"] = np.nan
+    wikidata.loc[rng.random(n_rows) < 0.01, "freebase_id_movie"] = np.nan
+
+    # MovieSummaries: part of the same cast members plus movies missing from Wikidata
+    original = wikidata.sample(frac=0.6, random_state=seed)
+    original = original.assign(freebase_id_actor=[f"/m/a{a:x}" for a in actors[original.index]])
+    extra = original.sample(frac=0.2, random_state=seed + 1)
+    extra = extra.assign(freebase_id_movie=extra["freebase_id_movie"] + "x")
+    original = pd.concat([original, extra], ignore_index=True)
+    original = pd.DataFrame({
+        "wikipedia_id_movie": original["wikidata_id_movie"].str[1:],
+        "freebase_id_movie": original["freebase_id_movie"],
+        "freebase_id_actor": original["freebase_id_actor"],
+        "name_actor": original["name_actor"],
+        "character_name": original["character_name"].where(rng.random(len(original)) < 0.5, "Someone"),
+        "role": "actor",
+    })
+
+    translator = pd.Series([f"tt{i:07d}" for i in range(n_movies)], index=[f"/m/{i:x}x" for i in range(n_movies)])
+    return wikidata, original, translator
+
+def merge_casts_loop(cast_wikidata, cast_original, translator):
+    # Code of cast_dataset_generation.ipynb before merge_casts
+    cast_wikidata_grouped = cast_wikidata.groupby(by='freebase_id_movie')
+    cast_original_grouped = cast_original.groupby(by='freebase_id_movie')
+
+    dfs = []
+    groups_1 = set(cast_wikidata_grouped.groups)
+    groups_2 = set(cast_original_grouped.groups).difference(groups_1)
+    for freebase_id_movie in groups_1:
+        wikidata_df = cast_wikidata_grouped.get_group(freebase_id_movie).copy(deep=True)
+        original_df = cast_original_grouped.get_group(freebase_id_movie).copy(deep=True) if freebase_id_movie in cast_original_grouped.groups else pd.DataFrame(columns=cast_original.columns)
+
+        wikidata_df["name_key"] = create_key_series(wikidata_df, "name_actor").astype(str)
+        duplicate_keys = wikidata_df["name_key"].value_counts()
+        duplicate_keys = duplicate_keys[duplicate_keys > 1].index
+        wikidata_df["name_key"] = wikidata_df["name_key"].apply(lambda x: pd.NA if x in duplicate_keys else x)
+
+        original_df["name_key"] = create_key_series(original_df, "name_actor").astype(str)
+        duplicate_keys = original_df["name_key"].value_counts()
+        duplicate_keys = duplicate_keys[duplicate_keys > 1].index
+        original_df["name_key"] = original_df["name_key"].apply(lambda x: pd.NA if x in duplicate_keys else x)
+
+        df1 = pd.merge(wikidata_df, original_df, left_on="freebase_id_actor", right_on="freebase_id_actor", how="inner", suffixes=('', '_orig'))
+        rest_of_wikidata_df = wikidata_df[~wikidata_df["freebase_id_actor"].isin(df1["freebase_id_actor"])].dropna(subset=["name_key"])
+        df2 = pd.merge(rest_of_wikidata_df, original_df, left_on="name_key", right_on="name_key", how="left", suffixes=('', '_orig'))
+        df = pd.concat([df1, df2]).drop(columns=['name_key', 'name_key_orig', 'role_orig'])
+
+        df["freebase_id_movie"] = df.apply(lambda row: row["freebase_id_movie_orig"] if pd.isna(row["freebase_id_movie"]) else row["freebase_id_movie"], axis=1)
+        df["name_actor"] = df.apply(lambda row: row["name_actor_orig"] if pd.isna(row["name_actor"]) else row["name_actor"], axis=1)
+        df["character_name"] = df.apply(lambda row: row["character_name_orig"] if pd.isna(row["character_name"]) else row["character_name"], axis=1)
+        df["freebase_id_actor"] = df.apply(lambda row: row["freebase_id_actor_orig"] if pd.isna(row["freebase_id_actor"]) else row["freebase_id_actor"], axis=1)
+
+        df = df.drop(columns=["freebase_id_movie_orig", "name_actor_orig", "character_name_orig", "freebase_id_actor_orig"])
+        dfs.append(df.copy(deep=True))
+
+    for freebase_id_movie in groups_2:
+        original_df = cast_original_grouped.get_group(freebase_id_movie).copy(deep=True)
+        original_df["imdb_id_movie"] = original_df.freebase_id_movie.apply(lambda x: translator[x] if x in translator.index else pd.NA)
+        dfs.append(original_df.copy(deep=True))
+
+    return pd.concat(dfs)
+
+def canonical(df, columns):
+    # Same rows regardless of row order and of the kind of missing value
+    df = df[columns].astype(object).where(df[columns].notna(), None)
+    return df.sort_values(columns, key=lambda s: s.astype(str)).reset_index(drop=True)
+
+def run(n_movies=2_000):
+    wikidata, original, translator = make_casts(n_movies)
+
+    start = time.perf_counter()
+    fast = merge_casts(wikidata, original, translator)
+    fast_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reference = merge_casts_loop(wikidata, original, translator)
+    reference_time = time.perf_counter() - start
+
+    columns = list(fast.columns)
+    assert sorted(columns) == sorted(reference.columns), "columns differ"
+    assert canonical(fast, columns).equals(canonical(reference, columns)), "rows differ"
+
+    print(f"movies: {n_movies}, output rows: {len(fast)}")
+    print(f"per-movie loop: {reference_time:.2f} s")
+    print(f"merge_casts:    {fast_time:.2f} s")
+    print(f"speedup: {reference_time/fast_time:.1f}x")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2_000)
@@ -0,0 +1,66 @@
+# Benchmark of collapse_groups against groupby(key).apply(agg_bool) on an exploded movie x genre/country
+# dummies table, as built in results.ipynb. Results are checked to be identical.
+#
+# Usage: python src/benchmarks/bench_collapse_groups.py [n_movies]
+
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from data_utils import agg_bool, collapse_groups
+
+GENRES = ["drama", "comedy", "thriller", "horror", "action", "romance", "sci-fi", "documentary"]
+COUNTRIES = ["United States of America", "France", "Germany", "Italy", "Japan", "India"]
+
+def exploded_table(n_movies, seed=0):
+    rng = np.random.default_rng(seed)
+    n_rows = n_movies*3
+    movie = rng.integers(0, n_movies, n_rows)
+    df = pd.DataFrame({
+        "freebase_id_movie": pd.Series([f"/m/{i:07d}" for i in movie], dtype=object),
+        "log_budget": np.where(rng.random(n_rows) < 0.1, np.nan, rng.normal(16, 2, n_rows)),
+        "std_age": rng.normal(10, 3, n_rows),
+        "cast_country_count": rng.integers(1, 6, n_rows),
+        "production_companies": pd.Series(rng.choice(["Warner", "Gaumont", None], n_rows), dtype=object),
+        "director_fame_bool": rng.random(n_rows) < 0.3,
+    })
+    # Non-key columns describe the movie: make them constant within each movie, except missing values
+    firsts = df.groupby("freebase_id_movie").transform("first")
+    df[firsts.columns] = firsts
+    df["log_budget"] = df["log_budget"].where(rng.random(n_rows) >= 0.05)
+    for name, tokens in [("genres", GENRES), ("countries", COUNTRIES)]:
+        values = rng.choice(tokens, n_rows)
+        for token in tokens:
+            df[f"{name}_{token}"] = values == token
+    return df
+
+def run(n_movies=20_000):
+    df = exploded_table(n_movies)
+
+    start = time.perf_counter()
+    with warnings.catch_warnings():
+        # apply operating on the grouping column is deprecated, but this is what results.ipynb relied on
+        warnings.simplefilter("ignore", FutureWarning)
+        reference = df.groupby("freebase_id_movie").apply(agg_bool).reset_index(drop=True)
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    collapsed = collapse_groups(df, "freebase_id_movie")
+    fast_time = time.perf_counter() - start
+
+    # agg_bool goes through one Series per group, which loses the dtypes
+    assert collapsed.equals(reference.astype(collapsed.dtypes.to_dict()))
+
+    print(f"rows: {len(df)}, groups: {len(collapsed)}")
+    print(f"groupby.apply(agg_bool): {reference_time:.2f} s")
+    print(f"collapse_groups:         {fast_time:.3f} s")
+    print(f"speedup: {reference_time/fast_time:.0f}x")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
@@ -0,0 +1,57 @@
+# Benchmark of the column-at-a-time create_key_series against the row-wise
+# reference implementation on a synthetic movies table.
+#
+# Usage: python src/benchmarks/bench_create_key.py [n_rows]
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from auxiliary_functions_for_merging import create_key_series, create_key_series_rowwise
+
+WORDS = np.array(["The", "Amélie", "Señor", "Godfather", "Part", "II", "Café", "Zoë", "Star-Wars:",
+                  "O'Brien", "Mañana", "Crème", "Brûlée", "Night", "Day", "of", "a", "Love", "Story",
+                  "Return", "King", "Ōkami", "Ça", "2", "Naïve", "Ｆｕｌｌｗｉｄｔｈ"])
+
+def make_movies(n_rows, seed=0):
+    """
+    Build a synthetic table shaped like the TMDB/IMDB title tables:
+    accented and punctuated titles, float years with missing values.
+    """
+    rng = np.random.default_rng(seed)
+    n_words = rng.integers(1, 5, n_rows)
+    titles = [" ".join(rng.choice(WORDS, k)) for k in n_words]
+    years = rng.integers(1900, 2024, n_rows).astype(float)
+    years[rng.random(n_rows) < 0.05] = np.nan
+    df = pd.DataFrame({"title": titles, "year": years})
+    df.loc[rng.random(n_rows) < 0.01, "title"] = np.nan
+    return df
+
+def run(n_rows=1_000_000):
+    df = make_movies(n_rows)
+    columns = ["title", "year"]
+
+    start = time.perf_counter()
+    fast = create_key_series(df, columns)
+    fast_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reference = create_key_series_rowwise(df, columns)
+    reference_time = time.perf_counter() - start
+
+    assert fast.isna().equals(reference.isna()), "missing keys differ"
+    assert (fast.dropna() == reference.dropna()).all(), "keys differ"
+
+    print(f"rows: {n_rows}")
+    print(f"create_key_series_rowwise: {reference_time:.2f} s")
+    print(f"create_key_series:         {fast_time:.2f} s")
+    print(f"speedup: {reference_time/fast_time:.1f}x")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,50 @@
+# Benchmark of the Parquet dataset store: load time and memory of each
+# intermediate dataset when parsed from text (plain pd.read_csv), when
+# loaded through the store for the first time (cold) and afterwards (warm).
+#
+# Usage: python src/benchmarks/bench_dataset_store.py [DATA_PATH] [CACHE_PATH]
+
+import os
+import shutil
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from bench_utils import measure_in_subprocess
+from dataset_store import DatasetStore
+
+INTERMEDIATES = ["movies_complete.tsv", "people_complete.tsv", "movie_actor_complete.tsv",
+                 "title.principals.onlymovies.tsv"]
+
+def df_memory_mb(df):
+    return df.memory_usage(index=True, deep=True).sum()/2**20
+
+def load_text(path):
+    return df_memory_mb(pd.read_csv(path, sep='\t', low_memory=False))
+
+def load_store(cache_path, path):
+    return df_memory_mb(DatasetStore(cache_path).load(path, sep='\t', low_memory=False))
+
+def run(data_path, cache_path):
+    rows = []
+    for file_name in INTERMEDIATES:
+        path = os.path.join(data_path, file_name)
+        if not os.path.exists(path):
+            print(f"{file_name} not found, skipped")
+            continue
+        shutil.rmtree(cache_path, ignore_errors=True)
+        for mode, func, args in [("read_csv", load_text, (path,)),
+                                 ("store cold", load_store, (cache_path, path)),
+                                 ("store warm", load_store, (cache_path, path))]:
+            elapsed, peak_rss, memory = measure_in_subprocess(func, *args)
+            rows.append({"dataset": file_name, "mode": mode, "time_s": elapsed,
+                         "peak_rss_mb": peak_rss, "dataframe_mb": memory})
+    shutil.rmtree(cache_path, ignore_errors=True)
+    print(pd.DataFrame(rows).to_string(index=False, float_format="{:.2f}".format))
+
+if __name__ == "__main__":
+    data_path = sys.argv[1] if len(sys.argv) > 1 else "./Data/"
+    cache_path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(data_path, "benchmark_cache")
+    run(data_path, cache_path)
@@ -0,0 +1,84 @@
+# Benchmark of parse_dates against the per-element select_date, extract_year and is_valid_date
+# calls of the people notebook (six .apply passes over birthDate and deathDate). The outputs
+# of the two versions are checked to be identical, also on a list of edge cases.
+#
+# Usage: python src/benchmarks/bench_dates.py [n_rows]
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from auxiliary_functions_for_merging import extract_year, is_valid_date, parse_dates, select_date
+
+EDGE_CASES = [
+    np.nan, pd.NA, None, "", ",", "1990", "1990-05", "1990-05-04", "1990-5-4", "1990-05- 4", "1990-5-04T00:00:00Z",
+    "1990-01-01", "1990-01-01T00:00:00Z", "1990-01-01T00:00:00Z,1991-03-02T00:00:00Z",
+    "1990-01-01T00:00:00Z,1991-01-01T00:00:00Z", "5-01-01,2000-01-01", "2000-01-01,,1999-01-01",
+    "2000-02-29", "1900-02-29", "1999-02-29", "1999-04-31", "0000-01-02", "0001-01-02", "1749-06-06", "2024-12-31",
+    "2025-01-02", "-1990-05-04", "19900504", "1990/05/04", "1990-13-01", "1990-00-10", "abcd-01-02", " 1990-01-02",
+    "http://www.wikidata.org/.well-known/genid/123", "1990 film by John Doe",
+]
+# select_date raises on values that are not strings, extract_year and is_valid_date reject them
+NON_STRING_CASES = [1990, 1990.0, 19900504]
+
+def scalar_pipeline(dates, select=True):
+    selected = dates.apply(select_date) if select else dates
+    years = selected.apply(extract_year)
+    valid = selected.apply(lambda x: is_valid_date(x))
+    return selected.where(valid, pd.NA), years, valid
+
+def check_parity(dates, select=True):
+    date, year, valid = scalar_pipeline(dates, select)
+    parsed = parse_dates(dates, select)
+    assert parsed["valid"].tolist() == valid.tolist()
+    assert parsed["date"].isna().tolist() == date.isna().tolist()
+    assert parsed["date"].dropna().tolist() == date.dropna().tolist()
+    assert parsed["year"].isna().tolist() == year.isna().tolist()
+    assert parsed["year"].dropna().tolist() == year.dropna().tolist()
+
+def random_dates(rng, n_rows):
+    years = rng.integers(1700, 2030, n_rows).astype(str)
+    months = np.char.zfill(rng.integers(1, 13, n_rows).astype(str), 2)
+    days = np.char.zfill(rng.integers(1, 32, n_rows).astype(str), 2)
+    dates = pd.Series(np.char.add(np.char.add(np.char.add(years, "-"), np.char.add(months, "-")), days), dtype=object)
+    dates = dates + "T00:00:00Z"
+    january = rng.random(n_rows) < 0.2
+    dates[january] = pd.Series(years[january], index=np.flatnonzero(january)) + "-01-01T00:00:00Z"
+    several = rng.random(n_rows) < 0.1
+    dates[several] = dates[several] + "," + dates.sample(frac=1, random_state=0).to_numpy()[several]
+    return dates.where(rng.random(n_rows) >= 0.3, np.nan)
+
+def run(n_rows=500_000):
+    check_parity(pd.Series(EDGE_CASES, dtype=object))
+    check_parity(pd.Series(EDGE_CASES + NON_STRING_CASES, dtype=object), select=False)
+    print("edge cases: ok")
+
+    rng = np.random.default_rng(0)
+    people = pd.DataFrame({"birthDate": random_dates(rng, n_rows), "deathDate": random_dates(rng, n_rows)})
+
+    start = time.perf_counter()
+    for col in ["birthDate", "deathDate"]:
+        scalar_pipeline(people[col])
+    scalar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for col in ["birthDate", "deathDate"]:
+        parse_dates(people[col])
+    vectorized_time = time.perf_counter() - start
+
+    for col in ["birthDate", "deathDate"]:
+        check_parity(people[col])
+
+    print(f"rows: {n_rows} (birthDate and deathDate)")
+    print(f"select_date + extract_year + is_valid_date: {scalar_time:.2f} s")
+    print(f"parse_dates:                                {vectorized_time:.2f} s")
+    print(f"speedup: {scalar_time/vectorized_time:.1f}x")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000)
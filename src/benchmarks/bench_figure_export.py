@@ -0,0 +1,98 @@
+# Check of the export queue of figure_export.py with a stand-in renderer (writes the spec after a fixed delay,
+# like an image renderer would take), so that it runs without starting kaleido: the static renders of a batch
+# run concurrently, unchanged figures are not rendered again, changed ones are, the display PNG and the spec
+# hashes stay out of the plots folder, and a failed render is raised by wait and not recorded as exported.
+#
+# Usage: python src/benchmarks/bench_figure_export.py [n_figures] [render_seconds]
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from figure_export import DISPLAY_FORMAT, EXPORT_FORMATS, MANIFEST_NAME, FigureExporter
+
+# Delay of each render of stand_in_render, set from the command line (also read by the worker processes)
+RENDER_SECONDS_VARIABLE = "BENCH_RENDER_SECONDS"
+
+class StandInFigure:
+    # Object with the two methods of a plotly Figure the exporter uses
+    def __init__(self, spec):
+        self.spec = spec
+
+    def to_json(self):
+        return json.dumps(self.spec)
+
+    def write_html(self, file, full_html, config):
+        with open(file, 'w') as f:
+            f.write(self.to_json())
+
+def stand_in_render(spec, path, fmt):
+    time.sleep(float(os.environ.get(RENDER_SECONDS_VARIABLE, "0.2")))
+    if json.loads(spec).get("fail"):
+        raise ValueError(f"render of {path} failed")
+    with open(path, 'w') as f:
+        f.write(spec)
+    return path
+
+def mtimes(exporter, filename):
+    return [os.stat(exporter.path(filename, fmt)).st_mtime_ns for fmt in exporter.formats]
+
+def run(n_figures=8, render_seconds=0.2):
+    os.environ[RENDER_SECONDS_VARIABLE] = str(render_seconds)
+    folder = tempfile.mkdtemp()
+    plots = os.path.join(folder, "plots")
+    figures = {f"figure_{i}": StandInFigure({"data": [i]}) for i in range(n_figures)}
+    n_static = len([fmt for fmt in EXPORT_FORMATS + [DISPLAY_FORMAT] if fmt != 'html'])
+
+    exporter = FigureExporter(plots, max_workers=n_static, renderer=stand_in_render)
+    # The time includes the start of the worker processes
+    start = time.perf_counter()
+    for filename, fig in figures.items():
+        exporter.submit(fig, filename)
+    exporter.wait()
+    batch_time = time.perf_counter() - start
+
+    # Only the exported formats are in the plots folder, the display PNG and the hashes are in the cache
+    expected = {f"{filename}.{fmt}" for filename in figures for fmt in EXPORT_FORMATS}
+    assert set(os.listdir(plots)) == expected, sorted(set(os.listdir(plots)) ^ expected)
+    assert set(os.listdir(exporter.cache_folder)) == {f"{filename}.{DISPLAY_FORMAT}" for filename in figures} \
+        | {MANIFEST_NAME}
+
+    # Unchanged figures are skipped, also by a new exporter reading the hashes, changed ones are rendered again
+    before = {filename: mtimes(exporter, filename) for filename in figures}
+    exporter.close()
+    exporter = FigureExporter(plots, max_workers=n_static, renderer=stand_in_render)
+    start = time.perf_counter()
+    assert all(exporter.submit(fig, filename) == {} for filename, fig in figures.items())
+    skip_time = time.perf_counter() - start
+    assert all(mtimes(exporter, filename) == before[filename] for filename in figures)
+    futures = exporter.submit(StandInFigure({"data": [-1]}), "figure_0")
+    assert set(futures) == set(exporter.formats) - {'html'}
+    exporter.wait()
+    assert all(new != old for new, old in zip(mtimes(exporter, "figure_0"), before["figure_0"]))
+
+    # A failed render is raised by wait and the figure is not recorded, so it is rendered again next time
+    exporter.submit(StandInFigure({"fail": True}), "broken")
+    try:
+        exporter.wait()
+        raise AssertionError("the failed render was not raised")
+    except ValueError:
+        pass
+    with open(os.path.join(exporter.cache_folder, MANIFEST_NAME)) as f:
+        assert "broken" not in json.load(f)
+    exporter.close()
+
+    sequential_time = n_figures*n_static*render_seconds
+    print(f"{n_figures} figures x {n_static} static formats, {render_seconds} s per render")
+    print(f"sequential renders: {sequential_time:.2f} s, export queue: {batch_time:.2f} s, "
+          f"unchanged figures: {skip_time:.3f} s")
+    print("display PNG and hashes kept out of the plots folder, failed renders raised and not recorded")
+
+if __name__ == "__main__":
+    n_figures = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    render_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    run(n_figures, render_seconds)
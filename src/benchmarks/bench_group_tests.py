@@ -0,0 +1,83 @@
+# Benchmark of the batched group tests (group_pearson, group_mean_tests) against one filtered copy and one
+# scipy call per group (as in results.ipynb) on a synthetic movie table with many groups (e.g. primary
+# companies). Statistics and p-values are checked to be the same.
+#
+# Usage: python src/benchmarks/bench_group_tests.py [n_rows] [n_groups]
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from statistical_tests import adjust_p_values, group_mean_tests, group_pearson
+
+def synthetic_movies(n_rows, n_groups, seed=0):
+    rng = np.random.default_rng(seed)
+    group = rng.zipf(1.3, n_rows) % n_groups
+    df = pd.DataFrame({
+        "primary_company": np.char.add("Company ", group.astype(str)),
+        "log_budget": rng.normal(15, 2, n_rows),
+        "log_numVotes_imdb": rng.normal(7, 2, n_rows) + 0.001*group,
+    })
+    df["log_roi_perctg"] = 5 - 0.2*df["log_budget"] + rng.normal(0, 1, n_rows)
+    df.loc[rng.random(n_rows) < 0.1, "log_budget"] = np.nan
+    return df
+
+def pearson_loop(df, group_col, x_col, y_col):
+    rows = []
+    for group in sorted(df[group_col].unique()):
+        group_df = df[df[group_col] == group].dropna(subset=[x_col, y_col])
+        if len(group_df) >= 3:
+            rows.append((group, *stats.pearsonr(group_df[x_col], group_df[y_col])))
+    return pd.DataFrame(rows, columns=[group_col, "statistic", "p_val"])
+
+def ttest_loop(df, group_col, metric):
+    rows = []
+    for group in sorted(df[group_col].unique()):
+        inside = df[df[group_col] == group][metric].dropna()
+        outside = df[df[group_col] != group][metric].dropna()
+        if len(inside) >= 2 and len(outside) >= 2:
+            result = stats.ttest_ind(inside, outside)
+            rows.append((group, result.statistic, result.pvalue))
+    return pd.DataFrame(rows, columns=[group_col, "statistic", "p_val"])
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+def check(expected, results, group_col):
+    results = results.dropna(subset=["statistic"]).set_index(group_col)
+    expected = expected.dropna(subset=["statistic"]).set_index(group_col)
+    assert set(results.index) == set(expected.index)
+    results = results.loc[expected.index]
+    np.testing.assert_allclose(results["statistic"], expected["statistic"], rtol=1e-8, atol=1e-10)
+    np.testing.assert_allclose(results["p_val"], expected["p_val"], rtol=1e-6, atol=1e-12)
+
+def run(n_rows=1_000_000, n_groups=500):
+    df = synthetic_movies(n_rows, n_groups)
+    print(f"rows: {n_rows}, groups: {df['primary_company'].nunique()}")
+
+    loop_time, expected = timed(pearson_loop, df, "primary_company", "log_budget", "log_roi_perctg")
+    batch_time, results = timed(group_pearson, df, "primary_company", "log_budget", "log_roi_perctg")
+    check(expected, results, "primary_company")
+    print(f"pearson: loop {loop_time:.2f} s, batched {batch_time:.2f} s ({loop_time/batch_time:.0f}x)")
+
+    loop_time, expected = timed(ttest_loop, df, "primary_company", "log_numVotes_imdb")
+    batch_time, results = timed(group_mean_tests, df, "primary_company", "log_numVotes_imdb")
+    check(expected, results, "primary_company")
+    print(f"t-test vs rest: loop {loop_time:.2f} s, batched {batch_time:.2f} s ({loop_time/batch_time:.0f}x)")
+    print(f"groups rejected at 0.05: raw {(results['p_val'] < 0.05).sum()}, "
+          f"Benjamini-Hochberg {results['reject'].sum()}, "
+          f"Bonferroni {(adjust_p_values(results['p_val'], 'bonferroni') < 0.05).sum()}")
+    print("Same statistics and p-values as scipy")
+
+if __name__ == "__main__":
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    n_groups = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    run(n_rows, n_groups)
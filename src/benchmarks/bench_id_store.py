@@ -0,0 +1,114 @@
+# Benchmark of the shared lookup layer: assignment of the univocal IDs of
+# the actors of synthetic cast rows with the translator Series tested row by
+# row (former cast notebook) and with IdStore.resolve, plus the normalization
+# of repeated titles with and without the LRU cache of clean_string_fast.
+# The store is rebuilt only when its source file changed, so runs on the
+# same people table only pay the resolve.
+#
+# Usage: python src/benchmarks/bench_id_store.py [N_CAST_ROWS] [N_PEOPLE]
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+import auxiliary_functions_for_merging as aux
+from id_store import IdStore, file_key
+
+def make_tables(n_rows, n_people, seed=0):
+    rng = np.random.default_rng(seed)
+    person = np.arange(n_people)
+    freebase = pd.Series([f"/m/0{x:06d}" for x in person]).where(rng.random(n_people) < 0.7)
+    imdb = pd.Series([f"nm{x:07d}" for x in person]).where(rng.random(n_people) < 0.9)
+    people = pd.DataFrame({
+        "univocal_id_actor": freebase.fillna(imdb),
+        "freebase_id_actor": freebase,
+        "imdb_id_actor": imdb,
+        "wikidata_id_actor": [f"http://www.wikidata.org/entity/Q{x}" for x in person],
+    }).dropna(subset=["univocal_id_actor"])
+
+    # Cast rows reference known people (with some IDs missing) and some unknown actors
+    actor = rng.integers(0, int(n_people*1.1), n_rows)
+    cast = pd.DataFrame({
+        "freebase_id_actor": pd.Series([f"/m/0{x:06d}" for x in actor]).where(rng.random(n_rows) < 0.6),
+        "imdb_id_actor": pd.Series([f"nm{x:07d}" for x in actor]).where(rng.random(n_rows) < 0.8),
+    })
+    return people, cast
+
+def univocal_rowwise(people, cast):
+    translator1 = pd.Series(people.dropna(subset=["freebase_id_actor"]).univocal_id_actor.values, index=people.dropna(subset=["freebase_id_actor"]).freebase_id_actor.values)
+    translator2 = pd.Series(people.dropna(subset=["imdb_id_actor"]).univocal_id_actor.values, index=people.dropna(subset=["imdb_id_actor"]).imdb_id_actor.values)
+    def get_univocal_id_actor(row):
+        if row["freebase_id_actor"] in translator1.index:
+            return translator1[row["freebase_id_actor"]]
+        elif row["imdb_id_actor"] in translator2.index:
+            return translator2[row["imdb_id_actor"]]
+        else:
+            return pd.NA
+    return cast.apply(get_univocal_id_actor, axis=1)
+
+def run(n_rows, n_people):
+    people, cast = make_tables(n_rows, n_people)
+
+    start = time.perf_counter()
+    expected = univocal_rowwise(people, cast)
+    rowwise_time = time.perf_counter() - start
+    print(f"translator + apply:        {rowwise_time:6.2f} s")
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "actor_ids.sqlite")
+        people_path = os.path.join(folder, "people_complete.tsv")
+        people.to_csv(people_path, sep='\t', index=False)
+
+        def assign():
+            # Same steps as the cast notebook
+            start = time.perf_counter()
+            people_key = file_key(people_path)
+            with IdStore(path) as actor_ids:
+                if actor_ids.source_key() != people_key:
+                    actor_ids.rebuild(pd.read_csv(people_path, sep='\t'),
+                                      {"freebase_id_actor": "freebase", "imdb_id_actor": "imdb",
+                                       "wikidata_id_actor": "wikidata"}, "univocal_id_actor", people_key)
+                result = actor_ids.resolve(cast, {"freebase_id_actor": "freebase", "imdb_id_actor": "imdb"})
+            return time.perf_counter() - start, result
+
+        first_time, result = assign()
+        unchanged_time, unchanged = assign()
+        assert unchanged.equals(result)
+        size_mb = os.path.getsize(path)/2**20
+    print(f"IdStore build + resolve ({size_mb:.0f} MB): {first_time:6.2f} s")
+    print(f"IdStore resolve, people unchanged: {unchanged_time:6.2f} s ({rowwise_time/unchanged_time:.1f}x)")
+    assert expected.isna().equals(result.isna())
+    assert (expected.dropna() == result.dropna()).all()
+    print(f"Same univocal IDs ({result.notna().sum()} of {len(result)} rows)")
+
+    # Normalization of titles already seen (as in every merge of the same datasets)
+    titles = pd.Series([f"Él {x} de la Película: Çà {x % 1000}" for x in range(n_people)])
+    aux.clean_string_fast.cache_clear()
+    aux.make_text_ASCII.cache_clear()
+    start = time.perf_counter()
+    first = aux.clean_column(titles)
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    second = aux.clean_column(titles)
+    warm = time.perf_counter() - start
+    def uncached(title):
+        cleaned = title.translate(aux.chars_to_remove_table).lower()
+        return cleaned if cleaned.isascii() else aux.make_text_ASCII.__wrapped__(cleaned)
+    start = time.perf_counter()
+    reference = [uncached(title) for title in titles]
+    uncached_time = time.perf_counter() - start
+    assert list(first) == list(second) == reference
+    print(f"clean_column of {len(titles)} titles: uncached {uncached_time:.2f} s, "
+          f"first call {cold:.2f} s, cached {warm:.2f} s")
+
+if __name__ == "__main__":
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    n_people = int(sys.argv[2]) if len(sys.argv) > 2 else 300_000
+    run(n_rows, n_people)
@@ -0,0 +1,114 @@
+# Benchmark of incremental_build on a synthetic version of the MovieSummaries x Wikidata merge stage of
+# movie_dataset_generation.ipynb (keys title_year_key, merge by ID then by key, coalesce). After a full build,
+# a small fraction of the rows of both sources is modified, added or removed, and the stage is updated
+# incrementally. The updated output must contain the same rows as a full rebuild.
+#
+# Usage: python src/benchmarks/bench_incremental_build.py [n_movies] [changed_ratio]
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from auxiliary_functions_for_merging import coalesce, create_key_series, merge_by_id_then_key, remove_duplicated_keys
+from incremental_build import incremental_build
+
+WORDS = np.array(["The", "Night", "Amélie", "Return", "of", "Dragon", "Love", "Éternel", "City", "Blue", "Last", "War"])
+
+LINKS = {
+    "movies_original": {"freebase_id_movie": "freebase_movie", "title_key": "title_year"},
+    "movies_wikidata": {"freebaseID": "freebase_movie", "title_key": "title_year"},
+}
+OUTPUT_LINKS = {"freebase_id_movie": "freebase_movie"}
+
+def title_keys(df, title_col, year_col):
+    return pd.DataFrame({"title_key": create_key_series(df, [title_col, year_col])}, index=df.index)
+
+DERIVED = {
+    "movies_original": lambda df: title_keys(df, "title", "release_year"),
+    "movies_wikidata": lambda df: title_keys(df, "title", "year"),
+}
+
+# Same steps as the notebook, the raw keys are given by the derived columns
+def merge_stage(movies_original, movies_wikidata):
+    movies_original = movies_original.copy()
+    movies_wikidata = movies_wikidata.copy()
+    for df in [movies_original, movies_wikidata]:
+        df["title_year_key"] = remove_duplicated_keys(df["title_key"])
+    merged = merge_by_id_then_key(movies_original.drop(columns="title_key"), movies_wikidata.drop(columns="title_key"),
+                                  "freebase_id_movie", "freebaseID", ('', '_wikidata'))
+    merged["release_year"] = coalesce(merged, ["release_year", "year"])
+    merged["runtimeMinutes"] = coalesce(merged, ["runtimeMinutes", "runtime"])
+    return merged[["freebase_id_movie", "wikidataID", "title", "release_year", "runtimeMinutes"]]
+
+def random_titles(rng, n):
+    words = rng.choice(WORDS, (n, 3))
+    numbers = rng.integers(0, 1000, n)
+    return pd.Series([f"{w1} {w2} {w3} {k}" for (w1, w2, w3), k in zip(words.tolist(), numbers.tolist())], dtype=object)
+
+def synthetic_sources(n_movies, seed=0):
+    rng = np.random.default_rng(seed)
+    original = pd.DataFrame({
+        "freebase_id_movie": [f"/m/{i:x}" for i in range(n_movies)],
+        "title": random_titles(rng, n_movies),
+        "release_year": rng.integers(1950, 2013, n_movies).astype(float),
+        "runtimeMinutes": np.where(rng.random(n_movies) < 0.3, np.nan, rng.integers(60, 180, n_movies)),
+    })
+    sample = rng.choice(n_movies, n_movies*3//4, replace=False)
+    wikidata = pd.DataFrame({
+        "wikidataID": [f"Q{i}" for i in sample],
+        "freebaseID": pd.Series([f"/m/{i:x}" for i in sample], dtype=object).where(rng.random(len(sample)) >= 0.4),
+        "title": original["title"].to_numpy()[sample],
+        "year": original["release_year"].to_numpy()[sample] + rng.integers(0, 2, len(sample))*(rng.random(len(sample)) < 0.1),
+        "runtime": rng.integers(60, 180, len(sample)).astype(float),
+    })
+    return original, wikidata
+
+def modify_sources(original, wikidata, ratio, seed=1):
+    rng = np.random.default_rng(seed)
+    original, wikidata = original.copy(), wikidata.copy()
+    n_changes = max(1, int(len(wikidata)*ratio))
+    # Updated values, renamed titles, new and removed rows
+    rows = rng.choice(len(wikidata), n_changes, replace=False)
+    wikidata.loc[rows, "runtime"] = rng.integers(60, 180, n_changes)
+    rows = rng.choice(len(original), n_changes, replace=False)
+    original.loc[rows, "title"] = random_titles(rng, n_changes).to_numpy()
+    copied = wikidata.sample(n_changes, random_state=seed).assign(freebaseID=np.nan, wikidataID=lambda df: df["wikidataID"] + "b")
+    wikidata = pd.concat([wikidata, copied], ignore_index=True)
+    original = original.drop(index=rng.choice(len(original), n_changes, replace=False)).reset_index(drop=True)
+    return original, wikidata
+
+def sorted_rows(df):
+    return df.astype("string").sort_values(list(df.columns)).reset_index(drop=True)
+
+def run(n_movies=200_000, changed_ratio=0.005):
+    original, wikidata = synthetic_sources(n_movies)
+    with tempfile.TemporaryDirectory() as state_dir:
+        inputs = {"movies_original": original, "movies_wikidata": wikidata}
+        start = time.perf_counter()
+        output, _ = incremental_build("movies_orig_wiki", inputs, LINKS, merge_stage, OUTPUT_LINKS, state_dir, derived=DERIVED)
+        full_time = time.perf_counter() - start
+
+        original, wikidata = modify_sources(original, wikidata, changed_ratio)
+        inputs = {"movies_original": original, "movies_wikidata": wikidata}
+        start = time.perf_counter()
+        updated, n_rows = incremental_build("movies_orig_wiki", inputs, LINKS, merge_stage, OUTPUT_LINKS, state_dir,
+                                            previous_output=output, derived=DERIVED)
+        incremental_time = time.perf_counter() - start
+
+    reference = merge_stage(*[df.assign(title_key=create_key_series(df, ["title", year]))
+                              for df, year in [(original, "release_year"), (wikidata, "year")]])
+    assert sorted_rows(updated).equals(sorted_rows(reference))
+
+    print(f"movies: {n_movies}, changed ratio: {changed_ratio}")
+    print(f"full build:         {full_time:.2f} s")
+    print(f"incremental update: {incremental_time:.2f} s, recomputed rows: {n_rows}")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000, float(sys.argv[2]) if len(sys.argv) > 2 else 0.005)
@@ -0,0 +1,86 @@
+# Benchmark of map_tokens against the per-row mapping functions of results.ipynb (map_country_list,
+# map_genres_list and the actor countries lambda) on a synthetic movie table built from the mapper files
+# in data/. Results are checked to be identical, once the repeated names of the reference rows are removed.
+#
+# Usage: python src/benchmarks/bench_map_tokens.py [n_rows]
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from data_cleaning import map_tokens, read_mapper
+
+DATA_FOLDER = os.path.join(os.path.dirname(__file__), '..', '..', 'data')
+
+# Previous implementation (results.ipynb), kept as reference
+def map_list(l, mapper_dict, lowercase=False):
+    if pd.isna(l):
+        return pd.NA
+    if lowercase:
+        l = l.lower()
+    l_split = l.split(",")
+    for i, el in enumerate(l_split):
+        l_split[i] = mapper_dict[el]
+    l_split = [el for el in l_split if not pd.isna(el)]
+    if len(l_split) == 0:
+        return pd.NA
+    return ",".join(l_split)
+
+def dedupe(l):
+    return pd.NA if pd.isna(l) else ",".join(dict.fromkeys(l.split(",")))
+
+def synthetic_lists(tokens, n_rows, max_tokens, rng, missing=0.2):
+    n_tokens = rng.integers(1, max_tokens + 1, n_rows)
+    words = rng.choice(np.asarray(tokens, dtype=object), n_tokens.sum())
+    bounds = np.cumsum(n_tokens) - n_tokens
+    lists = pd.Series([",".join(words[start:start + k]) for start, k in zip(bounds, n_tokens)], dtype=object)
+    return lists.where(rng.random(n_rows) >= missing)
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+def run(n_rows=1_000_000, seed=0):
+    rng = np.random.default_rng(seed)
+    countries_mapper = read_mapper(os.path.join(DATA_FOLDER, "countries_names_mapper.csv.gz"))
+    genres_mapper = read_mapper(os.path.join(DATA_FOLDER, "genres_mapper.csv.gz"), lowercase=True)
+    actor_mapper = read_mapper(os.path.join(DATA_FOLDER, "actor_countries_names_mapper.csv.gz"), header=None)
+
+    countries = synthetic_lists(countries_mapper.index, n_rows, 3, rng)
+    genres = synthetic_lists([genre.title() for genre in genres_mapper.index], n_rows, 4, rng)
+    actor_countries = pd.Series(rng.choice(np.append(actor_mapper.index.to_numpy(dtype=object), ["Atlantis"]), n_rows))
+
+    for name, series, mapper, lowercase in [("countries", countries, countries_mapper, False),
+                                            ("genres", genres, genres_mapper, True)]:
+        mapper_dict = dict(zip(mapper.index, mapper.to_numpy()))
+        old_time, old = timed(series.apply, map_list, args=(mapper_dict, lowercase))
+        new_time, (new, unknown) = timed(map_tokens, series, mapper, lowercase=lowercase)
+        assert len(unknown) == 0
+        pd.testing.assert_series_equal(new, old.apply(dedupe))
+        print(f"{name}: apply {old_time:.2f} s, map_tokens {new_time:.2f} s")
+
+    # Unknown tokens are reported instead of raising a KeyError
+    _, unknown = map_tokens(pd.Series(["France,Atlantis", "Atlantis", None]), countries_mapper)
+    assert unknown.to_dict() == {"Atlantis": 2}
+    # An empty mapper maps nothing and reports every token
+    for sep in [',', None]:
+        mapped, unknown = map_tokens(pd.Series(["France,Italy", "France", None]), pd.Series(dtype=object), sep=sep)
+        assert mapped.isna().all() and unknown.sum() == (3 if sep else 2)
+
+    mapper_dict = dict(zip(actor_mapper.index, actor_mapper.to_numpy()))
+    old_time, old = timed(actor_countries.apply, lambda x: pd.NA if pd.isna(x) or x not in mapper_dict.keys()
+                          else mapper_dict[x])
+    new_time, (new, unknown) = timed(map_tokens, actor_countries, actor_mapper, sep=None)
+    pd.testing.assert_series_equal(new, old)
+    assert list(unknown.index) == ["Atlantis"]
+    print(f"actor countries: apply {old_time:.2f} s, map_tokens {new_time:.2f} s")
+    print(f"rows: {n_rows}, same outputs as the previous implementations")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,78 @@
+# Benchmark of the propensity score matchers (matching.py) against the approach of results.ipynb:
+# dense similarity matrix 1 - |ps_t - ps_f|, pairs with similarity > 0.90 sorted by similarity and
+# matched greedily. networkx was only used there as a container of the edges, so the reference
+# below sorts the edge list directly. greedy_match must give the same pairs.
+#
+# Usage: python src/benchmarks/bench_matching.py [n_reference] [n_large] [n_optimal]
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from matching import greedy_match, nearest_neighbor_match, optimal_match
+
+CALIPER = 0.10
+
+def dense_greedy_match(true_scores_series, false_scores_series):
+    true_ids = true_scores_series.index.to_numpy()
+    false_ids = false_scores_series.index.to_numpy()
+    true_scores = true_scores_series.to_numpy()
+    false_scores = false_scores_series.to_numpy()
+    similarity_matrix = 1 - np.abs(true_scores[:, None] - false_scores[None, :])
+    rows, cols = np.where(similarity_matrix > 1 - CALIPER)
+    edges = [(true_ids[row], false_ids[col], similarity_matrix[row, col]) for row, col in zip(rows, cols)]
+    edges = sorted(edges, key=lambda x: x[2], reverse=True)
+    matching = set()
+    matched_nodes = set()
+    for u, v, _ in edges:
+        if u not in matched_nodes and v not in matched_nodes:
+            matching.add((u, v))
+            matched_nodes.update([u, v])
+    return matching
+
+def scores(n_treated, n_control, seed=0):
+    rng = np.random.default_rng(seed)
+    treated = pd.Series(rng.beta(4, 2, n_treated), index=np.arange(n_treated))
+    control = pd.Series(rng.beta(2, 3, n_control), index=np.arange(n_treated, n_treated + n_control))
+    return treated, control
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+def run(n_reference=4_000, n_large=1_000_000, n_optimal=30_000):
+    treated, control = scores(n_reference, n_reference + n_reference//2)
+    reference_time, reference = timed(dense_greedy_match, treated, control)
+    greedy_time, pairs = timed(greedy_match, treated, control, CALIPER)
+    assert set(zip(pairs["treated"], pairs["control"])) == reference
+    optimal_time, optimal = timed(optimal_match, treated, control, CALIPER, 20)
+    assert optimal["distance"].sum() <= pairs["distance"].sum()
+
+    print(f"{len(treated)} treated, {len(control)} controls, caliper {CALIPER}")
+    print(f"dense similarity + greedy:      {reference_time:6.2f} s, {len(reference)} pairs")
+    print(f"greedy_match:                   {greedy_time:6.2f} s, {len(pairs)} pairs (same pairs)")
+    print(f"optimal_match (20 candidates):  {optimal_time:6.2f} s, {len(optimal)} pairs, "
+          f"total distance {optimal['distance'].sum():.3f} vs {pairs['distance'].sum():.3f}")
+
+    treated, control = scores(n_large//3, n_large - n_large//3)
+    print(f"{len(treated)} treated, {len(control)} controls (dense matrix would need "
+          f"{len(treated)*len(control)*8/2**30:.0f} GB)")
+    for name, func in [("greedy_match", greedy_match), ("nearest_neighbor_match", nearest_neighbor_match)]:
+        elapsed, pairs = timed(func, treated, control, CALIPER)
+        print(f"{name:30s}  {elapsed:6.2f} s, {len(pairs)} pairs, mean distance {pairs['distance'].mean():.2e}")
+
+    # The sparse assignment solver grows faster than linearly, optimal matching is for medium sizes
+    treated, control = scores(n_optimal//3, n_optimal - n_optimal//3)
+    elapsed, pairs = timed(optimal_match, treated, control, CALIPER, 5)
+    print(f"{len(treated)} treated, {len(control)} controls")
+    print(f"{'optimal_match (5 candidates)':30s}  {elapsed:6.2f} s, {len(pairs)} pairs, "
+          f"mean distance {pairs['distance'].mean():.2e}")
+
+if __name__ == "__main__":
+    run(*(int(x) for x in sys.argv[1:4]))
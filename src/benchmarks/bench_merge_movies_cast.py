@@ -0,0 +1,109 @@
+# Peak memory and time of merge_movies_cast against its previous implementation (full-width joins
+# projected at the end) on a synthetic movie_actor x people x movies join. Each run happens in a
+# fresh process and starts from the same input tables; results are checked to be identical.
+#
+# Usage: python src/benchmarks/bench_merge_movies_cast.py [n_movies]
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from bench_utils import measure_in_subprocess, peak_rss_mb
+from data_utils import merge_movies_cast
+
+COLUMNS = ["wikidata_id_movie", "primaryTitle", "release_year", "genres", "revenue",
+           "univocal_id_actor", "nameSurname", "gender", "birthYear"]
+ARGS = ("univocal_id_actor", "univocal_id_actor", "wikidata_id_movie", "wikidata_id_movie", COLUMNS, "role")
+
+# Previous implementation, kept as reference
+def merge_movies_cast_full(pivot_df, cast_df, movies_df, cast_key_pivot, cast_key_right, movie_key_pivot,
+                           movie_key_right, columns, role_col, role='any'):
+    if role == 'any':
+        temp = pivot_df.dropna(subset=cast_key_pivot)
+    else:
+        temp = pivot_df[pivot_df[role_col]==role].dropna(subset=cast_key_pivot)
+    movies_and_actors = pd.merge(temp[[movie_key_pivot, cast_key_pivot]],
+                                 cast_df.dropna(subset=cast_key_right).drop_duplicates(subset=cast_key_right),
+                                 left_on=cast_key_pivot, right_on=cast_key_right)
+    movies_and_actors = pd.merge(movies_and_actors, movies_df, left_on=movie_key_pivot, right_on=movie_key_right)
+    return movies_and_actors[columns].drop_duplicates()
+
+def text_column(rng, n_rows, prefix, n_distinct=None):
+    values = rng.integers(0, n_distinct or n_rows, n_rows)
+    return pd.Series(values).map(lambda x: f"{prefix} {x:07d} lorem ipsum")
+
+def synthetic_tables(n_movies, seed=0):
+    rng = np.random.default_rng(seed)
+    n_people = 4*n_movies
+    n_pivot = 15*n_movies
+    movies = pd.DataFrame({"wikidata_id_movie": [f"Q{i}" for i in range(n_movies)]})
+    for col in ["primaryTitle", "overview", "keywords", "tagline", "production_companies"]:
+        movies[col] = text_column(rng, n_movies, col)
+    movies["genres"] = text_column(rng, n_movies, "genre", 50)
+    for col in ["release_year", "revenue", "budget", "runtimeMinutes", "averageRating", "numVotes"]:
+        movies[col] = rng.random(n_movies)*1000
+    people = pd.DataFrame({"univocal_id_actor": [f"nm{i}" for i in range(n_people)]})
+    for col in ["nameSurname", "birthDate", "deathDate", "occupation", "country"]:
+        people[col] = text_column(rng, n_people, col)
+    people["gender"] = rng.choice(["M", "F"], n_people)
+    people["birthYear"] = rng.integers(1850, 2010, n_people).astype(float)
+    pivot = pd.DataFrame({
+        "wikidata_id_movie": movies["wikidata_id_movie"].to_numpy()[rng.integers(0, n_movies, n_pivot)],
+        "univocal_id_actor": people["univocal_id_actor"].to_numpy()[rng.integers(0, n_people, n_pivot)],
+        "role": rng.choice(["actor", "director"], n_pivot, p=[0.9, 0.1]),
+        "character_name": text_column(rng, n_pivot, "character"),
+    })
+    return pivot, people, movies
+
+def run_merge(implementation, tables_path, kwargs):
+    pivot, people, movies = pd.read_pickle(tables_path)
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    result = implementation(pivot, people, movies, *ARGS, **kwargs)
+    elapsed = time.perf_counter() - start
+    # Memory used by the merge on top of the inputs (peak of the process minus peak before the merge)
+    return elapsed, peak_rss_mb() - baseline, result
+
+def check_parity(n_movies=2_000):
+    pivot, people, movies = synthetic_tables(n_movies)
+    movies = pd.concat([movies, movies.head(100)])
+    for columns in [COLUMNS, ["genres", "gender"], ["univocal_id_actor", "genres"], ["wikidata_id_movie"]]:
+        for role in ["any", "director"]:
+            args = ARGS[:4] + (columns, "role", role)
+            expected = merge_movies_cast_full(pivot, people, movies, *args).reset_index(drop=True)
+            for chunk_size in [None, 1_000]:
+                result = merge_movies_cast(pivot, people, movies, *args, chunk_size=chunk_size)
+                pd.testing.assert_frame_equal(result.reset_index(drop=True), expected)
+
+def run(n_movies=200_000):
+    check_parity()
+    runs = [
+        ("previous implementation", merge_movies_cast_full, {}),
+        ("projected, coded keys", merge_movies_cast, {}),
+        ("projected, coded keys, chunks of 500k", merge_movies_cast, {"chunk_size": 500_000}),
+    ]
+    # The tables are generated once and loaded by each run, so that the peak memory of the generation
+    # does not hide the one of the merge
+    tables_path = os.path.join(tempfile.mkdtemp(), "tables.pkl")
+    pd.to_pickle(synthetic_tables(n_movies), tables_path)
+    reference = None
+    print(f"movies: {n_movies}, pivot rows: {15*n_movies}")
+    for name, implementation, kwargs in runs:
+        _, peak, (elapsed, extra, result) = measure_in_subprocess(run_merge, implementation, tables_path, kwargs)
+        result = result.sort_values(COLUMNS).reset_index(drop=True)
+        if reference is None:
+            reference = result
+        else:
+            pd.testing.assert_frame_equal(result, reference)
+        print(f"{name:40s} merge {elapsed:6.2f} s, peak RSS {peak:6.0f} MB ({extra:+.0f} MB over the inputs)")
+    os.remove(tables_path)
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,77 @@
+# Benchmark of multi_hot_dummies against the two ways dummies of comma-separated lists were built in
+# results.ipynb: a per-row loop setting cells with .loc, and explode -> pd.get_dummies -> groupby.apply(agg_bool).
+# Dummies are checked to be identical.
+#
+# Usage: python src/benchmarks/bench_multi_hot.py [n_rows] [n_rows_loop]
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from data_cleaning import multi_hot_dummies, multi_hot_encode
+from data_utils import agg_bool
+
+GENRES = np.array(['music', 'family', 'thriller', 'comedy', 'drama', 'documentary', 'biography', 'western',
+                   'adventure', 'mystery', 'action', 'history', 'war', 'animation', 'crime', 'horror', 'sport',
+                   'romance', 'sci-fi', 'fantasy'])
+
+# Previous implementations, kept as reference
+def dummies_loop(df, tokens_list):
+    dummies = pd.DataFrame({t: False for t in tokens_list}, index=df.index)
+    for i, row in df.iterrows():
+        for t in row["genres"].split(","):
+            if t in tokens_list:
+                dummies.loc[i, t] = True
+    return dummies
+
+def dummies_explode(df):
+    exploded = df.copy()
+    exploded['genres'] = exploded['genres'].apply(lambda x: x.split(sep=','))
+    exploded = exploded.explode('genres').reset_index(drop=True)
+    return pd.get_dummies(exploded, columns=['genres'], drop_first=False).groupby('freebase_id_movie').apply(agg_bool).reset_index(drop=True)
+
+def synthetic_movies(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(1, 4, n_rows)
+    genres = [",".join(rng.choice(GENRES, k, replace=False)) for k in lengths]
+    return pd.DataFrame({"freebase_id_movie": [f"/m/{i:08d}" for i in range(n_rows)], "genres": genres})
+
+def run(n_rows=20_000, n_rows_loop=5_000):
+    df = synthetic_movies(n_rows)
+    small = df.iloc[:n_rows_loop]
+    tokens_list = list(GENRES[:15])
+
+    start = time.perf_counter()
+    reference = dummies_loop(small, tokens_list)
+    loop_time = time.perf_counter() - start
+    start = time.perf_counter()
+    dummies = multi_hot_dummies(small["genres"], vocabulary=tokens_list)
+    fast_loop_time = time.perf_counter() - start
+    assert dummies.equals(reference)
+
+    start = time.perf_counter()
+    reference = dummies_explode(df)
+    explode_time = time.perf_counter() - start
+    start = time.perf_counter()
+    dummies = pd.concat([df[["freebase_id_movie"]], multi_hot_dummies(df["genres"], prefix="genres_")], axis=1)
+    fast_explode_time = time.perf_counter() - start
+    assert dummies.equals(reference.astype(dummies.dtypes.to_dict()))
+
+    start = time.perf_counter()
+    matrix, vocabulary = multi_hot_encode(df["genres"], min_count=n_rows//20)
+    encode_time = time.perf_counter() - start
+
+    print(f"per-row loop ({n_rows_loop} rows):            {loop_time:.2f} s")
+    print(f"multi_hot_dummies ({n_rows_loop} rows):       {fast_loop_time:.3f} s ({loop_time/fast_loop_time:.0f}x)")
+    print(f"explode + get_dummies + agg_bool ({n_rows} rows): {explode_time:.2f} s")
+    print(f"multi_hot_dummies ({n_rows} rows):               {fast_explode_time:.3f} s ({explode_time/fast_explode_time:.0f}x)")
+    print(f"multi_hot_encode, CSR only, min_count {n_rows//20}: {encode_time:.3f} s, "
+          f"{matrix.shape[1]} columns, {matrix.nnz} non-zeros")
+
+if __name__ == "__main__":
+    run(*[int(arg) for arg in sys.argv[1:]])
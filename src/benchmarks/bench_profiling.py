@@ -0,0 +1,95 @@
+# Benchmark of profile_dataset (chunked one-pass profile with sketches) against loading the whole file and
+# computing the exact statistics, on a synthetic dump in the format of the IMDB title.basics file. Peak memory
+# is measured in a fresh process. The approximate statistics are checked against the exact ones: distinct
+# counts within 3%, quantiles within 1% in rank, exact missing ratios and the same most frequent values.
+#
+# Usage: python src/benchmarks/bench_profiling.py [n_rows] [chunk_size]
+
+import csv
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+
+from bench_utils import measure_in_subprocess
+from imdb_filtering import READ_OPTIONS
+from profiling import QUANTILES, profile_dataset
+
+def make_dump(n_rows, path, seed=0):
+    rng = np.random.default_rng(seed)
+    genres = np.array([f"Genre{i}" for i in range(300)])
+    weights = 1/np.arange(1, len(genres) + 1)
+    df = pd.DataFrame({
+        "tconst": np.char.add("tt", np.char.zfill(np.arange(n_rows).astype(str), 7)),
+        "titleType": rng.choice(["tvEpisode", "short", "movie", "video", "tvSeries"], n_rows,
+                                p=[0.5, 0.2, 0.15, 0.1, 0.05]),
+        "isAdult": rng.choice(["0", "1"], n_rows, p=[0.98, 0.02]),
+        "startYear": rng.integers(1890, 2025, n_rows).astype(str),
+        "runtimeMinutes": rng.lognormal(4, 0.6, n_rows).astype(int).astype(str),
+        "genres": rng.choice(genres, n_rows, p=weights/weights.sum()),
+    })
+    df.loc[rng.random(n_rows) < 0.05, "startYear"] = "\\N"
+    df.loc[rng.random(n_rows) < 0.6, "runtimeMinutes"] = "\\N"
+    df.to_csv(path, sep='\t', index=False, quoting=csv.QUOTE_NONE)
+
+def exact_profile(path):
+    df = pd.read_csv(path, **READ_OPTIONS)
+    report = {}
+    for col in df.columns:
+        values = df[col].dropna()
+        numbers = pd.to_numeric(values, errors='coerce')
+        numeric = numbers.notna().all()
+        report[col] = {
+            "missing_ratio": df[col].isna().mean(),
+            "distinct": values.nunique(),
+            "quantiles": np.quantile(numbers, QUANTILES, method='inverted_cdf') if numeric else None,
+            "top": values.value_counts().head(5),
+            "values": np.sort(numbers.to_numpy()) if numeric else None,
+        }
+    return report
+
+def streamed_profile(path, chunk_size):
+    return profile_dataset(path, chunk_size=chunk_size, **READ_OPTIONS)
+
+def check(report, exact):
+    for col, expected in exact.items():
+        row = report.loc[col]
+        assert row["missing_ratio"] == expected["missing_ratio"]
+        assert abs(row["distinct"] - expected["distinct"]) <= 0.03*expected["distinct"] + 1, (col, row["distinct"])
+        # Values seen once are not frequent (the summary does not keep them)
+        top = expected["top"][expected["top"] > 1].index.tolist()[:3]
+        assert [value for value, _ in row["top"]][:len(top)] == top, (col, row["top"])
+        if expected["quantiles"] is not None:
+            # Distance between each quantile and the range of ranks of its estimate
+            values, q = expected["values"], np.array(QUANTILES)
+            estimated = np.array([row[f"q{quantile:g}"] for quantile in QUANTILES])
+            low = np.searchsorted(values, estimated, side='left')/len(values)
+            high = np.searchsorted(values, estimated, side='right')/len(values)
+            error = np.max(np.maximum(np.maximum(low - q, q - high), 0))
+            assert error < 0.01, (col, error)
+
+def run(n_rows=5_000_000, chunk_size=1_000_000):
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, "title.basics.tsv")
+    # Generated in another process, so that the measured processes do not inherit its memory
+    measure_in_subprocess(make_dump, n_rows, path)
+    print(f"rows: {n_rows}, file: {os.path.getsize(path)/2**20:.0f} MB")
+
+    exact_time, exact_peak, exact = measure_in_subprocess(exact_profile, path)
+    stream_time, stream_peak, report = measure_in_subprocess(streamed_profile, path, chunk_size)
+    check(report, exact)
+    print(f"full load + exact statistics: {exact_time:.2f} s, peak {exact_peak:.0f} MB")
+    print(f"profile_dataset (chunks of {chunk_size} rows): {stream_time:.2f} s, peak {stream_peak:.0f} MB")
+    print("Same missing ratios and most frequent values, distinct counts within 3%, quantiles within 1% in rank")
+    os.remove(path)
+    os.rmdir(folder)
+
+if __name__ == "__main__":
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+    chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000
+    run(n_rows, chunk_size)
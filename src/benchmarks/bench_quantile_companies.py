@@ -0,0 +1,100 @@
+# Micro-benchmark of create_quantile_col and extract_primary_company against their previous implementations
+# (one pass per quantile, two apply splits on a full copy of the frame) on a synthetic movie table.
+# Results are checked to be identical.
+#
+# Usage: python src/benchmarks/bench_quantile_companies.py [n_rows]
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from data_utils import create_quantile_col, extract_primary_company
+
+# Previous implementations, kept as reference
+def create_quantile_col_loop(dataset, col_name, quantiles):
+    qs = dataset[col_name].quantile(q=quantiles)
+    qs = np.insert(qs, 0, np.min(dataset[col_name]))
+    qs = np.append(qs, np.max(dataset[col_name]))
+    dataset['quantile'] = np.zeros((len(dataset,)))
+    dataset['quantile'] = (dataset[col_name]==qs[0])*1 + dataset['quantile']
+    for idx in range(0,len(qs)-1):
+        dataset['quantile'] = (dataset[col_name]>qs[idx])*(dataset[col_name]<=qs[idx+1])*(idx+1) + dataset['quantile']
+    return dataset
+
+def extract_primary_company_apply(df, column, columns, n=0, add_count=True):
+    new_df = df.copy()
+    new_df[column] = new_df[column].fillna('')
+    col1_name = 'primary_' + column
+    col2_name = 'secondary_' + column
+    new_df[col1_name] = new_df[column].apply(lambda x: x.split(',')[0] if x else None)
+    new_df[col2_name] = new_df[column].apply(lambda x: ','.join(x.split(',')[1:]) if ',' in x else None)
+    if col1_name not in columns:
+        columns.extend([col1_name])
+    if n==0:
+        new_df['count'] = new_df[col1_name].map(new_df[col1_name].value_counts())
+        new_df = new_df.sort_values(by='count', ascending=False)
+        if not add_count:
+            return new_df[columns]
+        columns.extend(['count'])
+        return new_df[columns]
+    top_n = new_df[col1_name].value_counts().nlargest(n).index
+    new_df = new_df[new_df[col1_name].isin(top_n)]
+    counts = pd.DataFrame(new_df[col1_name].value_counts()).reset_index()
+    new_df = pd.merge(new_df[columns], counts, left_on=col1_name, right_on=col1_name)
+    return new_df.sort_values(by='count', ascending=False)
+
+def synthetic_movies(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    companies = np.array([f"Company {i}" for i in range(5000)])
+    n_companies = rng.integers(0, 4, n_rows)
+    names = rng.choice(companies, n_companies.sum(), p=np.arange(5000, 0, -1)/np.arange(5000, 0, -1).sum())
+    bounds = np.cumsum(n_companies) - n_companies
+    production = [",".join(names[start:start + k]) if k else np.nan for start, k in zip(bounds, n_companies)]
+    df = pd.DataFrame({
+        "production_companies": production,
+        "log_numVotes_imdb": np.round(rng.normal(7, 2, n_rows), 1),
+        "genres": rng.choice(["drama", "comedy", "drama,comedy", "horror"], n_rows),
+        "overview_tmdb": [f"Overview of the movie number {i}" for i in range(n_rows)],
+        "budget": rng.lognormal(15, 2, n_rows),
+    })
+    # Leading commas give an empty primary company
+    df.loc[rng.random(n_rows) < 0.001, "production_companies"] = ",Company 1"
+    df.loc[rng.random(n_rows) < 0.1, "log_numVotes_imdb"] = np.nan
+    return df
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+def run(n_rows=1_000_000):
+    df = synthetic_movies(n_rows)
+
+    for quantiles in [[0.8], [0.25, 0.5, 0.75], [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9]]:
+        old_time, old = timed(create_quantile_col_loop, df[["log_numVotes_imdb"]].copy(), "log_numVotes_imdb", quantiles)
+        new_time, new = timed(create_quantile_col, df[["log_numVotes_imdb"]].copy(), "log_numVotes_imdb", quantiles)
+        pd.testing.assert_frame_equal(new, old)
+        print(f"create_quantile_col ({len(quantiles)} quantiles): loop {old_time:.2f} s, searchsorted {new_time:.2f} s")
+
+    # Ties on the quantile edges
+    ties = pd.DataFrame({"x": np.repeat([1.0, 2.0, 2.0, 3.0, np.nan], 1000)})
+    pd.testing.assert_frame_equal(create_quantile_col(ties.copy(), "x", [0.2, 0.5, 0.6]),
+                                  create_quantile_col_loop(ties.copy(), "x", [0.2, 0.5, 0.6]))
+
+    for n, add_count in [(0, True), (0, False), (10, True), (20, True)]:
+        old_columns, new_columns = ["log_numVotes_imdb", "genres"], ["log_numVotes_imdb", "genres"]
+        old_time, old = timed(extract_primary_company_apply, df, "production_companies", old_columns, n=n, add_count=add_count)
+        new_time, new = timed(extract_primary_company, df, "production_companies", new_columns, n=n, add_count=add_count)
+        pd.testing.assert_frame_equal(new, old)
+        assert new_columns == old_columns
+        print(f"extract_primary_company (n={n}, add_count={add_count}): apply {old_time:.2f} s, partition {new_time:.2f} s")
+
+    print(f"rows: {n_rows}, same outputs as the previous implementations")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,76 @@
+# Micro-benchmark of compute_roi and compute_age against their previous row-wise implementations
+# on a synthetic movie x cast table. Results are checked to be identical.
+#
+# Usage: python src/benchmarks/bench_roi_age.py [n_rows]
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from data_utils import compute_age, compute_roi
+
+# Previous implementations, kept as reference
+def compute_age_apply(df, birth_year_col, release_year_col, new_col, liminf=18, limsup=70):
+    new_data = df.copy()
+    new_data[new_col] = new_data[release_year_col] - new_data[birth_year_col]
+    new_data[new_col] = new_data[new_col].apply(lambda x: x if x>=liminf and x<=limsup else np.nan)
+    return new_data
+
+def compute_roi_apply(df, revenue_col, budget_col):
+    new_df = df
+    new_df['roi_perctg'] = df.apply(lambda row: row[revenue_col]/row[budget_col]*100 if not np.isnan(row[revenue_col])
+                                        and not np.isnan(row[budget_col])
+                                        and row[budget_col]!=0
+                                        else np.nan, axis=1)
+    return new_df
+
+def synthetic_table(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "revenue": rng.lognormal(16, 2, n_rows),
+        "budget": rng.lognormal(15, 2, n_rows),
+        "release_year": rng.integers(1920, 2024, n_rows).astype(float),
+        "year_of_birth": rng.integers(1850, 2010, n_rows).astype(float),
+    })
+    for col, ratio in [("revenue", 0.5), ("budget", 0.4), ("year_of_birth", 0.2)]:
+        df.loc[rng.random(n_rows) < ratio, col] = np.nan
+    df.loc[rng.random(n_rows) < 0.05, "budget"] = 0
+    return df
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+def run(n_rows=5_000_000):
+    df = synthetic_table(n_rows)
+
+    old_age_time, old_age = timed(compute_age_apply, df, "year_of_birth", "release_year", "age")
+    new_age_time, new_age = timed(compute_age, df, "year_of_birth", "release_year", "age")
+    inplace_age_time, _ = timed(compute_age, df.copy(), "year_of_birth", "release_year", "age", 18, 70, True)
+    pd.testing.assert_series_equal(new_age["age"], old_age["age"])
+
+    old_roi_time, old_roi = timed(compute_roi_apply, df.copy(), "revenue", "budget")
+    new_roi_time, new_roi = timed(compute_roi, df, "revenue", "budget")
+    inplace_roi_time, _ = timed(compute_roi, df.copy(), "revenue", "budget", True)
+    pd.testing.assert_series_equal(new_roi["roi_perctg"], old_roi["roi_perctg"])
+    assert "roi_perctg" not in df.columns
+
+    # Nullable inputs give nullable outputs
+    nullable = df.head(1000).astype({"year_of_birth": "Int64", "release_year": "Int64", "budget": "Float64"})
+    assert compute_age(nullable, "year_of_birth", "release_year", "age")["age"].dtype == "Int64"
+    assert compute_roi(nullable, "revenue", "budget")["roi_perctg"].dtype == "Float64"
+
+    print(f"rows: {n_rows}")
+    print(f"compute_age: apply {old_age_time:.2f} s, columnar {new_age_time:.2f} s, "
+          f"columnar in place {inplace_age_time:.2f} s")
+    print(f"compute_roi: apply {old_roi_time:.2f} s, columnar {new_roi_time:.2f} s, "
+          f"columnar in place {inplace_roi_time:.2f} s")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000)
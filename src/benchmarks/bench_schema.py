@@ -0,0 +1,96 @@
+# Benchmark of the dataset schemas: memory of the datasets read with the
+# default dtypes of pd.read_csv and with read_dataset, plus load time and
+# peak memory of both. Without a data folder, synthetic movie_actor_complete
+# and title.principals.onlymovies files are generated.
+#
+# Usage: python src/benchmarks/bench_schema.py [N_ROWS] [DATA_PATH]
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from bench_utils import measure_in_subprocess
+from schema import memory_report, read_dataset
+
+DATASETS = ["movies_complete.tsv", "people_complete.tsv", "movie_actor_complete.tsv",
+            "title.principals.onlymovies.tsv", "title.basics.onlymovies.tsv"]
+
+def make_datasets(n_rows, folder, seed=0):
+    rng = np.random.default_rng(seed)
+    n_movies, n_people = n_rows//10, n_rows//4
+    movie = rng.integers(0, n_movies, n_rows)
+    person = rng.integers(0, n_people, n_rows)
+    ids = lambda prefix, values, width=7: pd.Series(values).map(lambda x: f"{prefix}{x:0{width}d}")
+    role = rng.choice(["actor", "director"], n_rows, p=[0.9, 0.1])
+    movie_actor = pd.DataFrame({
+        "freebase_id_movie": ids("/m/0", movie, 6),
+        "wikidata_id_movie": ids("http://www.wikidata.org/entity/Q", movie),
+        "wikipedia_id_movie": np.where(rng.random(n_rows) < 0.8, movie + 1000, np.nan),
+        "imdb_id_movie": ids("tt", movie),
+        "title_movie": ids("Title of the movie ", movie),
+        "univocal_id_actor": ids("nm", person),
+        "freebase_id_actor": ids("/m/0", person, 6).where(rng.random(n_rows) < 0.7),
+        "wikidata_id_actor": ids("http://www.wikidata.org/entity/Q", person),
+        "imdb_id_actor": ids("nm", person),
+        "name_actor": ids("Name Surname ", person),
+        "role": role,
+        "character_name": ids("Character ", rng.integers(0, n_rows, n_rows)).where(role == "actor"),
+        "ordering": np.where(rng.random(n_rows) < 0.6, rng.integers(1, 30, n_rows), np.nan),
+    })
+    movie_actor.to_csv(os.path.join(folder, "movie_actor_complete.tsv"), sep='\t', index=False)
+
+    principals = pd.DataFrame({
+        "tconst": ids("tt", np.sort(movie)),
+        "ordering": rng.integers(1, 30, n_rows),
+        "nconst": ids("nm", person),
+        "category": rng.choice(["actor", "actress", "director", "writer", "producer", "composer", "self"], n_rows),
+        "job": rng.choice(["producer", "screenplay", "director of photography"], n_rows).astype(object),
+        "characters": ids("[\"Character ", rng.integers(0, n_rows, n_rows)) + "\"]",
+    })
+    principals.loc[rng.random(n_rows) < 0.7, "job"] = np.nan
+    principals.to_csv(os.path.join(folder, "title.principals.onlymovies.tsv"), sep='\t', index=False)
+    return [os.path.join(folder, name) for name in ["movie_actor_complete.tsv", "title.principals.onlymovies.tsv"]]
+
+def load_default(path):
+    return len(pd.read_csv(path, sep='\t', low_memory=False))
+
+def load_schema(path):
+    return len(read_dataset(path))
+
+def check_parity(path):
+    # Same values as the default read, compared as strings with missing values aligned
+    default = pd.read_csv(path, sep='\t', low_memory=False)
+    df = read_dataset(path)
+    assert list(default.columns) == list(df.columns)
+    for col in df.columns:
+        a = default[col].astype(object).where(default[col].notna())
+        b = df[col].astype(object).where(df[col].notna())
+        numeric = pd.api.types.is_numeric_dtype(default[col])
+        if numeric:
+            a, b = pd.to_numeric(a), pd.to_numeric(b)
+        assert a.isna().equals(b.isna()), col
+        assert (a[a.notna()] == b[b.notna()]).all(), col
+
+def run(paths):
+    report = memory_report(paths)
+    print(report.to_string(index=False, float_format="{:.1f}".format))
+    for path in paths:
+        check_parity(path)
+        for mode, func in [("read_csv", load_default), ("read_dataset", load_schema)]:
+            elapsed, peak, _ = measure_in_subprocess(func, path)
+            print(f"{os.path.basename(path):35s} {mode:13s} {elapsed:6.2f} s, peak {peak:7.0f} MB")
+    print("Same values as pd.read_csv")
+
+if __name__ == "__main__":
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    if len(sys.argv) > 2:
+        paths = [os.path.join(sys.argv[2], name) for name in DATASETS if os.path.exists(os.path.join(sys.argv[2], name))]
+        run(paths)
+    else:
+        with tempfile.TemporaryDirectory() as folder:
+            run(make_datasets(n_rows, folder))
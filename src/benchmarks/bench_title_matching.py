@@ -0,0 +1,114 @@
+# Benchmark of the blocking-based title matcher (match_titles) on synthetic
+# title tables: a reference table of N_RIGHT titles and a table of titles
+# taken from it with typos, punctuation changes and shifted years. The
+# exact title_year key join is the baseline; on a small sample the scores
+# are checked against a brute-force comparison of all the pairs, and titles
+# that are empty once cleaned are checked not to be matched.
+#
+# Usage: python src/benchmarks/bench_title_matching.py [N_RIGHT] [N_LEFT]
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from auxiliary_functions_for_merging import clean_column, create_key_series
+from title_matching import match_titles, title_ngrams
+
+SYLLABLES = ["ka", "lo", "mi", "ren", "tor", "an", "bel", "cu", "dra", "el", "fin", "gor", "ha", "is", "jun",
+             "ke", "lan", "mor", "nu", "or", "pe", "qui", "ra", "sol", "ti", "ul", "ve", "wy", "xe", "zo"]
+
+def make_titles(n_rows, rng):
+    vocabulary = np.array(["".join(rng.choice(SYLLABLES, rng.integers(1, 4))) for _ in range(20000)])
+    vocabulary = np.concatenate([vocabulary, ["The", "of", "and", "Love", "Night", "II", "Return"]])
+    n_words = rng.integers(1, 5, n_rows)
+    words = rng.choice(vocabulary, n_words.sum())
+    bounds = np.cumsum(n_words) - n_words
+    return [" ".join(words[start:start + k]).capitalize() for start, k in zip(bounds, n_words)]
+
+def perturb(title, rng):
+    # One typo (substitution, deletion or insertion), sometimes punctuation
+    chars = list(title)
+    i = rng.integers(0, len(chars))
+    kind = rng.integers(0, 3)
+    if kind == 0:
+        chars[i] = chr(rng.integers(97, 123))
+    elif kind == 1 and len(chars) > 1:
+        del chars[i]
+    else:
+        chars.insert(i, chr(rng.integers(97, 123)))
+    title = "".join(chars)
+    return title + ": Part" if rng.random() < 0.05 else title.replace(" ", " - ", 1)
+
+def make_tables(n_right, n_left, seed=0):
+    rng = np.random.default_rng(seed)
+    right = pd.DataFrame({"title": make_titles(n_right, rng), "year": rng.integers(1900, 2024, n_right).astype(float)})
+    source = rng.choice(n_right, n_left, replace=False)
+    titles = [perturb(title, rng) if rng.random() < 0.8 else title.upper()
+              for title in right["title"].to_numpy()[source]]
+    years = right["year"].to_numpy()[source] + rng.choice([-1, 0, 0, 0, 1], n_left)
+    left = pd.DataFrame({"title": titles, "year": years, "truth": source}, index=np.arange(n_left) + 10**7)
+    return left, right
+
+def brute_force_scores(left, right, year_tolerance=1):
+    # Dice coefficient of all the pairs within the year tolerance (dense, small samples only)
+    titles = np.concatenate([clean_column(left["title"]), clean_column(right["title"])]).astype(str)
+    ngrams = title_ngrams(titles).astype(np.float64)
+    sizes = np.asarray(ngrams.sum(axis=1)).ravel()
+    common = (ngrams[:len(left)] @ ngrams[len(left):].T).toarray()
+    scores = 2*common/(sizes[:len(left), None] + sizes[None, len(left):])
+    close = np.abs(left["year"].to_numpy()[:, None] - right["year"].to_numpy()[None, :]) <= year_tolerance
+    return np.where(close, scores, -1)
+
+def run(n_right, n_left):
+    left, right = make_tables(n_right, n_left)
+
+    start = time.perf_counter()
+    left_keys = create_key_series(left, ["title", "year"])
+    right_keys = pd.Series(create_key_series(right, ["title", "year"]))
+    exact = left_keys.map(pd.Series(right.index, index=right_keys).drop_duplicates().pipe(lambda s: s[~s.index.duplicated()]))
+    exact_time = time.perf_counter() - start
+    exact_recall = (exact.to_numpy() == left["truth"].to_numpy()).mean()
+    print(f"exact title_year key join:  {exact_time:6.2f} s, recall {exact_recall:.3f}")
+
+    start = time.perf_counter()
+    matches = match_titles(left, right, "title", "year", "title", "year", min_score=0.5)
+    elapsed = time.perf_counter() - start
+    found = matches.set_index("left")["right"].reindex(left.index)
+    recall = (found.to_numpy() == left["truth"].to_numpy()).mean()
+    precision = (found.dropna().to_numpy() == left.loc[found.dropna().index, "truth"].to_numpy()).mean()
+    print(f"match_titles ({n_left} x {n_right}): {elapsed:6.2f} s, recall {recall:.3f}, precision {precision:.3f}")
+
+    # Scores equal the brute-force ones, and blocking misses few best matches
+    sample_left, sample_right = left.iloc[:1000], right.iloc[:20000]
+    sample_left = sample_left[sample_left["truth"] < len(sample_right)]
+    sample_left = pd.concat([sample_left, left.iloc[1000:2000]])
+    sample = match_titles(sample_left, sample_right, "title", "year", "title", "year", min_score=0.5)
+    scores = brute_force_scores(sample_left, sample_right)
+    rows = sample_left.index.get_indexer(sample["left"])
+    assert np.allclose(sample["score"].to_numpy(), scores[rows, sample["right"].to_numpy()])
+    best = scores.max(axis=1)
+    has_match = best >= 0.5
+    found_best = pd.Series(sample["score"].to_numpy(), index=rows).reindex(np.flatnonzero(has_match)).to_numpy()
+    print(f"brute force sample: scores identical, best match found for "
+          f"{np.isclose(found_best, best[has_match]).mean():.3f} of {has_match.sum()} rows with a match >= 0.5")
+
+def check_short_titles():
+    # Titles that are empty once cleaned only have padding n-grams, they must not be matched, while short titles
+    # still have n-grams with real characters
+    left = pd.DataFrame({"title": ["七人の侍", "?!", "Up", "M", "Rashomon"], "year": [1954, 2001, 2009, 1931, 1950]})
+    right = pd.DataFrame({"title": ["Ночь", "...!", "Up", "M", "Rashomon"], "year": [1954, 2001, 2009, 1931, 1950]})
+    matches = match_titles(left, right, "title", "year", "title", "year")
+    assert matches[["left", "right"]].values.tolist() == [[2, 2], [3, 3], [4, 4]], matches
+    print("titles empty once cleaned are not matched, short titles are")
+
+if __name__ == "__main__":
+    n_right = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    n_left = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    check_short_titles()
+    run(n_right, n_left)
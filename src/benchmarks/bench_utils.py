@@ -0,0 +1,79 @@
+# Helpers shared by the benchmark scripts.
+
+import multiprocessing
+import queue as queue_module
+import sys
+import time
+import traceback
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Seconds between two checks that the measured process is still alive
+POLL_SECONDS = 1
+
+def peak_rss_mb():
+    """
+    Peak resident memory of the current process in MB (NaN when
+    not available on the platform).
+    """
+    if resource is None:
+        return float('nan')
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak/2**20 if sys.platform == 'darwin' else peak/2**10
+
+def _measure(queue, func, args):
+    # Errors are sent back as text, to be raised by the parent
+    try:
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        queue.put((None, (elapsed, peak_rss_mb(), result)))
+    except Exception:
+        queue.put((traceback.format_exc(), None))
+
+def measure_in_subprocess(func, *args, timeout=None):
+    """
+    Run func(*args) in a fresh process, so that the measured peak
+    memory is not affected by previous runs. An exception is raised
+    if func raises, if the process dies without a result (e.g.
+    killed when out of memory) or if it runs longer than timeout.
+
+    Args:
+        func: picklable function, its result must be picklable too
+        args: arguments of func
+        timeout: maximum wall time in seconds (default None, i.e.
+        no limit)
+
+    Returns:
+        elapsed: wall time in seconds
+        peak_rss: peak resident memory of the process in MB
+        result: value returned by func
+
+    """
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_measure, args=(queue, func, args))
+    process.start()
+    start = time.perf_counter()
+    received = False
+    try:
+        # The result is read before joining: a process with a large result in the queue does not exit
+        while not received:
+            try:
+                error, measures = queue.get(timeout=POLL_SECONDS)
+                received = True
+            except queue_module.Empty:
+                if not process.is_alive() and queue.empty():
+                    raise Exception(f"{func.__name__} died without a result (exit code {process.exitcode})")
+                if timeout is not None and time.perf_counter() - start > timeout:
+                    raise Exception(f"{func.__name__} did not finish in {timeout} s")
+    finally:
+        if not received:
+            process.terminate()
+        process.join()
+    if error is not None:
+        raise Exception(f"{func.__name__} failed in the measured process:\n{error}")
+    return measures
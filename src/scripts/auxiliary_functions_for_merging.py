@@ -1,10 +1,27 @@
+import json
+import unicodedata
+from datetime import datetime
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Column-wise combine utilities, shared with the analysis notebook (src/utils must be on the path)
+from data_utils import coalesce, union_comma_sep
+
 # Function to print missing statistics for each column in the DataFrame
 def print_missing_stats(df):
     print("total len:", len(df))
-    for col in df.columns:
-        print("missing " + col + ":", sum(df[col].isna()))
+    for col, n_missing in df.isna().sum().items():
+        print("missing " + col + ":", n_missing)
+
+# Maximum number of strings whose normalization is cached (the same titles and names are cleaned by every merge)
+NORMALIZATION_CACHE_SIZE = 2**20
 
 # Function to convert text to ASCII, removing any special characters or accents
+@lru_cache(maxsize=NORMALIZATION_CACHE_SIZE)
 def make_text_ASCII(text):    
     normalized_text = unicodedata.normalize('NFKD', text)
     ascii_text = normalized_text.encode('ascii', 'ignore').decode('utf-8')
@@ -35,11 +52,72 @@ def create_key(elements):
     key = "_".join(output_list)
     return key
 
-# Function to create a series of keys based on specified columns in a DataFrame
-def create_key_series(df, columns):
+# Function to create a series of keys based on specified columns in a DataFrame, one row at a time
+# (reference implementation of create_key_series)
+def create_key_series_rowwise(df, columns):
     columns = ensure_iterable(columns)
     return df.apply(lambda row: create_key([row[col] for col in columns]), axis=1)
 
+# Translation table deleting all the characters in chars_to_remove
+chars_to_remove_table = str.maketrans('', '', chars_to_remove)
+
+# Function to clean a string as clean_string does, normalizing only the strings that are not already ASCII
+@lru_cache(maxsize=NORMALIZATION_CACHE_SIZE)
+def clean_string_fast(input_str):
+    cleaned_str = input_str.translate(chars_to_remove_table).lower()
+    if cleaned_str.isascii():
+        return cleaned_str
+    return make_text_ASCII(cleaned_str)
+
+# Function to clean a whole column: each distinct value is converted to string and cleaned only once
+def clean_column(values):
+    if values.dtype == object:
+        # Stringify before factorizing, otherwise values like 1999 and 1999.0 would share the same code
+        values = values.astype(str)
+    codes, uniques = pd.factorize(values)
+    cleaned_uniques = np.array([clean_string_fast(str(u)) for u in uniques] + [""], dtype=object)
+    return cleaned_uniques[codes]
+
+# Function to create a series of keys based on specified columns in a DataFrame, working column-at-a-time.
+# Returns the same keys as create_key_series_rowwise: if any of the columns is missing the key is pd.NA
+def create_key_series(df, columns):
+    columns = ensure_iterable(columns)
+    missing = np.zeros(len(df), dtype=bool)
+    keys = None
+    for col in columns:
+        missing |= df[col].isna().to_numpy()
+        cleaned = clean_column(df[col])
+        keys = cleaned if keys is None else keys + "_" + cleaned
+    keys[missing] = pd.NA
+    return pd.Series(keys, index=df.index, dtype=object)
+
+# Function to set to missing the keys that appear more than once
+def remove_duplicated_keys(keys):
+    return keys.where(~keys.duplicated(keep=False), pd.NA)
+
+# Function to merge two datasets first by ID and then, for the rows of left without a match, using the key
+# title_year_key (both datasets must have it, with duplicated keys already removed). All the rows of left with
+# a key are kept, with or without a match. With fuzzy = (left_title, left_year, right_title, right_year), the rows
+# of left still without a match are then matched to the remaining rows of right by similar title and close year
+# (see match_titles in title_matching.py), keeping only matches with a score of at least min_score
+def merge_by_id_then_key(left, right, left_on, right_on, suffixes, fuzzy=None, min_score=0.9):
+    df1 = pd.merge(left, right, left_on=left_on, right_on=right_on, how="inner", suffixes=suffixes)
+    rest_of_left = left[~left[left_on].isin(df1[left_on])].dropna(subset=["title_year_key"])
+    df2 = pd.merge(rest_of_left, right, left_on="title_year_key", right_on="title_year_key", how="left", suffixes=suffixes)
+    if fuzzy is None:
+        return pd.concat([df1, df2])
+
+    # Imported here since title_matching imports this module
+    from title_matching import match_titles, one_to_one
+    unmatched = rest_of_left[~rest_of_left["title_year_key"].isin(right["title_year_key"])].reset_index(drop=True)
+    candidates = right[~right[right_on].isin(df1[right_on]) & ~right["title_year_key"].isin(rest_of_left["title_year_key"])]
+    candidates = candidates.reset_index(drop=True)
+    matches = one_to_one(match_titles(unmatched, candidates, *fuzzy, min_score=min_score))
+    df3 = pd.merge(unmatched.loc[matches["left"]].reset_index(drop=True), candidates.loc[matches["right"]].reset_index(drop=True),
+                   left_index=True, right_index=True, suffixes=suffixes)
+    df2 = df2[~df2["title_year_key"].isin(unmatched.loc[matches["left"], "title_year_key"])]
+    return pd.concat([df1, df2, df3])
+
 # Function to extract the year from a string
 def extract_year(text):
     try:
@@ -109,6 +187,66 @@ def select_date(dates):
             return part[:10]
     return parts[0][:4]
 
+# Regular expression of the dates accepted by datetime.strptime(x, "%Y-%m-%d") (month and day can have one digit)
+STRPTIME_DATE_REGEX = r"^(?P<year>[0-9]{4})-(?P<month>1[0-2]|0[1-9]|[1-9])-(?P<day>3[01]|[12][0-9]|0[1-9]|[1-9]| [1-9])$"
+DAYS_IN_MONTH = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+# Function to convert a Series to pyarrow strings (whose .str methods are not Python loops), values that
+# are not strings become missing
+def as_strings(values):
+    values = values.astype(object)
+    if pd.api.types.infer_dtype(values, skipna=True) not in ["string", "empty"]:
+        values = values.where(values.map(lambda x: isinstance(x, str)), None)
+    return values.astype("string[pyarrow]")
+
+# Column-wise version of extract_year (nullable integer Series)
+def extract_year_column(values):
+    head = as_strings(values).str[:4]
+    years = head.where(head.str.fullmatch("[0-9]{4}").fillna(False)).astype("Int64")
+    return years.where((years >= 1750) & (years <= 2024), pd.NA)
+
+# Column-wise version of is_valid_date (boolean Series)
+def is_valid_date_column(values):
+    values = as_strings(values)
+    fields = pc.extract_regex(pa.array(values.array), STRPTIME_DATE_REGEX)
+    valid = fields.is_valid().to_numpy(zero_copy_only=False)
+    fields = fields.filter(fields.is_valid())
+    year, month, day = [pc.utf8_trim_whitespace(fields.field(name)).cast("int64").to_numpy()
+                        for name in ["year", "month", "day"]]
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    days = DAYS_IN_MONTH[month - 1] + ((month == 2) & leap)
+    valid[valid] = (year >= 1) & (day <= days)
+    return pd.Series(valid, index=values.index)
+
+# Column-wise version of select_date
+def select_date_column(dates):
+    dates = as_strings(dates)
+    dates = dates.where(dates != "")
+    # First 10 characters of the first date
+    heads = dates.str[:10].str.replace(",.*", "", regex=True)
+    result = heads.where(~heads.str.endswith("-01-01").fillna(False), heads.str[:4]).astype(object).to_numpy()
+
+    # Rows with several dates: the first one which is not the 1st of January, if any
+    multiple = np.flatnonzero(dates.str.contains(",", regex=False).fillna(False).to_numpy())
+    if len(multiple) > 0:
+        parts = dates.iloc[multiple].set_axis(multiple).str.split(",").explode().astype("string[pyarrow]").str[:10]
+        chosen = parts[~parts.str.endswith("-01-01")].groupby(level=0, sort=False).first()
+        result[chosen.index.to_numpy()] = chosen.to_numpy()
+
+    return pd.Series(result, index=dates.index)
+
+# Function to normalize a column of (comma-separated) dates in a single stage. It returns the columns:
+# "date" (date if it is in the format "YYYY-MM-DD", missing otherwise), "year" (as extract_year) and "valid"
+# (as is_valid_date). With select=True each value is first reduced to one date as in select_date
+def parse_dates(dates, select=True):
+    selected = select_date_column(dates) if select else as_strings(dates)
+    valid = is_valid_date_column(selected)
+    return pd.DataFrame({
+        "date": selected.where(valid.to_numpy(), pd.NA),
+        "year": extract_year_column(selected),
+        "valid": valid,
+    }, index=dates.index)
+
 # Function to map gender strings to codes ("M" for male, "F" for female)
 def select_gender(x):
     if x == "male":
@@ -116,4 +254,46 @@ def select_gender(x):
     elif x == "female":
         return "F"
     else:
-        return pd.NA
\ No newline at end of file
+        return pd.NA
+
+# Function to create a name key that is missing when the same key appears more than once in the same movie
+# (the key of missing names is the string "<NA>", as in the per-movie implementation)
+def create_unique_name_key(df, movie_col, name_col):
+    keys = create_key_series(df, name_col).astype(str)
+    counts = keys.groupby([df[movie_col].to_numpy(), keys.to_numpy()]).transform('size')
+    return keys.where(counts == 1, pd.NA)
+
+# Function to merge the Wikidata and MovieSummaries casts. For each movie, Wikidata cast members are matched to
+# MovieSummaries ones first by freebase ID and then, for the remaining ones, by actor name. Movies only present
+# in MovieSummaries are kept as they are, translating their freebase ID into the IMDB one with translator
+# (a pd.Series indexed by freebase IDs). All the movies are processed at once by joining on (movie, key) pairs.
+def merge_casts(cast_wikidata, cast_original, translator):
+    wikidata_cols = list(cast_wikidata.columns)
+    wikidata = cast_wikidata.dropna(subset=["freebase_id_movie"]).copy()
+    original = cast_original.dropna(subset=["freebase_id_movie"]).copy()
+    wikidata["name_key"] = create_unique_name_key(wikidata, "freebase_id_movie", "name_actor")
+    original["name_key"] = create_unique_name_key(original, "freebase_id_movie", "name_actor")
+
+    in_wikidata = original["freebase_id_movie"].isin(wikidata["freebase_id_movie"])
+    only_original = original[~in_wikidata].drop(columns="name_key")
+    original = original[in_wikidata].drop(columns="role")
+
+    # Match by freebase ID of the actor
+    df1 = pd.merge(wikidata, original, on=["freebase_id_movie", "freebase_id_actor"], how="inner", suffixes=('', '_orig'))
+
+    # Match the rest by name key (anti-join on the (movie, actor) pairs matched above)
+    matched = pd.MultiIndex.from_frame(df1[["freebase_id_movie", "freebase_id_actor"]])
+    is_matched = pd.MultiIndex.from_frame(wikidata[["freebase_id_movie", "freebase_id_actor"]]).isin(matched)
+    rest_of_wikidata = wikidata[~is_matched].dropna(subset=["name_key"])
+    df2 = pd.merge(rest_of_wikidata, original, on=["freebase_id_movie", "name_key"], how="left", suffixes=('', '_orig'))
+
+    df = pd.concat([df1, df2], ignore_index=True)
+    for col in ["name_actor", "character_name", "freebase_id_actor"]:
+        df[col] = df[col].where(df[col].notna(), df[col + "_orig"])
+    df = df[wikidata_cols + ["wikipedia_id_movie"]]
+
+    # Movies that only appear in MovieSummaries
+    translator = translator[~translator.index.duplicated()]
+    only_original["imdb_id_movie"] = only_original["freebase_id_movie"].map(translator)
+
+    return pd.concat([df, only_original], ignore_index=True)
@@ -0,0 +1,214 @@
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+# Namespace of the univocal IDs (each univocal ID is also stored as an ID of itself)
+UNIVOCAL = "univocal"
+
+
+class IdStore:
+    """
+    On-disk store of the IDs of the same entities in different
+    sources (e.g. freebase, imdb and wikidata IDs of the actors),
+    kept in a SQLite table (namespace, id, univocal) indexed both by
+    (namespace, id) and by (univocal, namespace). Whole columns are
+    translated at once: their values are loaded in a temporary table
+    and translated with a single indexed join, instead of one lookup
+    per row. The key of the source the store was last rebuilt from
+    (see file_key) is kept with the IDs, so that a store whose
+    source did not change is not rebuilt.
+    """
+
+    def __init__(self, path=":memory:"):
+        """
+        Open the store, creating it if it does not exist.
+
+        Args:
+            path: path of the SQLite file (default ":memory:", i.e.
+            a store that is not saved)
+
+        """
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS ids (namespace TEXT, id TEXT, univocal TEXT, PRIMARY KEY (namespace, id))
+                WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS ids_univocal ON ids (univocal, namespace);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+
+    def close(self):
+        """
+        Close the connection to the store.
+        """
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def clear(self):
+        """
+        Remove all the IDs of the store.
+        """
+        with self.connection:
+            self.connection.execute("DELETE FROM ids")
+            self.connection.execute("DELETE FROM meta WHERE key = 'source'")
+
+    def add(self, df, columns, univocal_col):
+        """
+        Add the IDs of the rows of a DataFrame. An ID already in the
+        store keeps its univocal ID (the first one added wins).
+
+        Args:
+            df: pandas DataFrame with one row per entity
+            columns: dictionary {column: namespace} of the ID columns
+            univocal_col: column of the univocal IDs
+
+        Returns:
+            n_added: number of IDs added
+
+        """
+        before = self._count()
+        with self.connection:
+            self._insert(df, columns, univocal_col)
+            # The store no longer matches the source it was rebuilt from
+            self.connection.execute("DELETE FROM meta WHERE key = 'source'")
+        return self._count() - before
+
+    def source_key(self):
+        """
+        Key of the source the store was last rebuilt from.
+
+        Returns:
+            key: string, None if the store was never rebuilt
+
+        """
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+        return None if row is None else row[0]
+
+    def rebuild(self, df, columns, univocal_col, source_key):
+        """
+        Replace all the IDs of the store with the IDs of the rows of
+        a DataFrame, in a single transaction, and record the key of
+        their source.
+
+        Args:
+            df: pandas DataFrame with one row per entity
+            columns: dictionary {column: namespace} of the ID columns
+            univocal_col: column of the univocal IDs
+            source_key: key of the source of df (see file_key)
+
+        """
+        with self.connection:
+            self.connection.execute("DELETE FROM ids")
+            self._insert(df, columns, univocal_col)
+            self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('source', ?)", (source_key,))
+
+    def translate(self, values, source, target=UNIVOCAL):
+        """
+        Translate a column of IDs from one namespace to another.
+
+        Args:
+            values: pandas Series of IDs of the source namespace
+            source: namespace of the values
+            target: namespace of the translated IDs (default the
+            univocal IDs)
+
+        Returns:
+            translated: pandas Series (same index as values) with the
+            IDs of the target namespace, missing when the value is
+            missing or not in the store
+
+        """
+        # Each distinct value is looked up once
+        codes, uniques = pd.factorize(values)
+        translated_uniques = np.full(len(uniques) + 1, pd.NA, dtype=object)
+        with self.connection:
+            self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS lookup (code INTEGER PRIMARY KEY, id TEXT)")
+            self.connection.execute("DELETE FROM temp.lookup")
+            self.connection.executemany("INSERT INTO temp.lookup (code, id) VALUES (?, ?)",
+                                        enumerate(pd.Series(uniques).astype(str).tolist()))
+            if target == UNIVOCAL:
+                # (namespace, id) is the primary key, a single join is enough
+                found = self.connection.execute("""
+                    SELECT lookup.code, source.univocal
+                    FROM temp.lookup AS lookup
+                    JOIN ids AS source ON source.namespace = ? AND source.id = lookup.id
+                """, (source,)).fetchall()
+            else:
+                found = self.connection.execute("""
+                    SELECT lookup.code, MIN(target.id)
+                    FROM temp.lookup AS lookup
+                    JOIN ids AS source ON source.namespace = ? AND source.id = lookup.id
+                    JOIN ids AS target ON target.univocal = source.univocal AND target.namespace = ?
+                    GROUP BY lookup.code
+                """, (source, target)).fetchall()
+            self.connection.execute("DELETE FROM temp.lookup")
+        if found:
+            found_codes, found_ids = zip(*found)
+            translated_uniques[list(found_codes)] = found_ids
+        # Missing values have code -1, i.e. the last (missing) element
+        translated = translated_uniques[codes]
+        return pd.Series(translated, index=values.index)
+
+    def resolve(self, df, columns, target=UNIVOCAL):
+        """
+        Translate each row of a DataFrame using the first of its ID
+        columns that is in the store.
+
+        Args:
+            df: pandas DataFrame
+            columns: dictionary {column: namespace} of the ID columns,
+            in order of priority
+            target: namespace of the translated IDs (default the
+            univocal IDs)
+
+        Returns:
+            translated: pandas Series (same index as df), missing when
+            none of the IDs of the row is in the store
+
+        """
+        translated = pd.Series(pd.NA, index=df.index, dtype=object)
+        for col, namespace in columns.items():
+            missing = translated.isna()
+            if not missing.any():
+                break
+            translated[missing] = self.translate(df.loc[missing, col], namespace, target).to_numpy()
+        return translated
+
+    def _insert(self, df, columns, univocal_col):
+        # Insert the IDs of each column and the univocal IDs, in the current transaction
+        univocal = df[univocal_col]
+        for col, namespace in list(columns.items()) + [(univocal_col, UNIVOCAL)]:
+            valid = (df[col].notna() & univocal.notna()).to_numpy()
+            rows = zip(df.loc[valid, col].astype(str), univocal[valid].astype(str))
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO ids (namespace, id, univocal) VALUES (?, ?, ?)",
+                ((namespace, value, target) for value, target in rows))
+
+    def _count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM ids").fetchone()[0]
+
+
+def file_key(path):
+    """
+    Key of the version of a file, from its size and modification
+    time (to check whether a store is up to date with its source
+    without reading it).
+
+    Args:
+        path: path of the file
+
+    Returns:
+        key: string
+
+    """
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
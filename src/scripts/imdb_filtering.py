@@ -0,0 +1,329 @@
+import argparse
+import csv
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Title types considered as movies
+MOVIE_TITLE_TYPES = ["movie", "tvMovie"]
+
+# Rows read to estimate the in-memory size of a row of each file
+SAMPLE_ROWS = 10_000
+# Peak memory of read_csv + filtering + to_csv with respect to the parsed chunk
+PARSING_OVERHEAD = 4
+# Minimum number of rows per chunk
+MIN_CHUNK_ROWS = 1_000
+
+# Options used to read every IMDB dump: all columns are kept as strings, "\N" is the only
+# missing value marker and quotes are not special characters (IMDB does not escape them)
+READ_OPTIONS = dict(sep='\t', dtype=str, na_values="\\N", keep_default_na=False, quoting=csv.QUOTE_NONE)
+
+# Key column of each dump on which rows are filtered
+DUMP_KEYS = {
+    "title.basics": "titleType",
+    "title.crew": "tconst",
+    "title.principals": "tconst",
+    "title.ratings": "tconst",
+    "name.basics": "nconst",
+    "title.akas": "titleId",
+}
+# Identifiers kept in each dump, read from already filtered dumps: {dump: {filtered dump: [(column, split)]}}
+DUMP_DEPENDENCIES = {
+    "title.crew": {"title.basics": [("tconst", False)]},
+    "title.principals": {"title.basics": [("tconst", False)]},
+    "title.ratings": {"title.basics": [("tconst", False)]},
+    "title.akas": {"title.basics": [("tconst", False)]},
+    "name.basics": {"title.crew": [("directors", True), ("writers", True)], "title.principals": [("nconst", False)]},
+}
+
+
+class IdSet:
+    """
+    Set of IMDB identifiers ("tt0000001", "nm0000001", ...) stored as
+    a sorted array of their integer parts, which takes 8 bytes per
+    identifier instead of the ~60 bytes of a Python string in a set.
+    New identifiers are buffered and merged lazily.
+    """
+
+    def __init__(self):
+        self.ids = np.empty(0, dtype=np.int64)
+        self.pending = []
+        self.n_pending = 0
+
+    def add(self, values):
+        """
+        Add identifiers to the set.
+
+        Args:
+            values: pandas Series of string identifiers
+
+        """
+        new_ids = ids_to_int(values)
+        self.pending.append(new_ids)
+        self.n_pending += len(new_ids)
+        if self.n_pending > max(len(self.ids), MIN_CHUNK_ROWS):
+            self.compact()
+
+    def compact(self):
+        if self.pending:
+            self.ids = np.unique(np.concatenate([self.ids] + self.pending))
+            self.pending = []
+            self.n_pending = 0
+
+    def contains(self, values):
+        """
+        Vectorized membership test.
+
+        Args:
+            values: pandas Series of string identifiers
+
+        Returns:
+            mask: boolean numpy array, True where the identifier
+            is in the set
+
+        """
+        self.compact()
+        ints = pd.to_numeric(values.str.slice(2), errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        valid = ~np.isnan(ints)
+        mask = np.zeros(len(ints), dtype=bool)
+        if len(self.ids) == 0 or not valid.any():
+            return mask
+        candidates = ints[valid].astype(np.int64)
+        pos = np.minimum(np.searchsorted(self.ids, candidates), len(self.ids) - 1)
+        mask[valid] = self.ids[pos] == candidates
+        return mask
+
+    @property
+    def nbytes(self):
+        return self.ids.nbytes + 8*self.n_pending
+
+    def __len__(self):
+        self.compact()
+        return len(self.ids)
+
+
+def ids_to_int(values):
+    """
+    Convert IMDB identifiers to their integer part, dropping
+    missing and malformed ones.
+
+    Args:
+        values: pandas Series of string identifiers
+
+    Returns:
+        ids: numpy array of int64
+
+    """
+    ints = pd.to_numeric(values.dropna().str.slice(2), errors='coerce').dropna()
+    return ints.to_numpy(dtype=np.int64)
+
+
+def find_dump(data_path, name):
+    """
+    Return the path of an IMDB dump, which can be either plain
+    ("title.basics.tsv") or compressed ("title.basics.tsv.gz").
+    """
+    for file_name in [name + ".tsv", name + ".tsv.gz"]:
+        path = os.path.join(data_path, file_name)
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"Neither {name}.tsv nor {name}.tsv.gz found in {data_path}")
+
+
+def filtered_path(data_path, name):
+    """
+    Return the path of the filtered version of an IMDB dump
+    ("title.basics.onlymovies.tsv").
+    """
+    return os.path.join(data_path, name + ".onlymovies.tsv")
+
+
+def read_id_set(path, columns, chunk_rows=None, ids=None):
+    """
+    Read the identifiers of some columns of a TSV file in chunks.
+
+    Args:
+        path: path of the file
+        columns: list of (column, split), split is True for
+        comma-separated columns
+        chunk_rows: number of rows per chunk (default None, i.e.
+        MIN_CHUNK_ROWS*100)
+        ids: IdSet the identifiers are added to (default None, i.e.
+        a new one)
+
+    Returns:
+        ids: IdSet
+
+    """
+    ids = ids if ids is not None else IdSet()
+    usecols = [col for col, _ in columns]
+    for chunk in pd.read_csv(path, usecols=usecols, chunksize=chunk_rows or MIN_CHUNK_ROWS*100, **READ_OPTIONS):
+        for col, split in columns:
+            values = chunk[col].dropna()
+            ids.add(values.str.split(",").explode() if split else values)
+    return ids
+
+
+def compute_chunk_rows(path, memory_budget_mb, reserved_bytes=0):
+    """
+    Choose the number of rows per chunk so that processing a chunk
+    fits in the memory budget.
+
+    Args:
+        path: path of the file to read
+        memory_budget_mb: memory budget in MB
+        reserved_bytes: memory already in use (e.g. by the sets of
+        identifiers) (default 0)
+
+    Returns:
+        chunk_rows: number of rows per chunk
+
+    """
+    sample = pd.read_csv(path, nrows=SAMPLE_ROWS, **READ_OPTIONS)
+    if len(sample) == 0:
+        return MIN_CHUNK_ROWS
+    bytes_per_row = sample.memory_usage(index=True, deep=True).sum()/len(sample)
+    available = memory_budget_mb*2**20 - reserved_bytes
+    return max(MIN_CHUNK_ROWS, int(available/(PARSING_OVERHEAD*bytes_per_row)))
+
+
+def filter_dump(in_path, out_path, key_col, keep, memory_budget_mb, chunk_rows=None, collect=None):
+    """
+    Stream a TSV file in chunks and write out only the rows satisfying
+    a condition. Identifiers found in the kept rows can be collected
+    while streaming.
+
+    Args:
+        in_path: path of the input file (plain or gzip)
+        out_path: path of the filtered output file
+        key_col: column on which the condition is evaluated
+        keep: IdSet of identifiers to keep, or function mapping a
+        Series to a boolean mask
+        memory_budget_mb: memory budget in MB
+        chunk_rows: number of rows per chunk (default None, i.e. derived
+        from memory_budget_mb)
+        collect: dictionary {column: (IdSet, split)} of identifiers to
+        collect from the kept rows, split is True for comma-separated
+        columns (default None)
+
+    Returns:
+        n_kept: number of rows written
+
+    """
+    collect = collect or {}
+    if chunk_rows is None:
+        reserved = sum(id_set.nbytes for id_set, _ in collect.values())
+        if isinstance(keep, IdSet):
+            reserved += keep.nbytes
+        chunk_rows = compute_chunk_rows(in_path, memory_budget_mb, reserved)
+
+    n_kept = 0
+    header = True
+    with open(out_path, 'w', newline='') as out_file:
+        for chunk in pd.read_csv(in_path, chunksize=chunk_rows, **READ_OPTIONS):
+            if isinstance(keep, IdSet):
+                mask = keep.contains(chunk[key_col])
+            else:
+                mask = keep(chunk[key_col])
+            chunk = chunk[mask]
+
+            for col, (id_set, split) in collect.items():
+                values = chunk[col].dropna()
+                id_set.add(values.str.split(",").explode() if split else values)
+
+            chunk.to_csv(out_file, sep='\t', index=False, header=header)
+            header = False
+            n_kept += len(chunk)
+    return n_kept
+
+
+def filter_imdb_dumps(data_path, memory_budget_mb=1024, chunk_rows=None, verbose=True):
+    """
+    Filter the IMDB Non-Commercial Datasets keeping only movies and
+    people that worked in at least one movie. Each dump is read
+    exactly once, the output files are named "<dump>.onlymovies.tsv".
+
+    Args:
+        data_path: folder containing the IMDB dumps
+        memory_budget_mb: memory budget in MB (default 1024)
+        chunk_rows: number of rows per chunk (default None, i.e. derived
+        from memory_budget_mb)
+        verbose: True to print progress (default True)
+
+    Returns:
+        titles: IdSet of the kept movies
+        people: IdSet of the kept people
+
+    """
+    titles = IdSet()
+    people = IdSet()
+
+    # Each step: (dump, condition, identifiers to collect)
+    steps = [
+        ("title.basics", lambda s: s.isin(MOVIE_TITLE_TYPES).to_numpy(), {"tconst": (titles, False)}),
+        ("title.crew", titles, {"directors": (people, True), "writers": (people, True)}),
+        ("title.principals", titles, {"nconst": (people, False)}),
+        ("title.ratings", titles, {}),
+        ("name.basics", people, {}),
+        ("title.akas", titles, {}),
+    ]
+
+    for name, keep, collect in steps:
+        in_path = find_dump(data_path, name)
+        out_path = filtered_path(data_path, name)
+        n_kept = filter_dump(in_path, out_path, DUMP_KEYS[name], keep, memory_budget_mb, chunk_rows, collect)
+        if verbose:
+            print(f"{name}: {n_kept} rows kept ({len(titles)} movies, {len(people)} people)")
+
+    return titles, people
+
+
+def filter_single_dump(data_path, name, memory_budget_mb=1024, chunk_rows=None, verbose=True):
+    """
+    Filter a single IMDB dump, reading the identifiers to keep from
+    the dumps it depends on (see DUMP_DEPENDENCIES), which must have
+    been filtered already. The output is the same as the one of
+    filter_imdb_dumps, but independent dumps can be filtered in
+    parallel.
+
+    Args:
+        data_path: folder containing the IMDB dumps
+        name: name of the dump (e.g. "title.crew")
+        memory_budget_mb: memory budget in MB (default 1024)
+        chunk_rows: number of rows per chunk (default None, i.e. derived
+        from memory_budget_mb)
+        verbose: True to print progress (default True)
+
+    Returns:
+        n_kept: number of rows written
+
+    """
+    if name not in DUMP_KEYS:
+        raise ValueError(f"Unknown IMDB dump {name}, expected one of {', '.join(DUMP_KEYS)}")
+    if name == "title.basics":
+        keep = lambda s: s.isin(MOVIE_TITLE_TYPES).to_numpy()
+    else:
+        keep = IdSet()
+        for dependency, columns in DUMP_DEPENDENCIES[name].items():
+            read_id_set(filtered_path(data_path, dependency), columns, chunk_rows, ids=keep)
+    n_kept = filter_dump(find_dump(data_path, name), filtered_path(data_path, name), DUMP_KEYS[name], keep,
+                         memory_budget_mb, chunk_rows)
+    if verbose:
+        print(f"{name}: {n_kept} rows kept")
+    return n_kept
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Filter the IMDB dumps keeping only movies and the people who worked in them.")
+    parser.add_argument("data_path", help="folder containing the IMDB dumps (.tsv or .tsv.gz)")
+    parser.add_argument("--memory-budget-mb", type=int, default=1024, help="memory budget in MB (default 1024)")
+    parser.add_argument("--chunk-rows", type=int, default=None, help="rows per chunk, overrides the memory budget")
+    args = parser.parse_args(argv)
+
+    filter_imdb_dumps(args.data_path, args.memory_budget_mb, args.chunk_rows)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
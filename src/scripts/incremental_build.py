@@ -0,0 +1,189 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Name of the column with the hash of each row in the saved states
+HASH_COLUMN = "_row_hash"
+
+
+def row_hashes(df):
+    """
+    Hash the content of each row of a DataFrame (the index is
+    ignored).
+
+    Args:
+        df: pandas DataFrame
+
+    Returns:
+        hashes: numpy array of uint64
+
+    """
+    # Object columns are hashed value by value, which is faster than factorizing them first when most values are distinct
+    return pd.util.hash_pandas_object(df, index=False, categorize=False).to_numpy()
+
+
+def incremental_build(name, inputs, links, build, output_links, state_dir, previous_output=None, derived=None):
+    """
+    Update the output of a merge stage recomputing only the rows
+    affected by changes of the inputs since the last build.
+
+    Rows of the inputs are linked by the values of their link
+    columns (IDs, merge keys): two rows are linked when they share
+    a value of the same domain. Starting from the rows that were
+    added, modified or removed since the last build, linked rows are
+    collected until no new value is reached, so that whole connected
+    groups of rows are recomputed. This is exact as long as the rows
+    produced by build for a group of linked rows only depend on the
+    rows of the group (e.g. merges on the link columns, or keys
+    deduplicated within the rows that share them). The output rows
+    of the affected groups, recognized by the values of their link
+    columns, are replaced by the rows built from the affected input
+    rows.
+
+    Args:
+        name: name of the stage (prefix of the state files)
+        inputs: dictionary {input name: pandas DataFrame}
+        links: dictionary {input name: {column: domain}}, domains are
+        names shared by columns holding the same kind of values (e.g.
+        "freebase_movie" for freebase_id_movie and freebaseID)
+        build: function taking the inputs as keyword arguments and
+        returning the output rows built from them
+        output_links: dictionary {column: domain} of the output
+        state_dir: folder where the hashes and link values of the
+        rows of the last build are saved
+        previous_output: output of the last build (default None, i.e.
+        full build)
+        derived: dictionary {input name: function} of functions
+        returning a DataFrame of columns computed from the rows of an
+        input (e.g. merge keys). They are computed only for new rows,
+        reused from the last build for the others, added to the input
+        and can be used as link columns (default None)
+
+    Returns:
+        output: pandas DataFrame
+        n_rows: dictionary {input name: number of rows recomputed}
+
+    """
+    os.makedirs(state_dir, exist_ok=True)
+    derived = derived or {}
+    states = {key: _read_state(name, key, state_dir) for key in inputs}
+    full_build = previous_output is None or any(state is None for state in states.values())
+
+    hashes, new_rows, removed, derived_columns = {}, {}, {}, {}
+    inputs = dict(inputs)
+    for key, df in inputs.items():
+        hashes[key] = row_hashes(df)
+        state = states[key]
+        previous_hashes = state[HASH_COLUMN].to_numpy() if state is not None else np.empty(0, dtype=np.uint64)
+        new_rows[key] = ~np.isin(hashes[key], previous_hashes)
+        removed[key] = state[~np.isin(previous_hashes, hashes[key])] if state is not None else None
+        derived_columns[key] = []
+        if key in derived:
+            inputs[key], derived_columns[key] = _add_derived_columns(df, hashes[key], new_rows[key], state, derived[key])
+
+    if full_build:
+        output = build(**inputs)
+        n_rows = {key: len(df) for key, df in inputs.items()}
+    else:
+        affected, output_affected = _affected_rows(inputs, links, new_rows, removed, previous_output, output_links)
+        subsets = {key: df[affected[key]] for key, df in inputs.items()}
+        output = pd.concat([previous_output[~output_affected], build(**subsets)], ignore_index=True)
+        n_rows = {key: int(mask.sum()) for key, mask in affected.items()}
+
+    for key, df in inputs.items():
+        columns = list(links[key]) + [col for col in derived_columns[key] if col not in links[key]]
+        state = df[columns].astype("string[pyarrow]")
+        state.insert(0, HASH_COLUMN, hashes[key])
+        state.to_parquet(_state_path(name, key, state_dir), index=False)
+    return output, n_rows
+
+
+def read_previous_output(path, incremental=True, **read_csv_kwargs):
+    """
+    Read the output of the last build of a stage, if any.
+
+    Args:
+        path: path of the output file
+        incremental: False to ignore the previous output, so that
+        the next build is a full one (default True)
+        read_csv_kwargs: options passed to pd.read_csv (e.g. sep)
+
+    Returns:
+        previous_output: pandas DataFrame, or None for a full build
+
+    """
+    if not incremental or not os.path.exists(path):
+        return None
+    return pd.read_csv(path, **read_csv_kwargs)
+
+
+def _state_path(name, key, state_dir):
+    return os.path.join(state_dir, f"{name}.{key}.parquet")
+
+
+def _read_state(name, key, state_dir):
+    path = _state_path(name, key, state_dir)
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path, dtype_backend="pyarrow").astype({HASH_COLUMN: np.uint64})
+
+
+def _add_derived_columns(df, hashes, new_rows, state, func):
+    # Derived columns of new rows are computed, the others are taken from the state of the row with the same hash
+    computed = func(df[new_rows])
+    if state is not None and (~new_rows).any():
+        first = np.flatnonzero(~state[HASH_COLUMN].duplicated().to_numpy())
+        positions = first[pd.Index(state[HASH_COLUMN].to_numpy()[first]).get_indexer(hashes[~new_rows])]
+    values = {}
+    for col in computed.columns:
+        values[col] = np.full(len(df), pd.NA, dtype=object)
+        values[col][new_rows] = computed[col].to_numpy(dtype=object)
+        if state is not None and (~new_rows).any():
+            values[col][~new_rows] = state[col].to_numpy(dtype=object, na_value=pd.NA)[positions]
+    return pd.concat([df, pd.DataFrame(values, index=df.index)], axis=1), list(computed.columns)
+
+
+def _affected_rows(inputs, links, new_rows, removed, previous_output, output_links):
+    # Encode the values of each domain with integer codes shared by all the tables
+    tables = [(key, df, links[key]) for key, df in inputs.items()]
+    tables += [("removed " + key, df, links[key]) for key, df in removed.items() if df is not None]
+    tables += [("output", previous_output, output_links)]
+    domains = sorted(set(domain for _, _, columns in tables for domain in columns.values()))
+    codes = {}
+    offset = 0
+    for domain in domains:
+        columns = [(table, df, col) for table, df, cols in tables for col, d in cols.items() if d == domain]
+        values = pa.chunked_array([pa.array(df[col].astype("string[pyarrow]").array) for _, df, col in columns])
+        encoded = pc.dictionary_encode(values.combine_chunks())
+        domain_codes = pc.fill_null(encoded.indices, -1).to_numpy().astype(np.int64)
+        domain_codes = np.where(domain_codes >= 0, domain_codes + offset, -1)
+        start = 0
+        for table, df, col in columns:
+            codes[table, col] = domain_codes[start:start + len(df)]
+            start += len(df)
+        offset += len(encoded.dictionary)
+
+    # Values of the rows that changed, then values of the rows linked to them until nothing new is reached
+    marked = np.zeros(offset + 1, dtype=bool)
+    def mark(table, columns, rows):
+        for col in columns:
+            values = codes[table, col][rows]
+            marked[values[values >= 0]] = True
+    for key in inputs:
+        mark(key, links[key], new_rows[key])
+        if removed[key] is not None:
+            mark("removed " + key, links[key], slice(None))
+
+    def rows_with_marked_values(table, columns):
+        # The last element of marked (code -1) is always False
+        return np.logical_or.reduce([marked[codes[table, col]] for col in columns])
+    n_marked = -1
+    while marked.sum() != n_marked:
+        n_marked = marked.sum()
+        affected = {key: rows_with_marked_values(key, links[key]) for key in inputs}
+        for key in inputs:
+            mark(key, links[key], affected[key])
+    return affected, rows_with_marked_values("output", output_links)
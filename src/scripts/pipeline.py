@@ -0,0 +1,380 @@
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+
+import pandas as pd
+
+from imdb_filtering import DUMP_DEPENDENCIES, filter_single_dump, filtered_path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SCRIPTS_PATH = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DATA_PATH = os.path.join(SCRIPTS_PATH, "..", "..", "Data")
+
+# File (in the data folder) where the wall time and peak memory of each stage are appended
+RUNS_LOG = "pipeline_runs.tsv"
+
+
+class Stage:
+    """
+    Step of the dataset generation: a picklable function with its
+    arguments, the files it reads and the files it writes. A stage
+    depends on the stages writing its inputs.
+    """
+
+    def __init__(self, name, func, args, inputs, outputs):
+        """
+        Args:
+            name: name of the stage
+            func: module-level function run in a worker process
+            args: tuple of arguments of func
+            inputs: list of paths of the files read by the stage
+            outputs: list of paths of the files written by the stage
+        """
+        self.name = name
+        self.func = func
+        self.args = args
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+
+    def is_up_to_date(self):
+        """
+        True when all the outputs exist and are newer than all the
+        inputs.
+        """
+        if not all(os.path.exists(path) for path in self.outputs):
+            return False
+        inputs_mtime = max((os.path.getmtime(path) for path in self.inputs if os.path.exists(path)), default=0)
+        return min(os.path.getmtime(path) for path in self.outputs) >= inputs_mtime
+
+    def __repr__(self):
+        return f"Stage({self.name!r})"
+
+
+def run_notebook(path, sections, data_path):
+    """
+    Run the code cells of some sections of a notebook, after its
+    setup cells (the code cells before the first section), in the
+    folder of the notebook. Sections start with a markdown cell
+    whose first line is a "# " title.
+
+    Args:
+        path: path of the notebook
+        sections: list of section titles, None for all the cells
+        data_path: data folder, passed to the notebook through the
+        DATA_PATH environment variable
+
+    """
+    with open(path, encoding="utf-8") as f:
+        cells = json.load(f)["cells"]
+
+    selected = []
+    found = set()
+    section = None
+    for i, cell in enumerate(cells):
+        source = "".join(cell["source"])
+        title = source.split("\n")[0]
+        if cell["cell_type"] == "markdown" and i > 0 and title.startswith("# "):
+            section = title[2:].strip()
+            found.add(section)
+        elif cell["cell_type"] == "code" and (sections is None or section is None or section in sections):
+            selected.append((i, source))
+    missing = [title for title in sections or [] if title not in found]
+    if missing:
+        raise ValueError(f"Sections not found in {path}: {', '.join(missing)}")
+
+    os.environ["DATA_PATH"] = os.path.join(os.path.abspath(data_path), "")
+    folder = os.path.dirname(os.path.abspath(path))
+    os.chdir(folder)
+    sys.path.insert(0, folder)
+    namespace = {"__name__": "__main__"}
+    for i, source in selected:
+        exec(compile(source, f"{path} [cell {i}]", "exec"), namespace)
+
+
+def imdb_stages(data_path, memory_budget_mb=1024):
+    """
+    One stage per IMDB dump (see filter_single_dump): title.basics is
+    filtered first, then the other title dumps in parallel and finally
+    name.basics.
+    """
+    stages = []
+    for name in ["title.basics"] + list(DUMP_DEPENDENCIES):
+        inputs = [_dump_path(data_path, name)] + [filtered_path(data_path, dependency)
+                                                  for dependency in DUMP_DEPENDENCIES.get(name, {})]
+        stages.append(Stage("imdb " + name, filter_single_dump, (data_path, name, memory_budget_mb),
+                            inputs, [filtered_path(data_path, name)]))
+    return stages
+
+
+def default_stages(data_path, memory_budget_mb=1024):
+    """
+    Stages generating the datasets of the project from the raw
+    sources: IMDB filtering, Wikidata scraping and the movie, cast
+    and people merges.
+
+    Args:
+        data_path: data folder
+        memory_budget_mb: memory budget of the IMDB filtering in MB
+        (default 1024)
+
+    Returns:
+        stages: list of Stage
+
+    """
+    def data(name):
+        return os.path.join(data_path, name)
+
+    def notebook(name, inputs, outputs, notebook_name, sections=None):
+        path = os.path.join(SCRIPTS_PATH, notebook_name + ".ipynb")
+        return Stage(name, run_notebook, (path, sections, data_path), [data(f) for f in inputs], [data(f) for f in outputs])
+
+    return imdb_stages(data_path, memory_budget_mb) + [
+        notebook("movies imdb-tmdb",
+                 ["title.basics.onlymovies.tsv", "title.ratings.onlymovies.tsv", "TMDB_movie_dataset.csv"],
+                 ["movies_imdb_tmdb.tsv"],
+                 "movie_dataset_generation", ["Merge IMDB and TMDB datasets"]),
+        notebook("scrape movies",
+                 ["movies_imdb_tmdb.tsv", "movie.metadata.tsv"],
+                 ["wikidata_imdbID.csv", "wikidata_freebaseID_imdbID.csv"],
+                 "scrape_wikidata", ["Wikidata scraping - Movies"]),
+        notebook("movies orig-wiki",
+                 ["movie.metadata.tsv", "wikidata_freebaseID_imdbID.csv"],
+                 ["movies_orig_wiki.tsv"],
+                 "movie_dataset_generation", ["Merge MovieSummaries and Wikidata datasets"]),
+        notebook("movies complete",
+                 ["movies_orig_wiki.tsv", "movies_imdb_tmdb.tsv"],
+                 ["movies_complete.tsv"],
+                 "movie_dataset_generation", ["Merge IMDB-TMDB and MovieSummaries-Wikidata datasets"]),
+        notebook("scrape casts",
+                 ["movies_complete.tsv"],
+                 ["wikidata_cast_imdb.csv"],
+                 "scrape_wikidata", ["Wikidata scraping - Casts"]),
+        notebook("cast merge",
+                 ["wikidata_cast_imdb.csv", "character.metadata.tsv", "movies_complete.tsv", "title.principals.onlymovies.tsv"],
+                 ["movie_actor_merged.tsv"],
+                 "cast_dataset_generation", ["Merge Wikidata, MovieSummaries and IMDB casts"]),
+        notebook("scrape people",
+                 ["movie_actor_merged.tsv"],
+                 ["wikidata_people.csv"],
+                 "scrape_wikidata", ["Wikidata scraping - People"]),
+        notebook("people",
+                 ["character.metadata.tsv", "wikidata_people.csv"],
+                 ["people_complete.tsv"],
+                 "people_dataset_generation"),
+        notebook("cast univocal IDs",
+                 ["movie_actor_merged.tsv", "people_complete.tsv"],
+                 ["movie_actor_complete.tsv", "actor_ids.sqlite"],
+                 "cast_dataset_generation", ["Assign univocal IDs to actors"]),
+        notebook("scrape people countries",
+                 ["people_complete.tsv"],
+                 ["wikidata_people_country.csv"],
+                 "scrape_wikidata", ["Wikidata scraping - People's countries"]),
+    ]
+
+
+def stage_dependencies(stages):
+    """
+    Compute the stages each stage depends on, i.e. the stages writing
+    its inputs.
+
+    Args:
+        stages: list of Stage
+
+    Returns:
+        dependencies: dictionary {stage name: set of stage names}
+
+    """
+    writers = {}
+    for stage in stages:
+        for path in stage.outputs:
+            path = os.path.abspath(path)
+            if path in writers:
+                raise ValueError(f"{path} is written by both {writers[path]} and {stage.name}")
+            writers[path] = stage.name
+    dependencies = {stage.name: {writers[os.path.abspath(path)] for path in stage.inputs
+                                 if os.path.abspath(path) in writers} for stage in stages}
+
+    # Topological sort, only to detect cycles
+    remaining = {name: set(deps) for name, deps in dependencies.items()}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"Cyclic dependencies between the stages {', '.join(sorted(remaining))}")
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return dependencies
+
+
+def run_pipeline(stages, targets=None, force=False, max_workers=None, log_path=None, dry_run=False, verbose=True):
+    """
+    Run the stages that are not up to date, in dependency order.
+    A stage is skipped when its outputs are newer than its inputs
+    (checked once the stages it depends on are done) and independent
+    stages run concurrently in a process pool. Each stage runs in a
+    fresh process, so that its peak memory can be measured.
+
+    Args:
+        stages: list of Stage
+        targets: names of the stages to bring up to date, together
+        with the stages they depend on (default None, i.e. all)
+        force: True to run the stages even if they are up to date
+        (default False)
+        max_workers: number of worker processes (default None, i.e.
+        the number of CPUs)
+        log_path: TSV file where the records of the run are appended
+        (default None, i.e. no log)
+        dry_run: True to only report the stages that would run,
+        assuming the stages they depend on run too (default False)
+        verbose: True to print progress (default True)
+
+    Returns:
+        records: DataFrame with one row per stage and the columns
+        run (start time of the run), stage, status ("ran", "skipped",
+        "failed", "blocked" when a dependency failed or "would run"),
+        wall_time_s and peak_memory_mb
+
+    """
+    dependencies = stage_dependencies(stages)
+    by_name = {stage.name: stage for stage in stages}
+    selected = set(by_name) if targets is None else _with_dependencies(targets, dependencies)
+    produced = {os.path.abspath(path) for stage in stages for path in stage.outputs}
+    missing = [path for name in selected for path in by_name[name].inputs
+               if os.path.abspath(path) not in produced and not os.path.exists(path)]
+    if missing:
+        raise FileNotFoundError(f"Missing input files: {', '.join(sorted(set(missing)))}")
+
+    records = {}
+    pending = {name: dependencies[name] & selected for name in selected}
+    running = {}
+    run_id = datetime.now().isoformat(timespec="seconds")
+
+    def record(name, status, wall_time=float('nan'), peak_memory=float('nan')):
+        records[name] = {"run": run_id, "stage": name, "status": status, "wall_time_s": wall_time,
+                         "peak_memory_mb": peak_memory}
+        if verbose:
+            details = f" ({wall_time:.1f} s, {peak_memory:.0f} MB)" if status in ("ran", "failed") else ""
+            print(f"[{status}] {name}{details}")
+
+    # A new single-worker process pool per stage: ru_maxrss is the peak memory of the stage alone
+    n_workers = max_workers or os.cpu_count() or 1
+    executors = {}
+    try:
+        while pending or running:
+            done = {name for name in records}
+            for name in sorted(pending):
+                if not pending[name] <= done:
+                    continue
+                statuses = {records[dep]["status"] for dep in dependencies[name] & selected}
+                if statuses & {"failed", "blocked"}:
+                    record(name, "blocked")
+                elif dry_run:
+                    stale = force or "would run" in statuses or not by_name[name].is_up_to_date()
+                    record(name, "would run" if stale else "skipped")
+                elif not force and by_name[name].is_up_to_date():
+                    record(name, "skipped")
+                elif len(running) < n_workers:
+                    stage = by_name[name]
+                    executor = ProcessPoolExecutor(max_workers=1)
+                    future = executor.submit(_run_stage, stage.func, stage.args)
+                    running[future], executors[future] = name, executor
+                else:
+                    # Started once a worker is free
+                    continue
+                del pending[name]
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                executors.pop(future).shutdown()
+                error, wall_time, peak_memory = future.result()
+                if error is not None and verbose:
+                    print(error, file=sys.stderr)
+                record(name, "failed" if error is not None else "ran", wall_time, peak_memory)
+    finally:
+        for executor in executors.values():
+            executor.shutdown()
+
+    records = pd.DataFrame([records[stage.name] for stage in stages if stage.name in records])
+    if log_path is not None and not dry_run:
+        records.to_csv(log_path, sep='\t', index=False, mode='a', header=not os.path.exists(log_path))
+    return records
+
+
+def _dump_path(data_path, name):
+    # Compressed dumps are used only when the plain ones are missing (see find_dump)
+    path = os.path.join(data_path, name + ".tsv")
+    return path if os.path.exists(path) or not os.path.exists(path + ".gz") else path + ".gz"
+
+
+def _with_dependencies(targets, dependencies):
+    unknown = [name for name in targets if name not in dependencies]
+    if unknown:
+        raise ValueError(f"Unknown stages: {', '.join(unknown)}")
+    selected = set()
+    stack = list(targets)
+    while stack:
+        name = stack.pop()
+        if name not in selected:
+            selected.add(name)
+            stack.extend(dependencies[name])
+    return selected
+
+
+def _peak_memory_mb():
+    if resource is None:
+        return float('nan')
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak/2**20 if sys.platform == 'darwin' else peak/2**10
+
+
+def _run_stage(func, args):
+    # Errors are returned as text, so that a failing stage does not stop the others
+    start = time.perf_counter()
+    try:
+        func(*args)
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+    return error, time.perf_counter() - start, _peak_memory_mb()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the datasets of the project, running only the stages whose outputs are out of date.")
+    parser.add_argument("data_path", nargs="?", default=DEFAULT_DATA_PATH, help="data folder (default Data/ at the root of the repository)")
+    parser.add_argument("--stages", nargs="+", default=None, help="stages to bring up to date, with the stages they depend on (default all)")
+    parser.add_argument("--force", action="store_true", help="run the stages even if they are up to date")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default number of CPUs)")
+    parser.add_argument("--memory-budget-mb", type=int, default=1024, help="memory budget of the IMDB filtering in MB (default 1024)")
+    parser.add_argument("--dry-run", action="store_true", help="only list the stages that would run")
+    parser.add_argument("--list", action="store_true", help="list the stages with their inputs and outputs")
+    args = parser.parse_args(argv)
+
+    stages = default_stages(args.data_path, args.memory_budget_mb)
+    if args.list:
+        dependencies = stage_dependencies(stages)
+        for stage in stages:
+            print(f"{stage.name} (after: {', '.join(sorted(dependencies[stage.name])) or '-'})")
+            print("    inputs:  " + ", ".join(os.path.basename(path) for path in stage.inputs))
+            print("    outputs: " + ", ".join(os.path.basename(path) for path in stage.outputs))
+        return 0
+
+    records = run_pipeline(stages, args.stages, args.force, args.workers, os.path.join(args.data_path, RUNS_LOG),
+                           args.dry_run)
+    return int((records["status"] == "failed").any()) if len(records) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
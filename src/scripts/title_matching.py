@@ -0,0 +1,230 @@
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from auxiliary_functions_for_merging import clean_column
+
+# Character added at both ends of the cleaned titles, so that the first and last characters are in more n-grams
+# (clean_string removes "$", so it never appears in a cleaned title)
+PAD = "$"
+
+
+def title_ngrams(titles, n=3):
+    """
+    Encode the n-grams of cleaned titles (ASCII strings) as a binary
+    sparse matrix, without looping over the titles: the titles are
+    concatenated in a single byte buffer and the n-grams are read at
+    all the positions that do not cross the end of a title.
+
+    Args:
+        titles: numpy array of cleaned titles
+        n: length of the n-grams (default 3)
+
+    Returns:
+        ngrams: csr_matrix of booleans (titles x distinct n-grams)
+
+    """
+    padded = [PAD*(n - 1) + title + PAD*(n - 1) for title in titles]
+    lengths = np.fromiter((len(title) for title in padded), dtype=np.int64, count=len(padded))
+    buffer = np.frombuffer("".join(padded).encode("ascii"), dtype=np.uint8).astype(np.int64)
+    starts = np.cumsum(lengths) - lengths
+    n_grams = lengths - n + 1
+    rows = np.repeat(np.arange(len(padded)), n_grams)
+    positions = np.arange(n_grams.sum()) - np.repeat(np.cumsum(n_grams) - n_grams, n_grams) + np.repeat(starts, n_grams)
+    codes = np.zeros(len(positions), dtype=np.int64)
+    for i in range(n):
+        codes = codes*256 + buffer[positions + i]
+    columns, _ = pd.factorize(codes)
+    matrix = csr_matrix((np.ones(len(rows), dtype=bool), (rows, columns)), shape=(len(padded), columns.max() + 1 if len(columns) else 0))
+    # Repeated n-grams of a title are counted once
+    matrix.sum_duplicates()
+    matrix.data[:] = True
+    return matrix
+
+
+def match_titles(left, right, left_title, left_year, right_title, right_year, year_tolerance=1, n=3, block_n=4,
+                 n_block_ngrams=8, prefix_length=4, max_block_size=1000, min_score=0.8, top_k=1, chunk_size=10000):
+    """
+    Find, for each row of left, the rows of right with a similar
+    title and a close year, without comparing all the pairs.
+
+    Titles are cleaned with clean_string (as in create_key). Rows are
+    compared only if their years differ by at most year_tolerance and
+    their cleaned titles share a blocking key: the prefix of the title
+    or one of its n_block_ngrams rarest block_n-grams (rarest over both
+    tables, so that similar titles tend to pick the same ones). Keys
+    shared by more than max_block_size rows of one side are ignored,
+    which bounds the number of candidate pairs. Candidates are scored
+    with the Dice coefficient of the sets of n-grams of the titles
+    (1 for identical cleaned titles). Titles that are empty once
+    cleaned (non-Latin scripts, punctuation only) are never matched,
+    as all their n-grams would be padding. The rows of left are
+    processed by chunks of chunk_size rows, so that only the candidates of one
+    chunk are in memory.
+
+    Args:
+        left/right: pandas DataFrames
+        left_title/right_title: name of the title columns
+        left_year/right_year: name of the year columns
+        year_tolerance: maximum difference between years (default 1)
+        n: length of the n-grams of the score (default 3)
+        block_n: length of the n-grams used as blocking keys (default
+        4, longer n-grams are rarer and give fewer candidates)
+        n_block_ngrams: number of rarest n-grams used as blocking
+        keys for each title (default 8)
+        prefix_length: length of the prefix used as blocking key, 0 to
+        disable it (default 4)
+        max_block_size: maximum number of rows of each side sharing a
+        blocking key and a year (default 1000)
+        min_score: minimum score of the returned matches (default 0.8)
+        top_k: maximum number of matches returned for each row of left
+        (default 1)
+        chunk_size: number of rows of left processed at once (default
+        10000)
+
+    Returns:
+        matches: DataFrame with the index of the rows of left ("left")
+        and right ("right"), the score ("score"), the difference of the
+        years ("year_diff") and the rank of the match among the ones of
+        the row of left ("rank", 0 for the best), sorted by left row
+        and rank
+
+    """
+    left_rows, left_codes, left_years = _valid_rows(left, left_title, left_year)
+    right_rows, right_codes, right_years = _valid_rows(right, right_title, right_year)
+    titles, codes = np.unique(np.concatenate([left_codes, right_codes]), return_inverse=True)
+    left_codes, right_codes = codes[:len(left_codes)], codes[len(left_codes):]
+    ngrams = title_ngrams(titles, n)
+    sizes = np.asarray(ngrams.sum(axis=1)).ravel()
+
+    # Blocking keys of each distinct title, as (title, key) pairs
+    block_ngrams = ngrams if block_n == n else title_ngrams(titles, block_n)
+    key_titles, keys = _blocking_keys(titles, block_ngrams, n_block_ngrams, prefix_length)
+    del block_ngrams
+
+    # Keys of each row, combined with the year (the rows of left once for each year within the tolerance),
+    # ignoring keys with too many rows on one side
+    min_year = min(left_years.min(initial=0), right_years.min(initial=0)) - year_tolerance
+    n_years = max(left_years.max(initial=0), right_years.max(initial=0)) + year_tolerance - min_year + 1
+    offsets = np.arange(-year_tolerance, year_tolerance + 1)
+    right_pos, right_keys = _small_blocks(*_row_keys(right_codes, right_years - min_year, key_titles, keys, n_years, [0]),
+                                          max_block_size)
+    left_pos, left_keys = _small_blocks(*_row_keys(left_codes, left_years - min_year, key_titles, keys, n_years, offsets),
+                                        max_block_size)
+    order = np.argsort(right_keys, kind="stable")
+    right_pos, right_keys = right_pos[order], right_keys[order]
+    order = np.argsort(left_pos, kind="stable")
+    left_pos, left_keys = left_pos[order], left_keys[order]
+
+    chunks = []
+    for start in range(0, len(left_rows), chunk_size):
+        first, last = np.searchsorted(left_pos, [start, start + chunk_size])
+        # Candidate pairs: rows sharing a key (found by binary search in the sorted keys of right)
+        lower = np.searchsorted(right_keys, left_keys[first:last], side="left")
+        count = np.searchsorted(right_keys, left_keys[first:last], side="right") - lower
+        pairs = np.unique(np.repeat(left_pos[first:last], count)*max(len(right_rows), 1)
+                          + right_pos[_ranges(lower, count)])
+        pair_left, pair_right = pairs//max(len(right_rows), 1), pairs % max(len(right_rows), 1)
+
+        # Dice coefficient of the n-grams of the titles, computed once per pair of distinct titles
+        title_pairs, inverse = np.unique(left_codes[pair_left]*len(titles) + right_codes[pair_right], return_inverse=True)
+        title_left, title_right = title_pairs//len(titles), title_pairs % len(titles)
+        common = np.asarray(ngrams[title_left].multiply(ngrams[title_right]).sum(axis=1)).ravel()
+        scores = (2*common/np.maximum(sizes[title_left] + sizes[title_right], 1))[inverse.ravel()]
+        kept = scores >= min_score
+        chunks.append(pd.DataFrame({
+            "left": left_rows[pair_left[kept]],
+            "right": right_rows[pair_right[kept]],
+            "score": scores[kept],
+            "year_diff": np.abs(left_years[pair_left[kept]] - right_years[pair_right[kept]]),
+            "_left_pos": pair_left[kept],
+        }))
+
+    columns = {"left": left.index.dtype, "right": right.index.dtype, "score": float, "year_diff": np.int64,
+               "_left_pos": np.int64}
+    matches = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=list(columns)).astype(columns)
+    matches = matches.sort_values(["_left_pos", "score", "year_diff"], ascending=[True, False, True], kind="stable")
+    matches["rank"] = matches.groupby("_left_pos").cumcount()
+    matches = matches[matches["rank"] < top_k]
+    return matches.drop(columns="_left_pos").reset_index(drop=True)
+
+
+def one_to_one(matches):
+    """
+    Keep the matches by decreasing score (then increasing year
+    difference) as long as neither of their rows is already matched,
+    so that each row of left and right appears at most once.
+
+    Args:
+        matches: DataFrame returned by match_titles
+
+    Returns:
+        matches: DataFrame with the kept matches
+
+    """
+    matches = matches.sort_values(["score", "year_diff"], ascending=[False, True], kind="stable")
+    used_left, used_right, keep = set(), set(), []
+    for left, right in zip(matches["left"].tolist(), matches["right"].tolist()):
+        keep.append(left not in used_left and right not in used_right)
+        if keep[-1]:
+            used_left.add(left)
+            used_right.add(right)
+    return matches[keep].reset_index(drop=True)
+
+
+def _valid_rows(df, title_col, year_col):
+    # Index, cleaned title and integer year of the rows with both a title and a year. Titles that are empty once
+    # cleaned (e.g. non-Latin scripts or punctuation only) are dropped: they only have padding n-grams, so any two
+    # of them would get a score of 1
+    years = pd.to_numeric(df[year_col], errors="coerce")
+    valid = (df[title_col].notna() & years.notna()).to_numpy()
+    titles = np.asarray(clean_column(df.loc[valid, title_col]), dtype=object).astype(str)
+    non_empty = np.array([len(title) > 0 for title in titles], dtype=bool)
+    years = years[valid].to_numpy(dtype=float).astype(np.int64)
+    return df.index[valid][non_empty], titles[non_empty], years[non_empty]
+
+
+def _blocking_keys(titles, ngrams, n_block_ngrams, prefix_length):
+    # n-gram keys are the column of the n-gram, prefix keys come after the n-gram columns
+    # n-grams of a single title (e.g. typos) cannot be shared, they are skipped
+    coo = ngrams.tocoo()
+    frequency = np.asarray(ngrams.sum(axis=0)).ravel()
+    shared = frequency[coo.col] > 1
+    rows, cols = coo.row[shared], coo.col[shared]
+    order = np.lexsort((frequency[cols], rows))
+    rows, cols = rows[order], cols[order]
+    rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+    rarest = rank < n_block_ngrams
+    key_titles, keys = [rows[rarest]], [cols[rarest].astype(np.int64)]
+    if prefix_length > 0:
+        prefixes, _ = pd.factorize(pd.Series(titles, dtype=object).str.slice(0, prefix_length))
+        key_titles.append(np.arange(len(titles)))
+        keys.append(prefixes.astype(np.int64) + ngrams.shape[1])
+    return np.concatenate(key_titles), np.concatenate(keys)
+
+
+def _row_keys(codes, years, key_titles, keys, n_years, offsets):
+    # Positions of the rows and their keys combined with the year (one copy of the keys for each offset)
+    order = np.argsort(key_titles, kind="stable")
+    key_titles, keys = key_titles[order], keys[order]
+    start = np.searchsorted(key_titles, codes, side="left")
+    count = np.searchsorted(key_titles, codes, side="right") - start
+    positions = np.repeat(np.arange(len(codes)), count)
+    row_keys = keys[_ranges(start, count)]
+    all_positions, all_keys = [], []
+    for offset in offsets:
+        all_positions.append(positions)
+        all_keys.append(row_keys*n_years + years[positions] + offset)
+    return np.concatenate(all_positions), np.concatenate(all_keys)
+
+
+def _small_blocks(positions, keys, max_block_size):
+    # Drop the keys shared by more than max_block_size rows
+    _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    small = counts[inverse.ravel()] <= max_block_size
+    return positions[small], keys[small]
+
+
+def _ranges(start, count):
+    # Concatenation of the ranges [start, start + count)
+    return np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count) + np.repeat(start, count)
@@ -1,14 +1,288 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+
+WIKIDATA_SPARQL_URL = 'https://query.wikidata.org/sparql'
+HEADERS = {'Accept': 'text/csv', 'User-Agent': 'ada-2024-theblockbusters Wikidata scraper'}
+
+def download_wikidata_sparql_csv(query, file_path, session=None, url=WIKIDATA_SPARQL_URL, timeout=None):
+    getter = session.get if session is not None else requests.get
+
+    response = getter(url, params={'query': query}, headers=HEADERS, timeout=timeout)
 
-def download_wikidata_sparql_csv(query, file_path):
-    url = 'https://query.wikidata.org/sparql'
-    
-    response = requests.get(url, params={'query': query}, headers={'Accept': 'text/csv'})
-    
     if response.status_code == 200:
         with open(file_path, 'wb') as file:
             file.write(response.content)
         return True
     else:
         print(f"Error: Failed to retrieve data. Status code {response.status_code}")
-        return False
\ No newline at end of file
+        return False
+
+# Function to format an ID as a SPARQL string literal
+def quote_id(x):
+    return f"\"{x}\""
+
+# Function to format a Wikidata ID (e.g. Q42) as a SPARQL entity
+def wikidata_entity(x):
+    return f"wd:{x}"
+
+# Function to report the IDs whose batch failed after all the retries (calling fetch again queries them again)
+def report_failed(failed_ids):
+    if failed_ids:
+        print(f"{len(failed_ids)} IDs failed after all the retries, run the cell again to query them: "
+              + ", ".join(failed_ids))
+    else:
+        print("All the IDs were queried")
+
+class RateLimiter:
+    """
+    Limit the number of requests per second across threads.
+    """
+
+    def __init__(self, max_requests_per_second):
+        self.interval = 1/max_requests_per_second if max_requests_per_second else 0.
+        self.next_time = 0.
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_time)
+            self.next_time = slot + self.interval
+        time.sleep(slot - now)
+
+    def pause(self, seconds):
+        """
+        Delay all the following requests by the given number of
+        seconds (e.g. when the server asks to slow down).
+        """
+        with self.lock:
+            self.next_time = max(self.next_time, time.monotonic() + seconds)
+
+class WikidataFetcher:
+    """
+    Run a SPARQL query on batches of IDs concurrently and save the
+    results of each batch in a temporary CSV file.
+
+    Completed batches are appended to a manifest, so an interrupted
+    run can be resumed by calling fetch again with the same IDs: only
+    the IDs not covered by the manifest are queried. Batches that time
+    out are split in halves and the batch size used for the following
+    batches is reduced accordingly; it is doubled again (up to the
+    initial batch size) after recover_after batches in a row succeed.
+    """
+
+    def __init__(self, generic_query, temp_files_path, batch_size=120, min_batch_size=5,
+                 format_id=quote_id, max_workers=4, max_requests_per_second=4., max_retries=8,
+                 backoff=1., timeout=120, recover_after=10, url=WIKIDATA_SPARQL_URL, verbose=True):
+        """
+        Args:
+            generic_query: SPARQL query where "|" is replaced by the
+            IDs of the batch
+            temp_files_path: prefix of the temporary files, e.g.
+            DATA_PATH + "tempFiles/wikidata_imdbID_temp_"
+            batch_size: initial number of IDs per query (default 120)
+            min_batch_size: batches are not split below this size
+            (default 5)
+            format_id: function formatting an ID inside the query
+            (default quote_id)
+            max_workers: number of concurrent requests (default 4)
+            max_requests_per_second: rate limit (default 4)
+            max_retries: attempts before giving up on a batch
+            (default 8)
+            backoff: base delay in seconds of the exponential backoff
+            (default 1)
+            timeout: timeout of each request in seconds (default 120)
+            recover_after: number of successful batches in a row
+            after which a reduced batch size is doubled (default 10)
+            url: SPARQL endpoint (default Wikidata Query Service)
+            verbose: True to print progress (default True)
+        """
+        self.generic_query = generic_query
+        self.temp_files_path = temp_files_path
+        self.manifest_path = temp_files_path + "manifest.jsonl"
+        self.batch_size = batch_size
+        self.max_batch_size = batch_size
+        self.min_batch_size = min_batch_size
+        self.format_id = format_id
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.recover_after = recover_after
+        self.url = url
+        self.verbose = verbose
+        self.rate_limiter = RateLimiter(max_requests_per_second)
+
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def read_manifest(self):
+        """
+        Return the list of completed batches as dictionaries with
+        keys "index", "file" and "ids".
+        """
+        batches = []
+        if not os.path.exists(self.manifest_path):
+            return batches
+        with open(self.manifest_path) as f:
+            for line in f:
+                try:
+                    batches.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # Line left incomplete by an interrupted run
+                    pass
+        return batches
+
+    def completed_ids(self):
+        return {x for batch in self.read_manifest() for x in batch["ids"]}
+
+    def _record(self, index, file_path, ids):
+        with open(self.manifest_path, 'a') as f:
+            f.write(json.dumps({"index": index, "file": file_path, "ids": ids}) + "\n")
+
+    def _backoff_delay(self, attempt, response=None):
+        if response is not None and response.headers.get('Retry-After', '').isdigit():
+            return float(response.headers['Retry-After'])
+        return self.backoff*2**attempt + random.uniform(0, self.backoff)
+
+    def _fetch_batch(self, ids, file_path):
+        """
+        Query a batch, retrying with exponential backoff.
+
+        Returns:
+            status: "done", "timeout" (the batch should be split) or
+            "failed"
+            message: description of the last error
+
+        """
+        query = self.generic_query.replace("|", "\n".join(self.format_id(x) for x in ids))
+        message = ""
+        for attempt in range(self.max_retries):
+            self.rate_limiter.wait()
+            response = None
+            try:
+                response = self.session.get(self.url, params={'query': query}, timeout=self.timeout)
+            except requests.Timeout:
+                message = "request timed out"
+                timed_out = True
+            except requests.ConnectionError as e:
+                message = f"connection error: {e}"
+                timed_out = False
+            except requests.RequestException as e:
+                # E.g. a response cut while it is read, retried as well
+                message = f"request error: {e}"
+                timed_out = False
+            else:
+                if response.status_code == 200:
+                    with open(file_path + ".part", 'wb') as file:
+                        file.write(response.content)
+                    os.replace(file_path + ".part", file_path)
+                    return "done", ""
+                message = f"status code {response.status_code}"
+                # The query service answers 500 with a TimeoutException when the query is too heavy
+                timed_out = response.status_code == 504 or \
+                    (response.status_code == 500 and "TimeoutException" in response.text)
+                if 400 <= response.status_code < 500 and response.status_code != 429:
+                    return "failed", message
+                if response.status_code in (429, 503):
+                    # Slow down all the workers, not only this one
+                    self.rate_limiter.pause(self._backoff_delay(attempt, response))
+                    continue
+
+            if timed_out and len(ids) > self.min_batch_size:
+                return "timeout", message
+            time.sleep(self._backoff_delay(attempt, response))
+        return "failed", message
+
+    def fetch(self, ids):
+        """
+        Query all the IDs not already completed.
+
+        Args:
+            ids: iterable of IDs (missing values are skipped)
+
+        Returns:
+            failed_ids: IDs whose batch failed after all retries
+
+        """
+        manifest = self.read_manifest()
+        completed = {x for batch in manifest for x in batch["ids"]}
+        remaining = [str(x) for x in dict.fromkeys(ids) if not pd.isna(x) and str(x) not in completed]
+        next_file = max((batch["index"] for batch in manifest), default=0) + 1
+        os.makedirs(os.path.dirname(self.temp_files_path) or '.', exist_ok=True)
+
+        n_total = len(remaining)
+        n_done = 0
+        position = 0
+        split_batches = deque()
+        n_successes = 0
+        failed_ids = []
+        futures = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while position < n_total or split_batches or futures:
+                # Keep the workers busy, giving priority to the halves of batches that timed out
+                while len(futures) < self.max_workers and (split_batches or position < n_total):
+                    if split_batches:
+                        batch = split_batches.popleft()
+                    else:
+                        batch = remaining[position:position + self.batch_size]
+                        position += len(batch)
+                    file_path = f"{self.temp_files_path}{next_file:06d}.csv"
+                    futures[executor.submit(self._fetch_batch, batch, file_path)] = (next_file, batch, file_path)
+                    next_file += 1
+
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, batch, file_path = futures.pop(future)
+                    status, message = future.result()
+                    if status == "done":
+                        self._record(index, file_path, batch)
+                        n_done += len(batch)
+                        if self.verbose:
+                            print(f"{n_done}/{n_total} done")
+                        n_successes += 1
+                        if n_successes >= self.recover_after and self.batch_size < self.max_batch_size:
+                            # The service answers again in time, the batch size grows back
+                            self.batch_size = min(self.max_batch_size, 2*self.batch_size)
+                            n_successes = 0
+                            if self.verbose:
+                                print(f"Batch size increased to {self.batch_size}")
+                    elif status == "timeout":
+                        half = len(batch)//2
+                        n_successes = 0
+                        self.batch_size = max(self.min_batch_size, min(self.batch_size, half))
+                        split_batches.extendleft([batch[half:], batch[:half]])
+                        if self.verbose:
+                            print(f"Batch of {len(batch)} IDs timed out, batch size reduced to {self.batch_size}")
+                    else:
+                        failed_ids.extend(batch)
+                        if self.verbose:
+                            print(f"Batch of {len(batch)} IDs failed ({message}), to redo")
+
+        return failed_ids
+
+    def read_results(self):
+        """
+        Concatenate the temporary files of all the completed batches.
+
+        Returns:
+            df: Pandas DataFrame
+
+        """
+        files = [batch["file"] for batch in self.read_manifest()]
+        if not files:
+            return pd.DataFrame()
+        return pd.concat([pd.read_csv(f) for f in files], ignore_index=True)
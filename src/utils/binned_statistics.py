@@ -0,0 +1,299 @@
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+from scipy.signal import fftconvolve
+
+# Number of rows processed at once, so that the memory used by the aggregations does not grow with the data
+CHUNK_SIZE = 1_000_000
+
+def stratified_sample(df, n, by=None, seed=0):
+    """
+    Sample at most n rows of a DataFrame, keeping the proportions
+    of the strata (every stratum keeps at least one row).
+
+    Args:
+        df: Pandas DataFrame
+        n: maximum number of rows of the sample
+        by: column defining the strata (default None, i.e. a
+        uniform sample)
+        seed: seed of the random generator (default 0)
+
+    Returns:
+        sample: DataFrame with the sampled rows, in their original
+        order (df itself if it has at most n rows)
+
+    """
+    if len(df) <= n:
+        return df
+    rng = np.random.default_rng(seed)
+    if by is None:
+        return df.iloc[np.sort(rng.choice(len(df), n, replace=False))]
+
+    # Rows are ranked at random within their stratum and the first quota rows of each stratum are kept
+    codes, _ = pd.factorize(df[by], use_na_sentinel=False)
+    sizes = np.bincount(codes)
+    quotas = np.maximum(np.floor(n*sizes/len(df)).astype(np.int64), 1)
+    order = np.lexsort((rng.random(len(df)), codes))
+    starts = np.cumsum(sizes) - sizes
+    ranks = np.arange(len(df)) - starts[codes[order]]
+    return df.iloc[np.sort(order[ranks < quotas[codes[order]]])]
+
+def value_ranges(df, columns, chunk_size=CHUNK_SIZE):
+    """
+    Minimum, maximum, mean and standard deviation of columns, in
+    one pass over chunks of rows (missing values are ignored).
+
+    Args:
+        df: Pandas DataFrame
+        columns: list of numeric columns
+        chunk_size: number of rows processed at once (default
+        CHUNK_SIZE)
+
+    Returns:
+        ranges: DataFrame with one row per column and the columns
+        count, min, max, mean and std
+
+    """
+    count, low, high = np.zeros(len(columns)), np.full(len(columns), np.inf), np.full(len(columns), -np.inf)
+    shift, sums, squares = None, np.zeros(len(columns)), np.zeros(len(columns))
+    for chunk in _chunks(df, columns, chunk_size):
+        valid = ~np.isnan(chunk)
+        if shift is None:
+            # Values are shifted by the mean of the first chunk to limit cancellations
+            shift = np.where(valid, chunk, 0).sum(axis=0)/np.maximum(valid.sum(axis=0), 1)
+        centered = np.where(valid, chunk - shift, 0)
+        count += valid.sum(axis=0)
+        sums += centered.sum(axis=0)
+        squares += (centered**2).sum(axis=0)
+        low = np.minimum(low, np.where(valid, chunk, np.inf).min(axis=0))
+        high = np.maximum(high, np.where(valid, chunk, -np.inf).max(axis=0))
+    shift = 0 if shift is None else shift
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = sums/count
+        std = np.sqrt(np.maximum(squares - sums*mean, 0)/(count - 1))
+    return pd.DataFrame({"count": count.astype(np.int64), "min": np.where(count > 0, low, np.nan),
+                         "max": np.where(count > 0, high, np.nan), "mean": mean + shift, "std": std},
+                        index=pd.Index(columns))
+
+def histogram(df, column, bins=70, value_range=None, chunk_size=CHUNK_SIZE):
+    """
+    Histogram of a column accumulated over chunks of rows, with the
+    same bins as np.histogram (missing values and values outside of
+    the range are ignored).
+
+    Args:
+        df: Pandas DataFrame
+        column: numeric column
+        bins: number of bins (default 70)
+        value_range: (min, max) of the bins (default None, i.e. the
+        range of the column)
+        chunk_size: number of rows processed at once (default
+        CHUNK_SIZE)
+
+    Returns:
+        counts: numpy array of counts
+        edges: numpy array of the bins + 1 edges
+
+    """
+    if value_range is None:
+        ranges = value_ranges(df, [column], chunk_size)
+        value_range = (ranges["min"].iloc[0], ranges["max"].iloc[0])
+    edges = _edges(value_range, bins)
+    counts = np.zeros(bins, dtype=np.int64)
+    for chunk in _chunks(df, [column], chunk_size):
+        values = chunk[:, 0]
+        values = values[(values >= edges[0]) & (values <= edges[-1])]
+        counts += np.bincount(_bin_index(values, edges), minlength=bins)
+    return counts, edges
+
+def histogram_2d(df, x, y, bins=200, x_range=None, y_range=None, chunk_size=CHUNK_SIZE):
+    """
+    2D histogram of two columns accumulated over chunks of rows
+    (rows with a missing value or outside of the ranges are
+    ignored), to draw a binned density instead of every point.
+
+    Args:
+        df: Pandas DataFrame
+        x: column of the horizontal axis
+        y: column of the vertical axis
+        bins: number of bins on each axis (default 200)
+        x_range/y_range: (min, max) of the bins (default None, i.e.
+        the range of the column)
+        chunk_size: number of rows processed at once (default
+        CHUNK_SIZE)
+
+    Returns:
+        counts: numpy array of counts (x bins x y bins)
+        x_edges: numpy array of the x edges
+        y_edges: numpy array of the y edges
+
+    """
+    if x_range is None or y_range is None:
+        ranges = value_ranges(df, [x, y], chunk_size)
+        x_range = x_range if x_range is not None else (ranges.loc[x, "min"], ranges.loc[x, "max"])
+        y_range = y_range if y_range is not None else (ranges.loc[y, "min"], ranges.loc[y, "max"])
+    x_edges, y_edges = _edges(x_range, bins), _edges(y_range, bins)
+    counts = np.zeros(bins*bins, dtype=np.int64)
+    for chunk in _chunks(df, [x, y], chunk_size):
+        chunk = chunk[(chunk[:, 0] >= x_edges[0]) & (chunk[:, 0] <= x_edges[-1])
+                      & (chunk[:, 1] >= y_edges[0]) & (chunk[:, 1] <= y_edges[-1])]
+        counts += np.bincount(_bin_index(chunk[:, 0], x_edges)*bins + _bin_index(chunk[:, 1], y_edges),
+                              minlength=bins*bins)
+    return counts.reshape(bins, bins), x_edges, y_edges
+
+def pair_histograms(df, columns, bins=100, chunk_size=CHUNK_SIZE):
+    """
+    Histograms of every column and 2D histograms of every pair of
+    columns in one pass over chunks of rows (the bin index of each
+    value is computed once for all the pairs), with bins covering
+    the range of each column. Missing values are ignored (pairwise).
+
+    Args:
+        df: Pandas DataFrame
+        columns: list of numeric columns
+        bins: number of bins of each column (default 100)
+        chunk_size: number of rows processed at once (default
+        CHUNK_SIZE)
+
+    Returns:
+        counts: dictionary of numpy arrays of counts, with the
+        columns as keys for the histograms and the pairs (x, y) of
+        columns (x before y in columns) for the 2D histograms
+        (x bins x y bins)
+        edges: dictionary of the edges of the bins of each column
+
+    """
+    ranges = value_ranges(df, columns, chunk_size)
+    edges = {col: _edges((ranges.loc[col, "min"], ranges.loc[col, "max"]), bins) for col in columns}
+    pairs = list(combinations(range(len(columns)), 2))
+    # Missing values are counted in an extra last bin, dropped at the end
+    counts = {col: np.zeros(bins + 1, dtype=np.int64) for col in columns}
+    counts.update({(columns[i], columns[j]): np.zeros((bins + 1)**2, dtype=np.int64) for i, j in pairs})
+    for chunk in _chunks(df, columns, chunk_size):
+        index = np.full((len(columns), len(chunk)), bins, dtype=np.int64)
+        for i, col in enumerate(columns):
+            values = chunk[:, i]
+            valid = ~np.isnan(values)
+            if valid.all():
+                index[i] = _bin_index(values, edges[col])
+            else:
+                index[i, valid] = _bin_index(values[valid], edges[col])
+            counts[col] += np.bincount(index[i], minlength=bins + 1)
+        codes = np.empty(len(chunk), dtype=np.int64)
+        for i, j in pairs:
+            np.multiply(index[i], bins + 1, out=codes)
+            codes += index[j]
+            counts[(columns[i], columns[j])] += np.bincount(codes, minlength=(bins + 1)**2)
+    for col in columns:
+        counts[col] = counts[col][:bins]
+    for i, j in pairs:
+        counts[(columns[i], columns[j])] = counts[(columns[i], columns[j])].reshape(bins + 1, bins + 1)[:bins, :bins]
+    return counts, edges
+
+def binned_kde(df, column, grid_size=512, bw_adjust=1, cut=3, chunk_size=CHUNK_SIZE):
+    """
+    Gaussian kernel density estimate of a column, computed on a
+    grid: the values are linearly binned on the grid and the counts
+    are convolved with the kernel by FFT, so the cost does not
+    depend on the number of values beyond the binning. Bandwidth
+    and grid extent follow seaborn's kdeplot (Scott's rule times
+    bw_adjust, grid extended by cut bandwidths).
+
+    Args:
+        df: Pandas DataFrame
+        column: numeric column
+        grid_size: number of points of the grid (default 512)
+        bw_adjust: factor of the bandwidth (default 1)
+        cut: extension of the grid beyond the values, in
+        bandwidths (default 3)
+        chunk_size: number of rows processed at once (default
+        CHUNK_SIZE)
+
+    Returns:
+        grid: numpy array of the points of the grid
+        density: numpy array of the density at the points
+
+    """
+    ranges = value_ranges(df, [column], chunk_size).iloc[0]
+    n = ranges["count"]
+    if n < 2 or not ranges["std"] > 0:
+        return np.array([]), np.array([])
+    bandwidth = bw_adjust*ranges["std"]*n**(-1/5)
+    grid = np.linspace(ranges["min"] - cut*bandwidth, ranges["max"] + cut*bandwidth, grid_size)
+    delta = grid[1] - grid[0]
+
+    # Linear binning: each value is split between its two closest grid points
+    weights = np.zeros(grid_size + 1)
+    for chunk in _chunks(df, [column], chunk_size):
+        position = (chunk[:, 0][~np.isnan(chunk[:, 0])] - grid[0])/delta
+        index = np.floor(position).astype(np.int64)
+        fraction = position - index
+        weights += np.bincount(index, weights=1 - fraction, minlength=grid_size + 1)[:grid_size + 1]
+        weights += np.bincount(index + 1, weights=fraction, minlength=grid_size + 1)[:grid_size + 1]
+
+    offsets = np.arange(-grid_size + 1, grid_size)*delta
+    kernel = stats.norm.pdf(offsets, scale=bandwidth)
+    density = fftconvolve(weights[:grid_size], kernel, mode='same')/n
+    return grid, np.maximum(density, 0)
+
+def correlation_matrix(df, columns, chunk_size=CHUNK_SIZE):
+    """
+    Pearson correlations (and their p-values) of every pair of
+    columns from a single covariance matrix accumulated over chunks
+    of rows, using the rows without missing values (as pearsonr
+    after dropna).
+
+    Args:
+        df: Pandas DataFrame
+        columns: list of numeric columns
+        chunk_size: number of rows processed at once (default
+        CHUNK_SIZE)
+
+    Returns:
+        corr: DataFrame of correlation coefficients
+        p_values: DataFrame of p-values
+
+    """
+    n, shift = 0, None
+    sums, products = np.zeros(len(columns)), np.zeros((len(columns), len(columns)))
+    for chunk in _chunks(df, columns, chunk_size):
+        chunk = chunk[~np.isnan(chunk).any(axis=1)]
+        if len(chunk) == 0:
+            continue
+        if shift is None:
+            shift = chunk.mean(axis=0)
+        chunk = chunk - shift
+        n += len(chunk)
+        sums += chunk.sum(axis=0)
+        products += chunk.T @ chunk
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariance = products - np.outer(sums, sums)/n
+        scale = np.sqrt(np.diag(covariance))
+        corr = np.clip(covariance/np.outer(scale, scale), -1, 1)
+        t = corr*np.sqrt((n - 2)/(1 - corr**2))
+    p_values = 2*stats.t.sf(np.abs(t), n - 2) if n > 2 else np.full(corr.shape, np.nan)
+    return (pd.DataFrame(corr, index=columns, columns=columns),
+            pd.DataFrame(p_values, index=columns, columns=columns))
+
+def _chunks(df, columns, chunk_size):
+    # Float arrays (missing values as NaN) of the columns for consecutive chunks of rows
+    for start in range(0, len(df), chunk_size):
+        yield df.iloc[start:start + chunk_size][columns].to_numpy(dtype=float, na_value=np.nan)
+
+def _edges(value_range, bins):
+    # Edges of bins equal bins (a range of a single value is widened, as np.histogram does)
+    low, high = value_range
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    return np.linspace(low, high, bins + 1)
+
+def _bin_index(values, edges):
+    # Bin of each value within the edges, as computed by np.histogram (the last bin includes its right edge)
+    bins = len(edges) - 1
+    index = np.floor((values - edges[0])*(bins/(edges[-1] - edges[0]))).astype(np.int64)
+    index[index == bins] -= 1
+    index[values < edges[index]] -= 1
+    index[(values >= edges[index + 1]) & (index != bins - 1)] += 1
+    return index
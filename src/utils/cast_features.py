@@ -0,0 +1,166 @@
+import hashlib
+import inspect
+
+import numpy as np
+import pandas as pd
+
+# Features of the cast of each movie, in the order of the columns of compute_cast_features
+CAST_FEATURES = ["mean_age", "std_age", "cast_country_count", "cast_country_entropy", "female_score", "gender_score",
+                 "director_fame", "director_fame_bool", "actor_fame", "actor_fame_bool"]
+# Name of the cast features in the dataset store
+CAST_FEATURES_DATASET = "cast_features"
+# Version of the cast features, to increase when their definition changes in a way the code hash does not capture
+CAST_FEATURES_VERSION = 1
+
+def compute_cast_features(df, movie_col='freebase_id_movie', person_col='univocal_id_actor', role_col='role',
+                          liminf=18, limsup=70, min_gender_count=4):
+    """
+    Compute the features of the cast of each movie from a table
+    with one row per movie and person, encoding movies, persons,
+    countries and genders as integer codes and aggregating them with
+    np.bincount:
+    - mean_age/std_age: mean and standard deviation of the ages of
+    the persons (directors included) at the release, ages out of
+    [liminf, limsup] are ignored (see compute_age)
+    - cast_country_count/cast_country_entropy: number of distinct
+    countries of birth of the actors and their Shannon entropy in
+    bits
+    - female_score: proportion of women among the actors whose
+    gender is known, when there are at least min_gender_count of
+    them, and gender_score = 2*|female_score - 0.5|
+    - director_fame/actor_fame: maximum number of movies directed
+    (resp. played in) by a person of the movie, at least 1, and
+    director_fame_bool/actor_fame_bool: fame greater than 1
+
+    Args:
+        df: Pandas DataFrame with columns movie_col, person_col,
+        role_col ("director" for directors), 'release_year',
+        'year_of_birth', 'country' and 'gender' ("F" for women)
+        movie_col: name of the column of movie IDs (default
+        'freebase_id_movie')
+        person_col: name of the column of person IDs (default
+        'univocal_id_actor')
+        role_col: name of the column of roles (default 'role')
+        liminf/limsup: extreme age values (default 18/70)
+        min_gender_count: minimum number of actors with a known
+        gender for female_score (default 4)
+
+    Returns:
+        features: DataFrame with one row per movie, the column
+        movie_col and the columns in CAST_FEATURES
+
+    """
+    columns = [movie_col, person_col, role_col, 'release_year', 'year_of_birth', 'country', 'gender']
+    missing = [col for col in columns if col not in df.columns]
+    if missing:
+        raise Exception(f"Missing columns: {', '.join(missing)}")
+
+    movie, movie_ids = pd.factorize(df[movie_col])
+    n_movies = len(movie_ids)
+    is_director = (df[role_col] == "director").to_numpy(dtype=bool, na_value=False)
+    features = pd.DataFrame({movie_col: movie_ids})
+
+    # Ages at release
+    age = (pd.to_numeric(df['release_year'], errors='coerce') - pd.to_numeric(df['year_of_birth'], errors='coerce'))
+    age = age.to_numpy(dtype=float, na_value=np.nan)
+    valid = (age >= liminf) & (age <= limsup) & (movie >= 0)
+    count = np.bincount(movie[valid], minlength=n_movies)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(movie[valid], weights=age[valid], minlength=n_movies)/count
+        squares = np.bincount(movie[valid], weights=(age[valid] - mean[movie[valid]])**2, minlength=n_movies)
+        features["mean_age"] = mean
+        features["std_age"] = np.sqrt(squares/(count - 1))
+    features.loc[count < 2, "std_age"] = np.nan
+
+    # Countries of birth of the actors
+    country, countries = pd.factorize(df['country'])
+    n_countries = max(len(countries), 1)
+    rows = (country >= 0) & ~is_director & (movie >= 0)
+    pairs, pair_count = np.unique(movie[rows].astype(np.int64)*n_countries + country[rows], return_counts=True)
+    pair_movie = pairs//n_countries
+    total = np.bincount(pair_movie, weights=pair_count, minlength=n_movies)
+    p = pair_count/total[pair_movie]
+    country_count = np.bincount(pair_movie, minlength=n_movies)
+    entropy = -np.bincount(pair_movie, weights=p*np.log2(p), minlength=n_movies)
+    features["cast_country_count"] = np.where(country_count > 0, country_count, np.nan)
+    features["cast_country_entropy"] = np.where(country_count > 0, entropy, np.nan)
+
+    # Gender balance of the actors
+    gender = df['gender']
+    rows = gender.notna().to_numpy() & ~is_director & (movie >= 0)
+    n_known = np.bincount(movie[rows], minlength=n_movies)
+    n_women = np.bincount(movie[rows & (gender == "F").to_numpy(dtype=bool, na_value=False)], minlength=n_movies)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        female_score = np.where(n_known >= min_gender_count, n_women/n_known, np.nan)
+    features["female_score"] = female_score
+    features["gender_score"] = 2*np.abs(female_score - 0.5)
+
+    # Fame: number of distinct movies of each person as director (resp. actor), maximum over the persons of a movie
+    person, persons = pd.factorize(df[person_col])
+    for name, rows in [("director_fame", is_director), ("actor_fame", ~is_director)]:
+        rows = rows & (person >= 0) & (movie >= 0)
+        pairs = np.unique(person[rows].astype(np.int64)*n_movies + movie[rows])
+        # The extra last element (0) is the fame of missing persons (code -1)
+        n_movies_person = np.bincount(pairs//n_movies, minlength=len(persons) + 1)
+        # As in the notebook, every row of a person counts, whatever its role in the movie
+        fame = n_movies_person[person]
+        movie_fame = np.zeros(n_movies, dtype=np.int64)
+        np.maximum.at(movie_fame, movie[movie >= 0], fame[movie >= 0])
+        features[name] = np.maximum(movie_fame, 1)
+        features[name + "_bool"] = features[name] > 1
+
+    return features
+
+def load_cast_features(store, source_paths, build_table, inputs=None, **kwargs):
+    """
+    Read the cast features from the dataset store, computing them
+    only when one of the source files, the code of
+    compute_cast_features or build_table (and of the functions
+    build_table calls), the columns, dtypes and values of the
+    inputs, the options or CAST_FEATURES_VERSION changed.
+
+    Args:
+        store: DatasetStore
+        source_paths: list of paths of the files the movie x person
+        table is built from
+        build_table: function without arguments returning the
+        movie x person table (see compute_cast_features)
+        inputs: list of in-memory DataFrames build_table uses
+        (default None)
+        kwargs: options passed to compute_cast_features
+
+    Returns:
+        features: DataFrame of cast features, one row per movie
+
+    """
+    params = {**kwargs, "version": CAST_FEATURES_VERSION,
+              "code": [_code_hash(compute_cast_features), _code_hash(build_table)],
+              "inputs": [_fingerprint(df) for df in inputs or []]}
+    return store.derive(CAST_FEATURES_DATASET, source_paths, lambda: compute_cast_features(build_table(), **kwargs),
+                        params=params, optimize=False)
+
+def _code_hash(func):
+    # Hash of the source of a function and of the global functions it calls (e.g. map_tokens in the notebook)
+    called = [func.__globals__.get(name) for name in func.__code__.co_names]
+    called = [f for f in called if inspect.isfunction(f) and f is not func]
+    h = hashlib.blake2b(digest_size=16)
+    for f in [func] + sorted(called, key=lambda f: f.__qualname__):
+        h.update(_source(f).encode())
+    return h.hexdigest()
+
+def _source(func):
+    # Source of a function, or its bytecode and constants when the source is not available
+    try:
+        return inspect.getsource(func)
+    except (OSError, TypeError):
+        return repr((func.__code__.co_code, func.__code__.co_consts, func.__code__.co_names))
+
+def _fingerprint(df):
+    # Columns, dtypes and hash of the content (values and index) of a DataFrame
+    try:
+        row_hashes = pd.util.hash_pandas_object(df, index=True)
+    except TypeError:
+        # Unhashable values (e.g. lists) are hashed through their text
+        row_hashes = pd.util.hash_pandas_object(df.astype(str), index=True)
+    content = hashlib.blake2b(row_hashes.to_numpy().tobytes(), digest_size=16).hexdigest()
+    return [[[str(col), str(dtype)] for col, dtype in df.dtypes.items()], content]
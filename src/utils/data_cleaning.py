@@ -1,4 +1,8 @@
 import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from scipy.sparse import csr_matrix
 
 def transform_columns(df, columns, func, substitute=False, prefix='_'):
     """
@@ -34,4 +38,206 @@ def transform_columns(df, columns, func, substitute=False, prefix='_'):
             new_col_name = prefix + '_' + col
             if col in df.columns and new_col_name not in df.columns:
                 df[new_col_name] = func(df[col])
-                df.drop(columns=col, inplace=True)
\ No newline at end of file
+                df.drop(columns=col, inplace=True)
+
+def fit_vocabulary(series, min_count=1, sep=',', tokens=None):
+    """
+    Find the tokens of a column of separated lists (e.g.
+    "drama,comedy") that appear in at least min_count rows.
+
+    Args:
+        series: Pandas series of strings (missing values are
+        ignored)
+        min_count: minimum number of rows containing a token
+        (default 1)
+        sep: separator of the tokens (default ',')
+        tokens: tokens allowed in the vocabulary (default None,
+        i.e. all)
+
+    Returns:
+        vocabulary: sorted Pandas Index of tokens
+
+    """
+    return _fit_vocabulary(*_tokenize(series, sep), min_count, tokens)
+
+def multi_hot_encode(series, vocabulary=None, min_count=1, sep=',', tokens=None):
+    """
+    Encode a column of separated lists as a sparse indicator
+    matrix, with one row per element of the series and one column
+    per token of the vocabulary. Tokens outside of the vocabulary
+    are ignored.
+
+    Args:
+        series: Pandas series of strings (missing values give
+        empty rows)
+        vocabulary: list of tokens, in the order of the columns
+        (default None, i.e. fitted on the series with
+        fit_vocabulary)
+        min_count: passed to fit_vocabulary (default 1)
+        sep: separator of the tokens (default ',')
+        tokens: passed to fit_vocabulary (default None)
+
+    Returns:
+        matrix: boolean scipy CSR matrix
+        vocabulary: Pandas Index of the tokens of the columns
+
+    """
+    rows, codes, uniques = _tokenize(series, sep)
+    if vocabulary is None:
+        vocabulary = _fit_vocabulary(rows, codes, uniques, min_count, tokens)
+    else:
+        vocabulary = pd.Index(list(vocabulary), dtype=object)
+        if vocabulary.has_duplicates:
+            raise Exception("The vocabulary contains duplicated tokens")
+
+    # Column of each distinct token (-1 outside of the vocabulary), then one entry per (row, column) pair
+    lookup = vocabulary.get_indexer(uniques)
+    columns = lookup[codes]
+    kept = columns >= 0
+    rows, columns = rows[kept], columns[kept]
+    n_columns = max(len(vocabulary), 1)
+    keys = np.unique(rows*n_columns + columns)
+    rows, columns = np.divmod(keys, n_columns)
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=len(series)))])
+    matrix = csr_matrix((np.ones(len(keys), dtype=bool), columns, indptr), shape=(len(series), len(vocabulary)))
+    return matrix, vocabulary
+
+def multi_hot_dummies(series, vocabulary=None, min_count=1, sep=',', tokens=None, prefix='', sparse=False):
+    """
+    Dummy columns of a column of separated lists, the equivalent of
+    pandas.get_dummies when a row can have several values (see
+    multi_hot_encode).
+
+    Args:
+        series: Pandas series of strings
+        vocabulary: list of tokens (default None, i.e. fitted on
+        the series)
+        min_count: minimum number of rows containing a token when
+        fitting the vocabulary (default 1)
+        sep: separator of the tokens (default ',')
+        tokens: tokens allowed when fitting the vocabulary
+        (default None, i.e. all)
+        prefix: prefix of the names of the columns (default '')
+        sparse: True to return sparse boolean columns, False for
+        dense ones (default False)
+
+    Returns:
+        dummies: Pandas DataFrame with the index of the series and
+        one boolean column per token
+
+    """
+    matrix, vocabulary = multi_hot_encode(series, vocabulary, min_count, sep, tokens)
+    columns = [prefix + str(token) for token in vocabulary]
+    if sparse:
+        dummies = pd.DataFrame.sparse.from_spmatrix(matrix.astype(np.uint8), index=series.index, columns=columns)
+        return dummies.astype(pd.SparseDtype(bool, False))
+    return pd.DataFrame(matrix.toarray(), index=series.index, columns=columns)
+
+def read_mapper(path, lowercase=False, **read_csv_kwargs):
+    """
+    Read a mapper file, whose first column contains the names found
+    in the data and the second one their normalized names (missing
+    for names to drop).
+
+    Args:
+        path: path of the file (e.g. countries_names_mapper.csv.gz)
+        lowercase: True to lowercase the names of the first column
+        (default False)
+        read_csv_kwargs: options passed to pd.read_csv (e.g.
+        header=None)
+
+    Returns:
+        mapper: Pandas series of normalized names indexed by name
+        (for repeated names the last one is kept, as in a dict)
+
+    """
+    mapper_df = pd.read_csv(path, dtype=str, **read_csv_kwargs)
+    keys = mapper_df.iloc[:, 0].str.lower() if lowercase else mapper_df.iloc[:, 0]
+    mapper = pd.Series(mapper_df.iloc[:, 1].to_numpy(), index=keys.to_numpy())
+    return mapper[~mapper.index.duplicated(keep='last')]
+
+def map_tokens(series, mapper, sep=',', lowercase=False):
+    """
+    Normalize the tokens of a column of separated lists (e.g.
+    "USA,France") with a mapper. Tokens mapped to a missing name
+    are dropped, repeated names of a row are kept once (in order of
+    first appearance) and rows left without names become missing.
+    Tokens that are not in the mapper are dropped and reported.
+
+    Args:
+        series: Pandas series of strings
+        mapper: Pandas series of names indexed by token (see
+        read_mapper), a name can be a separated list
+        sep: separator of the tokens (default ',', None if each
+        value is a single token)
+        lowercase: True to lowercase the tokens before mapping
+        them (default False)
+
+    Returns:
+        mapped: Pandas series of separated lists, with the index
+        of series
+        unknown: Pandas series with the number of occurrences of
+        each token missing from the mapper
+
+    """
+    rows, codes, uniques = _tokenize(series, sep) if sep is not None else _single_tokens(series)
+    keys = uniques.str.lower() if lowercase else uniques
+    position = mapper.index.get_indexer(keys)
+
+    # Normalized names of each mapper entry (a name can be a list), as ranges of name_codes
+    names = mapper.dropna()
+    entries = mapper.index.get_indexer(names.index)
+    name_rows, name_codes, name_uniques = (_tokenize(names, sep) if sep is not None
+                                           else _single_tokens(names))
+    # The extra last element (no names) is the entry of the tokens missing from the mapper (position -1)
+    name_count = np.bincount(entries[name_rows], minlength=len(mapper) + 1)
+    name_start = np.cumsum(name_count) - name_count
+
+    # Each token of each row is replaced by the names of its entry, then repeated names are dropped
+    token_position = position[codes]
+    count = name_count[token_position]
+    rows = np.repeat(rows, count)
+    mapped = name_codes[np.repeat(name_start[token_position], count)
+                        + np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)]
+    _, first = np.unique(rows*max(len(name_uniques), 1) + mapped, return_index=True)
+    first = np.sort(first)
+    rows, mapped = rows[first], mapped[first]
+
+    # Join the names of each row
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=len(series)))])
+    lists = pa.ListArray.from_arrays(pa.array(offsets, type=pa.int32()),
+                                     pc.take(pa.array(name_uniques.to_numpy(dtype=object), type=pa.string()),
+                                             pa.array(mapped)))
+    joined = pc.binary_join(lists, sep if sep is not None else ',').to_numpy(zero_copy_only=False)
+    mapped = pd.Series(np.where(np.diff(offsets) > 0, joined, pd.NA), index=series.index, dtype=object)
+
+    unknown_counts = np.bincount(codes[token_position < 0], minlength=len(uniques))
+    unknown = pd.Series(unknown_counts, index=uniques, name='count')
+    unknown = unknown[unknown > 0].sort_values(ascending=False, kind='stable')
+    return mapped, unknown
+
+def _tokenize(series, sep):
+    # Row position and token code of every non-empty token, with the distinct tokens
+    lists = pc.split_pattern(pa.array(series.astype('string[pyarrow]').array), sep)
+    rows = pc.list_parent_indices(lists)
+    flat = pc.list_flatten(lists)
+    non_empty = pc.not_equal(flat, "")
+    encoded = pc.dictionary_encode(flat.filter(non_empty))
+    rows = rows.filter(non_empty).to_numpy().astype(np.int64)
+    codes = encoded.indices.to_numpy().astype(np.int64)
+    return rows, codes, pd.Index(encoded.dictionary.to_pylist(), dtype=object)
+
+def _fit_vocabulary(rows, codes, uniques, min_count, tokens):
+    # Tokens in at least min_count rows (a token repeated in a row counts once), restricted to tokens
+    _, first = np.unique(rows*max(len(uniques), 1) + codes, return_index=True)
+    counts = np.bincount(codes[first], minlength=len(uniques))
+    vocabulary = uniques[counts >= min_count]
+    if tokens is not None:
+        vocabulary = vocabulary[vocabulary.isin(list(tokens))]
+    return vocabulary.sort_values()
+
+def _single_tokens(series):
+    # Row position and code of every non-missing value, each value being a single token
+    codes, uniques = pd.factorize(series)
+    rows = np.flatnonzero(codes >= 0)
+    return rows, codes[rows].astype(np.int64), pd.Index(uniques, dtype=object)
@@ -1,13 +1,20 @@
 import numpy as np
 import pandas as pd
 
+from resampling import equalize_lengths
+
 def merge_movies_cast(pivot_df, cast_df, movies_df, 
                       cast_key_pivot, cast_key_right, movie_key_pivot, 
-                      movie_key_right, columns, role_col, role='any'):
+                      movie_key_right, columns, role_col, role='any',
+                      chunk_size=None):
     """
     Merge movies dataset with cast datasets exploiting a "pivot"
     dataset connecting the two.
 
+    To limit memory, each DataFrame is reduced to the columns needed
+    and deduplicated before the joins, and the joins are done on
+    integer codes shared by the two sides instead of the keys.
+
     Args:
         pivot_df: pandas DataFrame connecting the other two by keys
         cast_df: pandas DataFrame of cast members
@@ -24,54 +31,99 @@ def merge_movies_cast(pivot_df, cast_df, movies_df,
         role_col: name of column specifying role in piovt_df
         role: role to consider ('actor', 'director' or 'any')
         (default 'any')
+        chunk_size: number of rows of pivot_df merged at a time
+        (default None, i.e. all at once)
 
     Returns:
         merged_df: pandas merged DataFrame
 
     """
-    
-    try:
-        # Consider only specified roles
-        if role == 'any':
-            temp = pivot_df.dropna(subset=cast_key_pivot)
-        elif role in pivot_df[role_col].unique():
-            temp = pivot_df[pivot_df[role_col]==role]. \
-            dropna(subset=cast_key_pivot)
-        else:
-            raise Exception("Please provide a valid role ('actor', 'director' or 'any')")
-    except:
-        Exception("Verify that role_col is a valid column of pivot_df")
-    
-    try:
-        # Merge actors with movies-actors mapping
-        movies_and_actors = pd.merge(temp[[movie_key_pivot, cast_key_pivot]], 
-                                cast_df.dropna(subset=cast_key_right). \
-                                drop_duplicates(subset=cast_key_right), 
-                                left_on=cast_key_pivot, right_on=cast_key_right)
-    except:
-        raise Exception("Verify that movie_key_pivot and cast_key_pivot are valid columns for",
-                        "pivot_df and that cast_key_right is valid for cast_df")
-    
-    try:
-        # Merge this with movies
-        movies_and_actors = pd.merge(movies_and_actors, movies_df, 
-                                    left_on=movie_key_pivot, right_on=movie_key_right)
-    except:
-        raise Exception("Verify that movie_key_pivot is a valid column for",
-                        "pivot_df and that movie_key_right is valid for movies_df")
-    
-    try:
-        # Consider only relevant columns
-        movies_and_actors = movies_and_actors[columns]
-    except:
-        raise Exception("Verify that all columns exist.")
+    if movie_key_pivot not in pivot_df.columns or cast_key_pivot not in pivot_df.columns:
+        raise Exception("Verify that movie_key_pivot and cast_key_pivot are valid columns for pivot_df")
+    if cast_key_right not in cast_df.columns:
+        raise Exception("Verify that cast_key_right is a valid column for cast_df")
+    if movie_key_right not in movies_df.columns:
+        raise Exception("Verify that movie_key_right is a valid column for movies_df")
+
+    # Consider only specified roles
+    if role == 'any':
+        temp = pivot_df[[movie_key_pivot, cast_key_pivot]]
+    elif role_col not in pivot_df.columns:
+        raise Exception("Verify that role_col is a valid column of pivot_df")
+    elif (pivot_df[role_col] == role).any():
+        temp = pivot_df.loc[pivot_df[role_col] == role, [movie_key_pivot, cast_key_pivot]]
+    else:
+        raise Exception("Please provide a valid role ('actor', 'director' or 'any')")
+    temp = temp.dropna(subset=cast_key_pivot)
+
+    # Keep only the columns used by the merges or in the final DataFrame
+    cast = cast_df[_needed_columns(cast_df, columns, cast_key_right)]. \
+        dropna(subset=cast_key_right).drop_duplicates(subset=cast_key_right)
+    movies = movies_df[_needed_columns(movies_df, columns, movie_key_right)].drop_duplicates()
+
+    # Replace keys by integer codes shared by the two sides of each merge
+    temp[cast_key_pivot], cast[cast_key_right], cast_keys = _shared_codes(temp[cast_key_pivot], cast[cast_key_right])
+    temp[movie_key_pivot], movies[movie_key_right], movie_keys = _shared_codes(temp[movie_key_pivot], movies[movie_key_right])
+    temp = temp.drop_duplicates()
+
+    # Identify the distinct values that each side brings to the final columns, so that duplicated rows
+    # are found comparing two integer ids instead of all the final columns
+    cast["_cast_id"] = _group_ids(cast, columns, cast_key_right, cast_key_pivot in columns)
+    movies["_movie_id"] = _group_ids(movies, columns, movie_key_right, movie_key_pivot in columns)
+    n_movie_ids = movies["_movie_id"].max() + 1 if len(movies) > 0 else 1
+
+    step = chunk_size or max(len(temp), 1)
+    chunks = []
+    pairs = []
+    for start in range(0, max(len(temp), 1), step):
+        # Merge actors with movies-actors mapping, then with movies
+        movies_and_actors = pd.merge(temp.iloc[start:start + step], cast, left_on=cast_key_pivot, right_on=cast_key_right)
+        movies_and_actors = pd.merge(movies_and_actors, movies, left_on=movie_key_pivot, right_on=movie_key_right)
+        pair = movies_and_actors["_cast_id"].to_numpy()*n_movie_ids + movies_and_actors["_movie_id"].to_numpy()
+        try:
+            # Consider only relevant columns
+            movies_and_actors = movies_and_actors[columns]
+        except KeyError:
+            raise Exception("Verify that all columns exist.")
+        unique = ~pd.Series(pair).duplicated().to_numpy()
+        chunks.append(movies_and_actors[unique])
+        pairs.append(pair[unique])
 
     # Drop completely duplicated rows based only on selected features
-    movies_and_actors = movies_and_actors.drop_duplicates()
+    if len(chunks) == 1:
+        movies_and_actors = chunks[0]
+    else:
+        unique = np.split(~pd.Series(np.concatenate(pairs)).duplicated().to_numpy(), np.cumsum([len(p) for p in pairs])[:-1])
+        for i in range(len(chunks)):
+            chunks[i] = chunks[i][unique[i]]
+        movies_and_actors = pd.concat(chunks, ignore_index=True)
+
+    # Restore the keys from their codes
+    keys = {cast_key_pivot: cast_keys, cast_key_right: cast_keys, movie_key_pivot: movie_keys, movie_key_right: movie_keys}
+    for col in movies_and_actors.columns.intersection(list(keys)):
+        movies_and_actors[col] = pd.api.extensions.take(keys[col], movies_and_actors[col].to_numpy(), allow_fill=True)
 
     return movies_and_actors
 
-def compute_age(df, birth_year_col, release_year_col, new_col, liminf=18, limsup=70):
+def _needed_columns(df, columns, key):
+    # Columns of df used as key or kept in the final DataFrame (possibly with the suffix added by pd.merge)
+    columns = set(columns)
+    return [col for col in df.columns if col == key or col in columns or col + "_x" in columns or col + "_y" in columns]
+
+def _group_ids(df, columns, key, key_kept):
+    # Integer id of the values of the final columns in each row of df (rows with the same values have the same id)
+    cols = [col for col in _needed_columns(df, columns, key) if col != key or key_kept]
+    if not cols:
+        return np.zeros(len(df), dtype=np.int64)
+    return df.groupby(cols, sort=False, dropna=False).ngroup().to_numpy()
+
+def _shared_codes(left, right):
+    # Encode two key columns with the same integer codes (missing values are -1 on both sides, so they match
+    # as in pd.merge)
+    codes, uniques = pd.factorize(pd.concat([left, right], ignore_index=True))
+    return codes[:len(left)], codes[len(left):], uniques.to_numpy()
+
+def compute_age(df, birth_year_col, release_year_col, new_col, liminf=18, limsup=70, inplace=False):
     """
     Compute age of actors/directors when a movie they appear 
     in was released.
@@ -83,54 +135,51 @@ def compute_age(df, birth_year_col, release_year_col, new_col, liminf=18, limsup
         release_year_col: name of column indicating the release 
         year
         new_col: name of the new column
-        liminf/limsup: extreme age values (default 18/85)
+        liminf/limsup: extreme age values (default 18/70)
+        inplace: True to add the column to df instead of a copy
+        (default False)
 
     Returns:
-        df: modified DataFrame
+        df: modified DataFrame, ages out of the limits are missing
+        (NaN for float years, <NA> for nullable or integer years)
 
     """
-    new_data = df.copy()
-
-    if birth_year_col not in new_data.columns or release_year_col not in new_data.columns:
+    if birth_year_col not in df.columns or release_year_col not in df.columns:
         raise Exception("Check the name of columns")
-    
+
+    new_data = df if inplace else df.copy()
+
     # Compute age at movie release
-    new_data[new_col] = new_data[release_year_col] - new_data[birth_year_col]
+    # Integer years (unsigned included) are subtracted as nullable signed integers, so that ages can be missing
+    # and a birth after the release gives a negative age instead of wrapping around
+    years = [df[col].astype("Int64") if pd.api.types.is_integer_dtype(df[col]) else df[col]
+             for col in [release_year_col, birth_year_col]]
+    age = years[0] - years[1]
 
     # Exclude values that don't make sense
-    new_data[new_col] = new_data[new_col].apply(lambda x: x if x>=liminf and x<=limsup else np.nan)
+    valid = ((age >= liminf) & (age <= limsup)).to_numpy(dtype=bool, na_value=False)
+    new_data[new_col] = age.where(valid)
 
     return new_data
 
-def bootstrap(data1, data2):
+def bootstrap(data1, data2, seed=1):
     """
     Consider the shortest dataset, and bootstrap random values 
-    from it to equal the length of the longest one.
+    from it to equal the length of the longest one (see
+    resampling.py for bootstrap replicates and confidence
+    intervals).
 
     Args:
         data1: np.array or Pandas series
         data2: np.array or Pandas series
+        seed: seed of the random generator (default 1)
 
     Returns:
         shortest_data/longest_data: new datasets with equal 
         length
 
     """
-    if len(data1)>len(data2):
-        n = len(data1) - len(data2)
-        longest_data = data1.copy()
-        shortest_data = data2.copy()
-    elif len(data2)>len(data1):
-        n = len(data2) - len(data1)
-        longest_data = data2.copy()
-        shortest_data = data1.copy()
-    else:
-        return data1, data2
-    
-    samp = shortest_data.sample(n=n, random_state=1, replace=True)
-    shortest_data = pd.concat([shortest_data, samp], ignore_index=True)
-
-    return shortest_data, longest_data
+    return equalize_lengths(data1, data2, seed)
 
 def extract_primary_company(df, column, columns, n=0, add_count=True):
     """
@@ -161,19 +210,26 @@ def extract_primary_company(df, column, columns, n=0, add_count=True):
     except:
         raise Exception("Input a positive integer value for n")
     
-    new_df = df.copy()
+    # Only the columns to return are taken from df, each distinct value is split once at the first comma
+    col1_name = 'primary_' + column
+    col2_name = 'secondary_' + column
+    companies = df[column].fillna('')
     try:
-        new_df[column] = new_df[column].fillna('')
-        col1_name = 'primary_' + column
-        col2_name = 'secondary_' + column
-        new_df[col1_name] = new_df[column].apply(lambda x: x.split(',')[0] if x else None)
-        new_df[col2_name] = new_df[column].apply(lambda x: ','.join(x.split(',')[1:]) if ',' in x else None)
+        codes, uniques = pd.factorize(companies)
+        primary = np.array([value.partition(',')[0] if value else None for value in uniques], dtype=object)
     except:
         print("Operation was not applied; check that it can be performed on the datatype")
-        return new_df
-    
+        return df.assign(**{column: companies})
+
     if col1_name not in columns:
         columns.extend([col1_name])
+    new_df = df[[col for col in columns if col != col1_name]].copy()
+    if column in columns:
+        new_df[column] = companies
+    new_df[col1_name] = primary[codes]
+    if col2_name in columns:
+        secondary = np.array([value.partition(',')[2] if ',' in value else None for value in uniques], dtype=object)
+        new_df[col2_name] = secondary[codes]
 
     if n==0:
         new_df['count'] = new_df[col1_name].map(new_df[col1_name].value_counts())
@@ -186,15 +242,15 @@ def extract_primary_company(df, column, columns, n=0, add_count=True):
             new_df = new_df[columns]
             return new_df
 
-    top_n = new_df[col1_name].value_counts().nlargest(n).index
-    new_df = new_df[new_df[col1_name].isin(top_n)]
-    counts = pd.DataFrame(new_df[col1_name].value_counts()).reset_index()
-    new_df = pd.merge(new_df[columns], counts, left_on=col1_name, right_on=col1_name)
+    counts = new_df[col1_name].value_counts()
+    top_n = counts.nlargest(n)
+    new_df = new_df[new_df[col1_name].isin(top_n.index)][columns].reset_index(drop=True)
+    new_df['count'] = new_df[col1_name].map(top_n)
     new_df = new_df.sort_values(by='count', ascending=False)
 
     return new_df
 
-def compute_roi(df, revenue_col, budget_col):
+def compute_roi(df, revenue_col, budget_col, inplace=False):
     """
     Compute ROI (Return On Investments).
 
@@ -202,21 +258,31 @@ def compute_roi(df, revenue_col, budget_col):
         df: pandas DataFrame
         revenue_col: valid column name for revenues
         budget_col: valid column name for budget
+        inplace: True to add the column to df instead of a copy
+        (default False)
 
     Returns:
-        new_df: modified DataFrame with ROI(%) column
+        new_df: modified DataFrame with ROI(%) column, missing when
+        revenue or budget are missing or the budget is 0 (nullable
+        Float64 if any of the two columns is nullable)
     """
 
     if revenue_col not in df.columns or budget_col not in df.columns:
         raise Exception("Please enter valid column names")
     if 'roi_perctg' in df.columns:
         return df
-    
-    new_df = df
-    new_df['roi_perctg'] = df.apply(lambda row: row[revenue_col]/row[budget_col]*100 if not np.isnan(row[revenue_col])
-                                        and not np.isnan(row[budget_col])
-                                        and row[budget_col]!=0 
-                                        else np.nan, axis=1)
+
+    revenue = df[revenue_col].to_numpy(dtype=float, na_value=np.nan)
+    budget = df[budget_col].to_numpy(dtype=float, na_value=np.nan)
+    roi = np.full(len(df), np.nan)
+    np.divide(revenue, budget, out=roi, where=budget != 0)
+    roi *= 100
+
+    new_df = df if inplace else df.copy()
+    if pd.api.types.is_extension_array_dtype(df[revenue_col]) or pd.api.types.is_extension_array_dtype(df[budget_col]):
+        # NaN become <NA>
+        roi = pd.array(roi, dtype="Float64")
+    new_df['roi_perctg'] = roi
     return new_df
 
 def create_quantile_col(dataset, col_name, quantiles):
@@ -237,15 +303,15 @@ def create_quantile_col(dataset, col_name, quantiles):
         raise Exception("Please enter a valid column name")
     if 'quantile' in dataset.columns:
         print("Quantile column already present")
-    qs = dataset[col_name].quantile(q=quantiles)
-    qs = np.insert(qs, 0, np.min(dataset[col_name]))
-    qs = np.append(qs, np.max(dataset[col_name]))
-    dataset['quantile'] = np.zeros((len(dataset,)))
-    dataset['quantile'] = (dataset[col_name]==qs[0])*1 + dataset['quantile']
-    for idx in range(0,len(qs)-1):
-        dataset['quantile'] = (dataset[col_name]>qs[idx])*(dataset[col_name]<=qs[idx+1])*(idx+1) + dataset['quantile']
+    # Bucket i (from 1) holds the values in (qs[i-1], qs[i]], the first one also the minimum, missing values are in 0
+    qs = np.atleast_1d(dataset[col_name].quantile(q=quantiles))
+    qs = np.concatenate([[np.min(dataset[col_name])], qs, [np.max(dataset[col_name])]]).astype(float)
+    values = dataset[col_name].to_numpy(dtype=float, na_value=np.nan)
+    buckets = np.maximum(np.searchsorted(qs, values, side='left'), 1)
+    buckets[np.isnan(values)] = 0
+    dataset['quantile'] = buckets.astype(float)
     return dataset
-   
+
 def agg_bool(group):
     """
     Aggregate a group taking an or if the type is
@@ -259,6 +325,39 @@ def agg_bool(group):
             agg_dict[col] = group[col].iloc[0]
     return pd.Series(agg_dict)
 
+def collapse_groups(df, key, sort=True):
+    """
+    Collapse each group of rows with the same key into one row,
+    taking an or for bool columns and the first element otherwise
+    (as groupby(key).apply(agg_bool), without calling Python code
+    per group). Rows with a missing key are dropped.
+
+    Args:
+        df: Pandas DataFrame
+        key: valid column name to group on
+        sort: True to sort the result by key, False to keep the
+        order of first appearance (default True)
+
+    Returns:
+        collapsed: DataFrame with the columns of df and one row per
+        key (the index is reset)
+
+    """
+    if key not in df.columns:
+        raise Exception("Please enter a valid column name")
+    bool_cols = [col for col in df.columns if col != key and df[col].dtype == 'bool']
+
+    # First row of each group (iloc[0] in agg_bool keeps missing values, unlike groupby first())
+    collapsed = df[df[key].notna() & ~df[key].duplicated()]
+    if sort:
+        collapsed = collapsed.sort_values(key, kind='stable')
+    collapsed = collapsed.reset_index(drop=True)
+    if bool_cols:
+        # Groups come in the same order as collapsed
+        any_values = df.groupby(key, sort=sort)[bool_cols].agg('any')
+        collapsed[bool_cols] = any_values.to_numpy()
+    return collapsed
+
 def merge_comma_sep(str1, str2):
     """
     This function merges two sequences of comma separated
@@ -274,4 +373,59 @@ def merge_comma_sep(str1, str2):
         set1 = set(str1.split(","))
         set2 = set(str2.split(","))
         merged_set = set1.union(set2)
-        return ",".join(merged_set)
\ No newline at end of file
+        return ",".join(merged_set)
+
+def coalesce(df, columns):
+    """
+    For each row, take the first non-missing value among the
+    specified columns.
+
+    Args:
+        df: pandas DataFrame
+        columns: list of valid column names, by priority
+
+    Returns:
+        result: pandas Series
+
+    """
+    result = df[columns[0]]
+    for col in columns[1:]:
+        result = result.where(result.notna(), df[col])
+    return result
+
+def union_comma_sep(*columns):
+    """
+    Column-wise version of merge_comma_sep: merge any number of
+    columns of comma separated lists, removing duplicates. If only
+    one column is present in a row its string is kept as it is,
+    otherwise tokens are united keeping the order of first
+    appearance.
+
+    Args:
+        columns: pandas Series with the same index
+
+    Returns:
+        result: pandas Series of comma separated lists
+
+    """
+    present = np.column_stack([col.notna().to_numpy() for col in columns])
+    n_present = present.sum(axis=1)
+    result = coalesce(pd.concat(columns, axis=1, ignore_index=True), list(range(len(columns)))).to_numpy(dtype=object)
+    result[n_present == 0] = pd.NA
+
+    rows = np.flatnonzero(n_present > 1)
+    if len(rows) > 0:
+        # Lists repeat a lot (e.g. genres), so each distinct combination of values is merged only once
+        factorized = [pd.factorize(col.iloc[rows]) for col in columns]
+        inverse = np.zeros(len(rows), dtype=np.int64)
+        for codes, uniques in factorized:
+            inverse, combinations = pd.factorize(inverse*(len(uniques) + 1) + codes + 1)
+        uniques = [[None] + uniques.tolist() for _, uniques in factorized]
+        first = np.unique(inverse, return_index=True)[1]
+        merged = np.empty(len(combinations), dtype=object)
+        for i, row in enumerate(first):
+            values = (u[codes[row] + 1] for u, (codes, _) in zip(uniques, factorized))
+            merged[i] = ",".join(dict.fromkeys(t for v in values if v is not None for t in v.split(",")))
+        result[rows] = merged[inverse]
+
+    return pd.Series(result, index=columns[0].index)
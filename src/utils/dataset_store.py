@@ -0,0 +1,229 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Size of the blocks read when hashing a source file
+HASH_BLOCK_SIZE = 2**20
+# Arrow types read back as pyarrow-backed strings (pd.read_parquet would return Python strings)
+STRING_TYPES_MAPPER = {pa.string(): pd.StringDtype('pyarrow'), pa.large_string(): pd.StringDtype('pyarrow')}
+
+def file_hash(path):
+    """
+    Compute the BLAKE2 hash of a file, reading it in blocks.
+
+    Args:
+        path: path of the file
+
+    Returns:
+        digest: hexadecimal digest
+
+    """
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def optimize_dtypes(df, max_categorical_ratio=0.5):
+    """
+    Convert the columns of a DataFrame to compact dtypes: object
+    columns become categorical when they have few distinct values
+    and strings otherwise, integer columns are downcast.
+
+    Args:
+        df: Pandas DataFrame
+        max_categorical_ratio: maximum ratio of distinct values out
+        of non-missing values for a column to become categorical
+        (default 0.5)
+
+    Returns:
+        df: DataFrame with converted columns (modified in place)
+
+    """
+    for col in df.columns:
+        if df[col].dtype == object:
+            n_values = df[col].count()
+            if n_values > 0 and df[col].nunique()/n_values <= max_categorical_ratio:
+                df[col] = df[col].astype('category')
+            else:
+                df[col] = df[col].astype('string[pyarrow]')
+        elif pd.api.types.is_integer_dtype(df[col]) and not pd.api.types.is_extension_array_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+    return df
+
+class DatasetStore:
+    """
+    Cache of the project's datasets in Parquet format.
+
+    Text files (TSV/CSV) loaded through the store are parsed only
+    the first time: the parsed DataFrame is saved as Parquet with
+    compact dtypes together with the hash of the source file, and
+    following loads read the Parquet file as long as the source is
+    unchanged. Intermediate DataFrames can also be saved directly.
+    """
+
+    def __init__(self, cache_dir):
+        """
+        Args:
+            cache_dir: folder where Parquet files are stored
+        """
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, name):
+        base = os.path.join(self.cache_dir, name)
+        return base + ".parquet", base + ".meta.json"
+
+    def _read_meta(self, name):
+        _, meta_path = self._paths(name)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            return json.load(f)
+
+    def _source_hash(self, source_path, meta):
+        # Rehashing large files is skipped when size and modification time are unchanged
+        stat = os.stat(source_path)
+        if meta is not None and meta.get("source_size") == stat.st_size \
+                and meta.get("source_mtime_ns") == stat.st_mtime_ns:
+            return meta["source_hash"], stat
+        return file_hash(source_path), stat
+
+    def save(self, df, name, optimize=True, meta=None):
+        """
+        Save a DataFrame in the store.
+
+        Args:
+            df: Pandas DataFrame
+            name: name of the dataset
+            optimize: True to convert columns to compact dtypes
+            (default True)
+            meta: dictionary of additional metadata (default None)
+
+        """
+        data_path, meta_path = self._paths(name)
+        if optimize:
+            df = optimize_dtypes(df.copy())
+        df.to_parquet(data_path, index=False)
+        with open(meta_path, 'w') as f:
+            json.dump(meta or {}, f)
+
+    def read(self, name, columns=None):
+        """
+        Read a dataset from the store.
+
+        Args:
+            name: name of the dataset
+            columns: columns to load (default None, i.e. all columns)
+
+        Returns:
+            df: Pandas DataFrame
+
+        """
+        data_path, _ = self._paths(name)
+        if not os.path.exists(data_path):
+            raise FileNotFoundError(f"Dataset {name} is not in the store {self.cache_dir}")
+        return pq.read_table(data_path, columns=columns).to_pandas(types_mapper=STRING_TYPES_MAPPER.get)
+
+    def load(self, source_path, columns=None, name=None, optimize=True, **read_csv_kwargs):
+        """
+        Load a TSV/CSV file, parsing it only if it changed since it
+        was last cached.
+
+        Args:
+            source_path: path of the text file
+            columns: columns to load (default None, i.e. all columns)
+            name: name of the dataset in the store (default None, i.e.
+            derived from the file name)
+            optimize: True to convert columns to compact dtypes
+            (default True)
+            read_csv_kwargs: options passed to pd.read_csv (e.g. sep)
+
+        Returns:
+            df: Pandas DataFrame
+
+        """
+        name = name or dataset_name(source_path)
+        meta = self._read_meta(name)
+        kwargs_key = _kwargs_key(dict(read_csv_kwargs, optimize=optimize))
+        source_hash, stat = self._source_hash(source_path, meta)
+
+        if meta is not None and meta.get("source_hash") == source_hash \
+                and meta.get("read_csv_kwargs") == kwargs_key \
+                and os.path.exists(self._paths(name)[0]):
+            if meta.get("source_mtime_ns") != stat.st_mtime_ns:
+                # Same content, touched file: refresh the stat to avoid rehashing next time
+                meta.update(source_size=stat.st_size, source_mtime_ns=stat.st_mtime_ns)
+                with open(self._paths(name)[1], 'w') as f:
+                    json.dump(meta, f)
+            return self.read(name, columns)
+
+        df = pd.read_csv(source_path, **read_csv_kwargs)
+        meta = {
+            "source": os.path.abspath(source_path),
+            "source_hash": source_hash,
+            "source_size": stat.st_size,
+            "source_mtime_ns": stat.st_mtime_ns,
+            "read_csv_kwargs": kwargs_key,
+        }
+        if optimize:
+            df = optimize_dtypes(df)
+        self.save(df, name, optimize=False, meta=meta)
+        return df[columns] if columns is not None else df
+
+    def derive(self, name, source_paths, build, params=None, optimize=True):
+        """
+        Read a dataset derived from source files, building it only
+        if one of the sources or the parameters changed since it was
+        last saved.
+
+        Args:
+            name: name of the dataset in the store
+            source_paths: list of paths of the files the dataset is
+            computed from
+            build: function without arguments returning the dataset,
+            it must only depend on the source files and params
+            params: dictionary of JSON-serializable parameters of
+            build (default None)
+            optimize: True to convert columns to compact dtypes
+            (default True)
+
+        Returns:
+            df: Pandas DataFrame
+
+        """
+        meta = self._read_meta(name) or {}
+        previous = meta.get("sources", {})
+        sources = {}
+        for path in source_paths:
+            key = os.path.abspath(path)
+            source_hash, stat = self._source_hash(path, previous.get(key))
+            sources[key] = {"source_hash": source_hash, "source_size": stat.st_size, "source_mtime_ns": stat.st_mtime_ns}
+        hashes = {key: source["source_hash"] for key, source in sources.items()}
+        params_key = _kwargs_key(params or {})
+
+        if {key: source.get("source_hash") for key, source in previous.items()} == hashes \
+                and meta.get("params") == params_key and os.path.exists(self._paths(name)[0]):
+            return self.read(name)
+
+        df = build()
+        self.save(df, name, optimize=optimize, meta={"sources": sources, "params": params_key})
+        return df
+
+def dataset_name(path):
+    """
+    Name of a dataset from the name of its file, e.g.
+    "movies_complete" for "Data/movies_complete.tsv.gz".
+    """
+    name = os.path.basename(path)
+    for ext in [".gz", ".tsv", ".csv"]:
+        if name.endswith(ext):
+            name = name[:-len(ext)]
+    return name
+
+def _kwargs_key(kwargs):
+    return json.dumps(kwargs, sort_keys=True, default=str)
@@ -1,17 +1,30 @@
-def print_missing_stats(df):
+import pandas as pd
+
+from profiling import profile_dataset
+
+def print_missing_stats(df, **read_csv_kwargs):
     """
     Print ratio of missing values out of total number of
     observations for each feature.
 
     Args:
-        df: Pandas DataFrame
+        df: Pandas DataFrame, or path of a TSV/CSV/Parquet file
+        which is then read in chunks (see profile_dataset)
+        read_csv_kwargs: options passed to pd.read_csv when df is
+        a path (for the IMDB dumps, READ_OPTIONS of
+        src/scripts/imdb_filtering.py, so that \\N is missing)
 
     """
-    print("Total length:", len(df))
+    if isinstance(df, pd.DataFrame):
+        length, missing = len(df), df.isna().sum()
+    else:
+        report = profile_dataset(df, **read_csv_kwargs)
+        length, missing = (report["count"] + report["missing"]).max(), report["missing"]
+    print("Total length:", length)
 
-    for col in df.columns:
+    for col, n_missing in missing.items():
         print("Ratio of missing " + col + ": {:.2f}"
-              .format(sum(df[col].isna())/len(df)))
+              .format(n_missing/length))
         
 def print_tests_results(statistic, p_val, statistic_name, null_hyp, alpha=0.05):
     """
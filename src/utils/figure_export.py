@@ -0,0 +1,238 @@
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import plotly.io as pio
+
+# Formats written for every figure, the static ones are rendered by the worker processes
+EXPORT_FORMATS = ['html', 'pdf', 'svg']
+# Format rendered to display the figures in the notebook, kept in the cache folder (not exported)
+DISPLAY_FORMAT = 'png'
+HTML_CONFIG = {'displayModeBar': False, 'responsive': True}
+# Folder, next to the plots folders, of the display renders and of the spec hashes of the exported figures
+CACHE_NAME = ".figure_cache"
+# File of each cache folder storing the spec hash of the exported figures
+MANIFEST_NAME = "export_hashes.json"
+# Exporters shared by the figures of each plots folder (see get_exporter)
+_EXPORTERS = {}
+
+class FigureExporter:
+    """
+    Export queue of plotly figures.
+
+    Static formats (PDF, SVG and the PNG used for display) are
+    rendered concurrently by a pool of worker processes, which is
+    kept between figures so that each worker starts its image
+    renderer only once. The PNG used for display and the hash of
+    the spec of each exported figure are stored in a cache folder,
+    outside the plots folder: a figure whose spec did not change
+    since its last export (and whose files still exist) is not
+    rendered again, and its PNG is reused for display.
+    """
+
+    def __init__(self, plots_folder, formats=EXPORT_FORMATS, max_workers=None, cache_folder=None,
+                 renderer=None):
+        """
+        Args:
+            plots_folder: folder where the figures are written
+            formats: list of formats written for every figure
+            (default EXPORT_FORMATS)
+            max_workers: number of worker processes (default None,
+            i.e. one per static format, at most one per CPU)
+            cache_folder: folder of the display renders and of the
+            spec hashes (default None, i.e. see cache_folder_of)
+            renderer: picklable function (spec, path, fmt) writing a
+            static render (default None, i.e. plotly's write_image)
+        """
+        self.plots_folder = plots_folder
+        self.cache_folder = cache_folder or cache_folder_of(plots_folder)
+        self._display_exported = DISPLAY_FORMAT in formats
+        self.formats = list(dict.fromkeys(list(formats) + [DISPLAY_FORMAT]))
+        self.renderer = renderer or _write_image
+        n_static = len([fmt for fmt in self.formats if fmt != 'html'])
+        self.max_workers = max_workers or max(min(n_static, os.cpu_count() or 1), 1)
+        os.makedirs(plots_folder, exist_ok=True)
+        os.makedirs(self.cache_folder, exist_ok=True)
+        self._manifest_path = os.path.join(self.cache_folder, MANIFEST_NAME)
+        self._manifest = {}
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path) as f:
+                self._manifest = json.load(f)
+        self._pending = {}
+        self._pool = None
+
+    def close(self):
+        """
+        Wait for the pending exports and stop the worker processes.
+        """
+        self.wait()
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def path(self, filename, fmt):
+        """
+        Path of the file of a figure in a format.
+
+        Args:
+            filename: name of the figure (without extension)
+            fmt: format of the file (e.g. 'pdf')
+
+        Returns:
+            path: path of the file in the plots folder, or in the
+            cache folder for the display format (unless it is also
+            exported)
+
+        """
+        folder = self.cache_folder if fmt == DISPLAY_FORMAT and fmt not in self._exported() else self.plots_folder
+        return os.path.join(folder, f"{filename}.{fmt}")
+
+    def submit(self, fig, filename):
+        """
+        Queue the export of a figure in all the formats and return
+        without waiting for the static renders. The HTML file is
+        written right away.
+
+        Args:
+            fig: plotly Figure
+            filename: name of the figure (without extension)
+
+        Returns:
+            futures: dictionary of the futures of the static renders
+            by format (empty when the figure is unchanged since its
+            last export)
+
+        """
+        self._collect(done_only=True)
+        spec = fig.to_json()
+        key = spec_hash(spec, self.formats)
+        if filename not in self._pending and self._manifest.get(filename) == key \
+                and all(os.path.exists(self.path(filename, fmt)) for fmt in self.formats):
+            print(f"{filename} unchanged since its last export, files not rendered again")
+            return {}
+        # A previous export of the same figure must not overwrite this one
+        self.wait(filename)
+
+        futures = {}
+        for fmt in self.formats:
+            if fmt == 'html':
+                fig.write_html(file=self.path(filename, fmt), full_html=False, config=HTML_CONFIG)
+                print(f"HTML file saved as {self.path(filename, fmt)}")
+            else:
+                futures[fmt] = self._executor().submit(self.renderer, spec, self.path(filename, fmt), fmt)
+        self._pending[filename] = (key, futures)
+        return futures
+
+    def wait(self, filename=None):
+        """
+        Wait for the pending exports (errors of the renders are
+        raised here) and record their spec hash.
+
+        Args:
+            filename: name of the figure to wait for (default None,
+            i.e. all the figures)
+
+        """
+        self._collect(filenames=None if filename is None else [filename])
+
+    def _exported(self):
+        # Formats written in the plots folder (the display format is added to formats only for display)
+        return [fmt for fmt in self.formats if fmt != DISPLAY_FORMAT or self._display_exported]
+
+    def _executor(self):
+        if self._pool is None:
+            # Workers are spawned, forking a running kernel (and its threads) is not safe
+            self._pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+    def _collect(self, filenames=None, done_only=False):
+        # Report the finished exports and save their hash (only figures whose renders all succeeded)
+        filenames = list(self._pending) if filenames is None else [f for f in filenames if f in self._pending]
+        finished = False
+        try:
+            for filename in filenames:
+                key, futures = self._pending[filename]
+                if done_only and not all(future.done() for future in futures.values()):
+                    continue
+                del self._pending[filename]
+                for fmt, future in futures.items():
+                    future.result()
+                    print(f"{fmt.upper()} file saved as {self.path(filename, fmt)}")
+                self._manifest[filename] = key
+                finished = True
+        finally:
+            if finished:
+                with open(self._manifest_path, 'w') as f:
+                    json.dump(self._manifest, f, indent=1, sort_keys=True)
+
+def spec_hash(spec, formats):
+    """
+    Hash of the JSON spec of a figure and of its export formats.
+
+    Args:
+        spec: JSON spec of the figure (fig.to_json())
+        formats: list of export formats
+
+    Returns:
+        digest: hexadecimal digest
+
+    """
+    h = hashlib.blake2b(digest_size=20)
+    h.update(spec.encode())
+    h.update(json.dumps([sorted(formats), HTML_CONFIG], sort_keys=True).encode())
+    return h.hexdigest()
+
+def cache_folder_of(plots_folder):
+    """
+    Default cache folder of a plots folder: a folder named after it
+    in CACHE_NAME, next to it (e.g. .figure_cache/plots for plots/).
+
+    Args:
+        plots_folder: folder where the figures are written
+
+    Returns:
+        cache_folder: path of the cache folder
+
+    """
+    plots_folder = os.path.abspath(plots_folder)
+    return os.path.join(os.path.dirname(plots_folder), CACHE_NAME, os.path.basename(plots_folder))
+
+def get_exporter(plots_folder):
+    """
+    Exporter of a plots folder, created at the first call and then
+    shared (with its worker processes) by all the figures of the
+    folder.
+
+    Args:
+        plots_folder: folder where the figures are written
+
+    Returns:
+        exporter: FigureExporter
+
+    """
+    key = os.path.abspath(plots_folder)
+    if key not in _EXPORTERS:
+        _EXPORTERS[key] = FigureExporter(plots_folder)
+    return _EXPORTERS[key]
+
+def export_figures(figures, plots_folder):
+    """
+    Export a batch of figures: all their static renders are queued
+    at once and run concurrently.
+
+    Args:
+        figures: dictionary of plotly Figures by name
+        plots_folder: folder where the figures are written
+
+    """
+    exporter = get_exporter(plots_folder)
+    for filename, fig in figures.items():
+        exporter.submit(fig, filename)
+    exporter.wait()
+
+def _write_image(spec, path, fmt):
+    # Render a figure from its JSON spec (runs in a worker process)
+    pio.from_json(spec).write_image(path, format=fmt)
+    return path
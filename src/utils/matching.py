@@ -0,0 +1,280 @@
+import heapq
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+
+def greedy_match(treated_scores, control_scores, caliper):
+    """
+    Greedy matching without replacement: pairs are taken by
+    increasing distance between scores, skipping units already
+    matched, as long as the distance is below the caliper.
+
+    In one dimension the closest pair of unmatched units is always
+    made of two neighbours in the sorted list of unmatched scores, so
+    only neighbours are compared (O(n log n) instead of comparing
+    all the pairs).
+
+    Args:
+        treated_scores: Pandas series of scores of treated units
+        control_scores: Pandas series of scores of control units
+        caliper: maximum distance between matched scores
+
+    Returns:
+        pairs: DataFrame with the index of matched treated and
+        control units ("treated", "control") and their distance
+        ("distance"), sorted by distance
+
+    """
+    n_treated = len(treated_scores)
+    scores = np.concatenate([treated_scores.to_numpy(dtype=float), control_scores.to_numpy(dtype=float)])
+    order = np.argsort(scores, kind='stable')
+    sorted_scores = scores[order]
+    is_treated = order < n_treated
+
+    n = len(scores)
+    prev_unit = list(range(-1, n - 1))
+    next_unit = list(range(1, n + 1))
+    matched = [False]*n
+
+    # Neighbours of different groups within the caliper
+    distances = np.diff(sorted_scores)
+    candidates = np.flatnonzero((is_treated[:-1] != is_treated[1:]) & (distances < caliper))
+    heap = list(zip(distances[candidates].tolist(), candidates.tolist(), (candidates + 1).tolist()))
+    heapq.heapify(heap)
+
+    sorted_scores = sorted_scores.tolist()
+    is_treated = is_treated.tolist()
+    first, second, pair_distance = [], [], []
+    while heap:
+        distance, i, j = heapq.heappop(heap)
+        if matched[i] or matched[j]:
+            continue
+        matched[i] = matched[j] = True
+        first.append(i)
+        second.append(j)
+        pair_distance.append(distance)
+
+        # Remove the two units: their neighbours become adjacent
+        before, after = prev_unit[i], next_unit[j]
+        if before >= 0:
+            next_unit[before] = after
+        if after < n:
+            prev_unit[after] = before
+        if before >= 0 and after < n and is_treated[before] != is_treated[after]:
+            distance = sorted_scores[after] - sorted_scores[before]
+            if distance < caliper:
+                heapq.heappush(heap, (distance, before, after))
+
+    # Back to positions in the treated and control scores
+    first = order[np.array(first, dtype=int)]
+    second = order[np.array(second, dtype=int)]
+    treated = np.where(first < n_treated, first, second)
+    control = np.where(first < n_treated, second, first) - n_treated
+    return _pairs_frame(treated_scores, control_scores, treated, control, np.array(pair_distance, dtype=float))
+
+def nearest_neighbor_match(treated_scores, control_scores, caliper, replacement=True):
+    """
+    Match each treated unit to the control unit with the closest
+    score, if it is within the caliper.
+
+    Args:
+        treated_scores: Pandas series of scores of treated units
+        control_scores: Pandas series of scores of control units
+        caliper: maximum distance between matched scores
+        replacement: True if a control unit can be matched to
+        several treated units, False to use greedy_match
+        (default True)
+
+    Returns:
+        pairs: DataFrame as in greedy_match
+
+    """
+    if not replacement:
+        return greedy_match(treated_scores, control_scores, caliper)
+
+    control = control_scores.to_numpy(dtype=float)
+    order = np.argsort(control, kind='stable')
+    sorted_control = control[order]
+    treated = treated_scores.to_numpy(dtype=float)
+    if len(control) == 0:
+        return _pairs_frame(treated_scores, control_scores, np.empty(0, dtype=int), np.empty(0, dtype=int), np.empty(0))
+
+    # The closest control is just before or just after the position of the treated score
+    after = np.minimum(np.searchsorted(sorted_control, treated), len(control) - 1)
+    before = np.maximum(after - 1, 0)
+    closest = np.where(np.abs(sorted_control[before] - treated) <= np.abs(sorted_control[after] - treated), before, after)
+    distance = np.abs(sorted_control[closest] - treated)
+    within = np.flatnonzero(distance < caliper)
+    pairs = _pairs_frame(treated_scores, control_scores, within, order[closest[within]], distance[within])
+    return pairs.sort_values("distance", kind='stable', ignore_index=True)
+
+def caliper_pairs(treated_scores, control_scores, caliper, n_candidates=None):
+    """
+    Candidate pairs whose scores are within the caliper, found with
+    a binary search on the sorted control scores instead of
+    comparing all the pairs.
+
+    Args:
+        treated_scores: numpy array of scores of treated units
+        control_scores: numpy array of scores of control units
+        caliper: maximum distance between matched scores
+        n_candidates: maximum number of candidates per treated
+        unit, the closest ones are kept (default None, i.e. all)
+
+    Returns:
+        treated/control: positions of the units of each pair
+        distance: distance between the scores of each pair
+
+    """
+    order = np.argsort(control_scores, kind='stable')
+    sorted_control = control_scores[order]
+    start = np.searchsorted(sorted_control, treated_scores - caliper, side='right')
+    end = np.searchsorted(sorted_control, treated_scores + caliper, side='left')
+    if n_candidates is not None:
+        # Band of n_candidates controls on each side of the treated score
+        position = np.searchsorted(sorted_control, treated_scores)
+        start = np.maximum(start, position - n_candidates)
+        end = np.minimum(end, position + n_candidates)
+
+    counts = np.maximum(end - start, 0)
+    treated = np.repeat(np.arange(len(treated_scores)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    positions = np.repeat(start, counts) + offsets
+    distance = np.abs(sorted_control[positions] - treated_scores[treated])
+    within = distance < caliper
+
+    if n_candidates is not None:
+        # Keep the n_candidates closest within the band
+        within &= _rank_within_groups(treated, distance) < n_candidates
+    return treated[within], order[positions[within]], distance[within]
+
+def optimal_match(treated_scores, control_scores, caliper, n_candidates=None):
+    """
+    Matching without replacement minimizing the total distance
+    between matched scores, considering only the pairs within the
+    caliper (sparse assignment problem). Leaving a treated unit
+    unmatched costs as much as a pair at the caliper distance.
+
+    Args:
+        treated_scores: Pandas series of scores of treated units
+        control_scores: Pandas series of scores of control units
+        caliper: maximum distance between matched scores
+        n_candidates: maximum number of candidate controls per
+        treated unit, to limit the size of the problem (default
+        None, i.e. all the controls within the caliper)
+
+    Returns:
+        pairs: DataFrame as in greedy_match
+
+    """
+    treated_values = treated_scores.to_numpy(dtype=float)
+    control_values = control_scores.to_numpy(dtype=float)
+    n_treated, n_control = len(treated_values), len(control_values)
+    if n_treated == 0:
+        return _pairs_frame(treated_scores, control_scores, np.empty(0, dtype=int), np.empty(0, dtype=int), np.empty(0))
+    treated, control, distance = caliper_pairs(treated_values, control_values, caliper, n_candidates)
+
+    # Each treated unit can also be matched to its own dummy control at cost caliper (i.e. left unmatched),
+    # so that a matching covering all treated units always exists. All costs are shifted by 1 because
+    # the solver ignores edges of weight 0, this does not change the solution as all rows are matched once.
+    rows = np.concatenate([treated, np.arange(n_treated)])
+    cols = np.concatenate([control, n_control + np.arange(n_treated)])
+    costs = np.concatenate([distance, np.full(n_treated, caliper)]) + 1
+    graph = csr_matrix((costs, (rows, cols)), shape=(n_treated, n_control + n_treated))
+    _, assigned = min_weight_full_bipartite_matching(graph)
+
+    matched = np.flatnonzero(assigned < n_control)
+    control = assigned[matched]
+    distance = np.abs(treated_values[matched] - control_values[control])
+    pairs = _pairs_frame(treated_scores, control_scores, matched, control, distance)
+    return pairs.sort_values("distance", kind='stable', ignore_index=True)
+
+def balance_diagnostics(df, treatment_col, pairs, columns):
+    """
+    Standardized mean differences and variance ratios of covariates
+    between treated and control units, before and after matching.
+
+    Args:
+        df: Pandas DataFrame with all the units
+        treatment_col: name of the column which is 1 (or True) for
+        treated units
+        pairs: DataFrame of matched pairs (index of df in
+        columns "treated" and "control")
+        columns: list of covariates
+
+    Returns:
+        balance: DataFrame with one row per covariate and columns
+        smd_before, smd_after, var_ratio_before, var_ratio_after
+
+    """
+    treated_mask = df[treatment_col].astype(bool)
+    groups = {
+        "before": (df.loc[treated_mask, columns], df.loc[~treated_mask, columns]),
+        "after": (df.loc[pairs["treated"], columns], df.loc[pairs["control"], columns]),
+    }
+    balance = pd.DataFrame(index=columns)
+    for name, (treated, control) in groups.items():
+        treated = treated.astype(float)
+        control = control.astype(float)
+        pooled_std = np.sqrt((treated.var() + control.var())/2)
+        balance["smd_" + name] = (treated.mean() - control.mean())/pooled_std
+        balance["var_ratio_" + name] = treated.var()/control.var()
+    return balance[["smd_before", "smd_after", "var_ratio_before", "var_ratio_after"]]
+
+def propensity_score_match(df, treatment_col, score_col, caliper, method='greedy', covariates=None,
+                           n_candidates=None):
+    """
+    Match treated and control units on their propensity score.
+
+    Args:
+        df: Pandas DataFrame with all the units
+        treatment_col: name of the column which is 1 (or True) for
+        treated units
+        score_col: name of the column of propensity scores
+        caliper: maximum distance between matched scores
+        method: 'greedy' (greedy matching without replacement),
+        'nearest' (nearest neighbour with replacement) or 'optimal'
+        (default 'greedy')
+        covariates: list of columns for the balance diagnostics
+        (default None, i.e. only the score)
+        n_candidates: candidates per treated unit for 'optimal'
+        (default None, i.e. all within the caliper)
+
+    Returns:
+        pairs: DataFrame of matched pairs (see greedy_match)
+        balance: DataFrame of balance diagnostics (see
+        balance_diagnostics)
+
+    """
+    treated_mask = df[treatment_col].astype(bool)
+    treated_scores = df.loc[treated_mask, score_col]
+    control_scores = df.loc[~treated_mask, score_col]
+
+    if method == 'greedy':
+        pairs = greedy_match(treated_scores, control_scores, caliper)
+    elif method == 'nearest':
+        pairs = nearest_neighbor_match(treated_scores, control_scores, caliper)
+    elif method == 'optimal':
+        pairs = optimal_match(treated_scores, control_scores, caliper, n_candidates)
+    else:
+        raise Exception("Please provide a valid method ('greedy', 'nearest' or 'optimal')")
+
+    balance = balance_diagnostics(df, treatment_col, pairs, [score_col] + list(covariates or []))
+    return pairs, balance
+
+def _pairs_frame(treated_scores, control_scores, treated, control, distance):
+    return pd.DataFrame({
+        "treated": treated_scores.index[treated],
+        "control": control_scores.index[control],
+        "distance": distance,
+    })
+
+def _rank_within_groups(groups, values):
+    # Rank (0 for the smallest) of each value among the values of the same group (groups are sorted)
+    order = np.lexsort((values, groups))
+    ranks = np.empty(len(values), dtype=np.int64)
+    group_start = np.searchsorted(groups, groups[order])
+    ranks[order] = np.arange(len(values)) - group_start
+    return ranks
@@ -2,10 +2,15 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
 import pandas as pd
-from scipy.stats import pearsonr
+from matplotlib.colors import LogNorm
 from IPython.display import display, HTML, SVG, Image
 
-def plot_scatter_matrix(df, columns, by='exclude', figsize=(6,6)):
+from binned_statistics import (binned_kde, correlation_matrix, histogram, pair_histograms, stratified_sample,
+                               value_ranges)
+from figure_export import DISPLAY_FORMAT, get_exporter
+
+def plot_scatter_matrix(df, columns, by='exclude', figsize=(6,6), large_data=False, sample_size=None,
+                        stratify=None, bins=100):
     """
     Plot scatter matrix of given dataset excluding/including 
     specified columns.
@@ -17,70 +22,43 @@ def plot_scatter_matrix(df, columns, by='exclude', figsize=(6,6)):
         'include' if have to be included (default 
         'exclude')
         figsize: figure size (default (6,6))
+        large_data: True to draw binned densities (2D histograms 
+        off the diagonal, histograms on it) computed over chunks 
+        of rows instead of every point (default False)
+        sample_size: maximum number of points of the scatter 
+        plots, drawn from a stratified sample (default None, i.e. 
+        all the rows)
+        stratify: column whose proportions the sample keeps 
+        (default None, i.e. a uniform sample)
+        bins: number of bins of each column when large_data is 
+        True (default 100)
 
     """
-    if by == 'exclude' and len(columns)>0:
-        data = df.drop(columns=columns)
-        # Try to convert to numeric non-numeric columns, 
-        # otherwise they are not shown
-        for col in data.columns:
-            if not pd.api.types.is_numeric_dtype(data[col]):
-                try:
-                    data[col] = pd.to_numeric(data[col])
-                except:
-                    pass
-        axes = pd.plotting.scatter_matrix(data, figsize=figsize, alpha=1)
-        plt.subplots_adjust(wspace=0.4, hspace=0.6)
-        for ax in axes[-1, :]:
-            ax.tick_params(labelbottom=False)
-        for ax in axes[0, :]: 
-            ax.xaxis.tick_top()             
-            ax.tick_params(labeltop=True)    
-            ax.xaxis.set_tick_params(rotation=45)  
-        plt.tight_layout()
-        plt.show()
-    
+    if by == 'exclude':
+        names = [col for col in df.columns if col not in columns]
     elif by == 'include':
-        data = df[columns]
-        # Try to convert to numeric non-numeric columns, 
-        # otherwise they are not shown
-        for col in data.columns:
-            if not pd.api.types.is_numeric_dtype(data[col]):
-                try:
-                    data[col] = pd.to_numeric(data[col])
-                except:
-                    pass
-        axes = pd.plotting.scatter_matrix(data, figsize=figsize, alpha=1)
-        plt.subplots_adjust(wspace=0.4, hspace=0.6)
-        for ax in axes[-1, :]:
-            ax.tick_params(labelbottom=False)
-        for ax in axes[0, :]: 
-            ax.xaxis.tick_top()             
-            ax.tick_params(labeltop=True)    
-            ax.xaxis.set_tick_params(rotation=45)  
-        plt.tight_layout()
-        plt.show()
+        names = list(columns)
+    else:
+        names = list(df.columns)
+    if sample_size is not None and not large_data:
+        df = stratified_sample(df, sample_size, stratify)
+    data = _to_numeric(df[names]).select_dtypes('number')
+
+    if large_data:
+        axes = _plot_binned_matrix(data, list(data.columns), figsize, bins)
     else:
-        # Try to convert to numeric non-numeric columns, 
-        # otherwise they are not shown
-        for col in data.columns:
-            if not pd.api.types.is_numeric_dtype(data[col]):
-                try:
-                    data[col] = pd.to_numeric(data[col])
-                except:
-                    pass
         axes = pd.plotting.scatter_matrix(data, figsize=figsize, alpha=1)
-        plt.subplots_adjust(wspace=0.4, hspace=0.6)
-        for ax in axes[-1, :]:
-            ax.tick_params(labelbottom=False)
-        for ax in axes[0, :]: 
-            ax.xaxis.tick_top()             
-            ax.tick_params(labeltop=True)    
-            ax.xaxis.set_tick_params(rotation=45)  
-        plt.tight_layout()
-        plt.show()
-
-def plot_histograms(df, columns, nrows, ncols, figsize=(6,6), scale='normal'):
+    plt.subplots_adjust(wspace=0.4, hspace=0.6)
+    for ax in axes[-1, :]:
+        ax.tick_params(labelbottom=False)
+    for ax in axes[0, :]: 
+        ax.xaxis.tick_top()             
+        ax.tick_params(labeltop=True)    
+        ax.xaxis.set_tick_params(rotation=45)  
+    plt.tight_layout()
+    plt.show()
+
+def plot_histograms(df, columns, nrows, ncols, figsize=(6,6), scale='normal', large_data=False):
     """
     Plot histograms for the specified features in df.
 
@@ -92,22 +70,36 @@ def plot_histograms(df, columns, nrows, ncols, figsize=(6,6), scale='normal'):
         figsize: figure size (default (6,6))
         scale: scale for plot on y-axis 
         (default 'normal') - 'normal'/'log'
+        large_data: True to compute the histograms and the 
+        densities over chunks of rows (binned KDE) instead of 
+        passing every value to seaborn (default False)
 
     """
     fig = plt.figure(figsize=figsize)
+    ranges = value_ranges(df, columns) if large_data else None
 
     for pos, col in enumerate(columns):
         ax = plt.subplot(nrows, ncols, pos+1)
         ax.set_xlabel(col)
         ax.set_ylabel('Density')
         title = col + ' distribution'
-        kde = sns.kdeplot(data=df, x=col, color='red', ax=ax)
-        density_values = kde.lines[0].get_ydata()
-        max_density = density_values.max()
-        ax.set_xlim([df[col].min(), df[col].max()])
+        if large_data:
+            grid, density = binned_kde(df, col)
+            ax.plot(grid, density, color='red')
+            max_density = density.max()
+            ax.set_xlim([ranges.loc[col, "min"], ranges.loc[col, "max"]])
+        else:
+            kde = sns.kdeplot(data=df, x=col, color='red', ax=ax)
+            density_values = kde.lines[0].get_ydata()
+            max_density = density_values.max()
+            ax.set_xlim([df[col].min(), df[col].max()])
         ax.set_ylim([0, 1.5*max_density])
         ax.set_title(title)
-        sns.histplot(data=df, x=col, color='lightskyblue', stat='density', bins=70)
+        if large_data:
+            counts, edges = histogram(df, col, bins=70, value_range=(ranges.loc[col, "min"], ranges.loc[col, "max"]))
+            ax.stairs(counts/(counts.sum()*np.diff(edges)), edges, fill=True, color='lightskyblue', alpha=0.75)
+        else:
+            sns.histplot(data=df, x=col, color='lightskyblue', stat='density', bins=70)
         plt.grid(visible=True)
         if scale == 'log':
             plt.yscale('log')
@@ -156,26 +148,38 @@ def plot_histograms_by_category(df, column, nrows, ncols, feature, figsize=(6,6)
     plt.ylabel('Densities')
     plt.show()
 
-def save_and_display_plot(fig, filename, PLOTS_FOLDER, display_html=False):
-    html_filename = PLOTS_FOLDER + f"{filename}.html"
-    pdf_filename = PLOTS_FOLDER + f"{filename}.pdf"
-    svg_filename = PLOTS_FOLDER + f"{filename}.svg"
-    
-    fig.write_html(file=html_filename, full_html=False, config={'displayModeBar': False, 'responsive': True})
-    print(f"HTML file saved as {html_filename}")
+def save_and_display_plot(fig, filename, PLOTS_FOLDER, display_html=False, wait=False):
+    """
+    Save a plotly figure as HTML, PDF and SVG and display it. The
+    static formats are rendered concurrently by the exporter of the
+    folder (see figure_export), which skips figures unchanged since
+    their last export and displays the rendered PNG file (kept in a
+    cache folder, not in PLOTS_FOLDER).
 
-    fig.write_image(pdf_filename, format='pdf')
-    print(f"PDF file saved as {pdf_filename}")
+    Args:
+        fig: plotly Figure
+        filename: name of the files (without extension)
+        PLOTS_FOLDER: folder where the files are written
+        display_html: True to display the HTML file instead of the
+        PNG (default False)
+        wait: True to wait for the PDF and SVG files, otherwise
+        they are rendered in the background (see
+        FigureExporter.wait) (default False)
 
-    fig.write_image(svg_filename, format='svg')
-    print(f"SVG file saved as {svg_filename}")
+    """
+    exporter = get_exporter(PLOTS_FOLDER)
+    futures = exporter.submit(fig, filename)
 
     if display_html:
-        display(HTML(filename=html_filename))
+        display(HTML(filename=exporter.path(filename, 'html')))
     else:
-        display(Image(fig.to_image(format='png')))
+        if DISPLAY_FORMAT in futures:
+            futures[DISPLAY_FORMAT].result()
+        display(Image(filename=exporter.path(filename, DISPLAY_FORMAT)))
+    if wait:
+        exporter.wait(filename)
 
-def plot_gg(dataset, to_keep, file_name, height=2):
+def plot_gg(dataset, to_keep, file_name, height=2, large_data=False, sample_size=None, stratify=None, bins=100):
     """
     Plot R's "ggpair"-like scatter matrix.
 
@@ -184,6 +188,16 @@ def plot_gg(dataset, to_keep, file_name, height=2):
         to_keep: list of valid columns in dataset
         height: height of single scatterplots 
         (default 2)
+        large_data: True to draw 2D histograms instead of the 
+        scatter plots and binned KDEs on the diagonal, computed 
+        over chunks of rows (default False)
+        sample_size: maximum number of points of the scatter 
+        plots, drawn from a stratified sample (correlations are 
+        still computed on all the rows) (default None)
+        stratify: column whose proportions the sample keeps 
+        (default None, i.e. a uniform sample)
+        bins: number of bins of each column when large_data is 
+        True (default 100)
     """
 
     if not set(to_keep).issubset(dataset.columns):
@@ -192,23 +206,89 @@ def plot_gg(dataset, to_keep, file_name, height=2):
     data = dataset[to_keep].dropna()
     numeric_columns = to_keep
 
-    # Compute correlations
+    # Compute correlations (all the pairs from one covariance matrix)
+    corr, p_values = correlation_matrix(data, numeric_columns)
+
     def corrfunc(x, y, **kwargs):
-        r, p = pearsonr(x, y)
+        r, p = corr.loc[x.name, y.name], p_values.loc[x.name, y.name]
         ax = plt.gca()
-        ax.annotate(f'Corr. = {r:.3f}\nP-val = {p:.3f}', xy=(0.5, 0.5), xycoords=ax.transAxes,
-                    ha='center', va='center', fontsize=15, color='red')
+        _annotate_correlation(ax, r, p)
 
-    g = sns.PairGrid(data, vars=numeric_columns, diag_sharey=False, height=height)
-    g.map_lower(sns.scatterplot, color='orange')
-    g.map_diag(sns.kdeplot, fill=True, color='blue')
-    g.map_upper(corrfunc)
-    g.add_legend()
+    if large_data:
+        _plot_binned_pairs(data, numeric_columns, height, bins, corr, p_values)
+    else:
+        if sample_size is not None:
+            strata = [] if stratify is None or stratify in to_keep else [stratify]
+            complete = dataset.loc[dataset[to_keep].notna().all(axis=1), to_keep + strata]
+            data = stratified_sample(complete, sample_size, stratify)[to_keep]
+        g = sns.PairGrid(data, vars=numeric_columns, diag_sharey=False, height=height)
+        g.map_lower(sns.scatterplot, color='orange')
+        g.map_diag(sns.kdeplot, fill=True, color='blue')
+        g.map_upper(corrfunc)
+        g.add_legend()
 
     plt.savefig(file_name+".svg", format='svg')
     plt.savefig(file_name+".png", format='png')
     
     plt.show()
-    
 
+def _to_numeric(data):
+    # Try to convert to numeric non-numeric columns, otherwise they are not shown
+    converted = {}
+    for col in data.columns:
+        if not pd.api.types.is_numeric_dtype(data[col]):
+            try:
+                converted[col] = pd.to_numeric(data[col])
+            except:
+                pass
+    return data.assign(**converted) if converted else data
+
+def _annotate_correlation(ax, r, p):
+    # Correlation coefficient and p-value written in the middle of the axes
+    ax.annotate(f'Corr. = {r:.3f}\nP-val = {p:.3f}', xy=(0.5, 0.5), xycoords=ax.transAxes,
+                ha='center', va='center', fontsize=15, color='red')
+
+def _plot_binned_density(ax, counts, x_edges, y_edges, cmap):
+    # 2D histogram drawn with a logarithmic color scale (empty bins are not drawn)
+    counts = np.ma.masked_equal(counts.T, 0)
+    if counts.count() > 0:
+        ax.pcolormesh(x_edges, y_edges, counts, cmap=cmap, norm=LogNorm(vmin=1, vmax=counts.max()))
+
+def _plot_binned_matrix(data, columns, figsize, bins):
+    # Scatter matrix of binned densities (one pass over the rows for all the histograms)
+    counts, edges = pair_histograms(data, columns, bins)
+    fig, axes = plt.subplots(len(columns), len(columns), figsize=figsize, squeeze=False)
+    for i, y in enumerate(columns):
+        for j, x in enumerate(columns):
+            ax = axes[i, j]
+            if i == j:
+                ax.stairs(counts[x], edges[x], fill=True)
+            elif j < i:
+                _plot_binned_density(ax, counts[(x, y)], edges[x], edges[y], 'Blues')
+            else:
+                _plot_binned_density(ax, counts[(y, x)].T, edges[x], edges[y], 'Blues')
+            ax.set_xlabel(x if i == len(columns) - 1 else '')
+            ax.set_ylabel(y if j == 0 else '')
+    return axes
 
+def _plot_binned_pairs(data, columns, height, bins, corr, p_values):
+    # ggpair-like matrix of binned densities: 2D histograms below the diagonal, binned KDEs on it and
+    # correlations above it
+    counts, edges = pair_histograms(data, columns, bins)
+    fig, axes = plt.subplots(len(columns), len(columns), figsize=(height*len(columns), height*len(columns)),
+                             squeeze=False)
+    for i, y in enumerate(columns):
+        for j, x in enumerate(columns):
+            ax = axes[i, j]
+            if i == j:
+                grid, density = binned_kde(data, x)
+                ax.fill_between(grid, density, color='blue', alpha=0.25)
+                ax.plot(grid, density, color='blue')
+            elif j < i:
+                _plot_binned_density(ax, counts[(x, y)], edges[x], edges[y], 'Oranges')
+            else:
+                _annotate_correlation(ax, corr.loc[x, y], p_values.loc[x, y])
+            ax.set_xlabel(x if i == len(columns) - 1 else '')
+            ax.set_ylabel(y if j == 0 else '')
+    plt.tight_layout()
+    return axes
@@ -0,0 +1,480 @@
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+# Number of rows read at once, so that the memory used by a profile does not grow with the file
+CHUNK_SIZE = 1_000_000
+QUANTILES = [0.01, 0.25, 0.5, 0.75, 0.99]
+# Distinct values converted to decide early that a text column is not numeric
+NUMERIC_SAMPLE = 100
+
+class HyperLogLog:
+    """
+    HyperLogLog sketch of the number of distinct values of a column
+    (relative error about 1.04/sqrt(2**precision), 0.8% with the
+    default precision). Two sketches of the same precision are
+    merged by taking the maximum of their registers.
+    """
+
+    def __init__(self, precision=14):
+        """
+        Args:
+            precision: number of bits of the hashes indexing the
+            registers (default 14, i.e. 16384 registers)
+        """
+        self.precision = precision
+        self.registers = np.zeros(2**precision, dtype=np.uint8)
+
+    def update(self, hashes):
+        """
+        Add values to the sketch.
+
+        Args:
+            hashes: numpy array of 64 bits hashes of the values
+            (pd.util.hash_array)
+
+        """
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        rest = hashes & np.uint64(2**(64 - self.precision) - 1)
+        # Position of the first 1 bit in the remaining bits (exact bit length from two 32 bits halves)
+        high = (rest >> np.uint64(32)).astype(np.float64)
+        low = (rest & np.uint64(2**32 - 1)).astype(np.float64)
+        bit_length = np.where(high > 0, 32 + np.frexp(high)[1], np.frexp(low)[1])
+        rank = (64 - self.precision - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other):
+        """
+        Add the values of another sketch of the same precision.
+
+        Args:
+            other: HyperLogLog
+
+        """
+        if other.precision != self.precision:
+            raise Exception("Sketches of different precisions cannot be merged")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self):
+        """
+        Estimate the number of distinct values.
+
+        Returns:
+            distinct: estimated number of distinct values
+
+        """
+        m = len(self.registers)
+        estimate = 0.7213/(1 + 1.079/m)*m**2/np.sum(2.0**-self.registers.astype(np.float64))
+        zeros = np.count_nonzero(self.registers == 0)
+        # Linear counting for small cardinalities
+        if estimate <= 2.5*m and zeros > 0:
+            estimate = m*np.log(m/zeros)
+        return int(round(estimate))
+
+class QuantileSketch:
+    """
+    Mergeable sketch of the quantiles of a numeric column (KLL-like
+    compactors): values are stored in levels of bounded size, the
+    values of level h standing for 2**h values each. When a level is
+    full it is sorted and every other value (from a random offset)
+    moves up one level, so the memory is O(capacity*log(n)) and the
+    rank error is a small fraction of n. Quantiles are exact while
+    the column has at most capacity values.
+    """
+
+    def __init__(self, capacity=4096, seed=0):
+        """
+        Args:
+            capacity: maximum number of values of a level (default
+            4096)
+            seed: seed of the random offsets of the compactions
+            (default 0)
+        """
+        self.capacity = capacity
+        self.levels = []
+        self.rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        """
+        Add values to the sketch.
+
+        Args:
+            values: numpy array of numbers (without missing values)
+
+        """
+        self._add(0, np.asarray(values, dtype=np.float64))
+
+    def merge(self, other):
+        """
+        Add the values of another sketch.
+
+        Args:
+            other: QuantileSketch
+
+        """
+        for level, values in enumerate(other.levels):
+            self._add(level, values)
+
+    def quantiles(self, q):
+        """
+        Estimate quantiles of the values.
+
+        Args:
+            q: list of quantiles between 0 and 1
+
+        Returns:
+            values: numpy array of the estimated quantiles (NaN when
+            the sketch is empty)
+
+        """
+        q = np.asarray(q, dtype=np.float64)
+        if not any(len(values) for values in self.levels):
+            return np.full(q.shape, np.nan)
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(values), 2.0**level) for level, values in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        values, ranks = values[order], np.cumsum(weights[order])
+        # Same convention as np.quantile(method='inverted_cdf')
+        positions = np.searchsorted(ranks, q*ranks[-1], side='left')
+        return values[np.minimum(positions, len(values) - 1)]
+
+    def _add(self, level, values):
+        while len(values) > 0:
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+            values = np.concatenate([self.levels[level], values])
+            if len(values) <= self.capacity:
+                self.levels[level] = values
+                return
+            # Compaction: an odd value stays, every other sorted value moves up with a doubled weight
+            values.sort()
+            even = len(values)//2*2
+            self.levels[level] = values[even:]
+            values = values[self.rng.integers(2):even:2]
+            level += 1
+
+class FrequentValues:
+    """
+    Mergeable summary of the most frequent values of a column
+    (Misra-Gries): at most capacity counters are kept, and when
+    there are more the (capacity + 1)-th largest count is subtracted
+    from all of them. Counts are lower bounds of the true counts,
+    by at most error; they are exact while the column has at most
+    capacity distinct values.
+    """
+
+    def __init__(self, capacity=1000):
+        """
+        Args:
+            capacity: maximum number of counters (default 1000)
+        """
+        self.capacity = capacity
+        self.counts = pd.Series(dtype=np.int64)
+        self.error = 0
+
+    def update(self, values, counts=None):
+        """
+        Add values to the summary.
+
+        Args:
+            values: array of values, distinct if counts is given
+            counts: array of the number of occurrences of each value
+            (default None, i.e. counted from values)
+
+        """
+        if counts is None:
+            counts = pd.Series(values).value_counts()
+        else:
+            counts = pd.Series(np.asarray(counts, dtype=np.int64), index=pd.Index(values))
+        self._merge_counts(counts, 0)
+
+    def merge(self, other):
+        """
+        Add the values of another summary.
+
+        Args:
+            other: FrequentValues
+
+        """
+        self._merge_counts(other.counts, other.error)
+
+    def top(self, k):
+        """
+        Most frequent values.
+
+        Args:
+            k: number of values
+
+        Returns:
+            counts: Series of the (lower bounds of the) counts of
+            the k most frequent values, indexed by value
+
+        """
+        return self.counts.sort_values(ascending=False, kind='stable').head(k)
+
+    def _merge_counts(self, counts, error):
+        # Each summary is reduced to capacity counters before being added, so the alignment stays small
+        counts = self._reduce(counts)
+        if len(self.counts) > 0:
+            counts = self.counts.add(counts, fill_value=0).astype(np.int64)
+        self.counts = self._reduce(counts)
+        self.error += error
+
+    def _reduce(self, counts):
+        if len(counts) <= self.capacity:
+            return counts
+        threshold = np.partition(counts.to_numpy(), len(counts) - self.capacity - 1)[len(counts) - self.capacity - 1]
+        self.error += int(threshold)
+        counts = counts[counts > threshold]
+        return counts - threshold
+
+class ColumnProfile:
+    """
+    One-pass profile of a column, updated chunk by chunk: number of
+    values and of missing values, distinct count (HyperLogLog),
+    minimum and maximum, quantiles (QuantileSketch) and most
+    frequent values (FrequentValues). Text columns whose values are
+    all numbers (as read from a TSV with dtype=str) are profiled as
+    numeric. Profiles of the same column computed on different parts
+    of a dataset can be merged.
+    """
+
+    def __init__(self, name, precision=14, quantile_capacity=4096, top_capacity=1000):
+        """
+        Args:
+            name: name of the column
+            precision: precision of the HyperLogLog sketch (default
+            14)
+            quantile_capacity: capacity of the QuantileSketch
+            (default 4096)
+            top_capacity: capacity of the FrequentValues summary
+            (default 1000)
+        """
+        self.name = name
+        self.count = 0
+        self.missing = 0
+        self.numeric = None
+        # Ranges of the values as numbers and as text (the latter is reported if some values are not numbers)
+        self.numeric_range = None
+        self.text_range = None
+        self.distinct = HyperLogLog(precision)
+        self.quantile_sketch = QuantileSketch(quantile_capacity)
+        self.frequent = FrequentValues(top_capacity)
+
+    def update(self, series):
+        """
+        Add a chunk of the column.
+
+        Args:
+            series: Pandas Series
+
+        """
+        values = series.dropna()
+        self.missing += len(series) - len(values)
+        self.count += len(values)
+        if len(values) == 0:
+            return
+        codes, uniques = pd.factorize(values, sort=False)
+        uniques = np.asarray(uniques, dtype=object if not pd.api.types.is_numeric_dtype(series) else None)
+        counts = np.bincount(codes, minlength=len(uniques))
+
+        numbers = _to_numbers(series, uniques) if self.numeric is not False else None
+        self.numeric = numbers is not None
+        if self.numeric:
+            self.quantile_sketch.update(numbers[codes])
+            self.numeric_range = _union(self.numeric_range, (numbers.min(), numbers.max()))
+        if pd.api.types.is_numeric_dtype(series):
+            self.text_range = _union(self.text_range, (str(np.min(uniques)), str(np.max(uniques))))
+        else:
+            text = [str(value) for value in uniques]
+            self.text_range = _union(self.text_range, (min(text), max(text)))
+
+        self.distinct.update(pd.util.hash_array(uniques, categorize=False))
+        self.frequent.update(uniques, counts)
+
+    def merge(self, other):
+        """
+        Add the profile of another part of the column (computed
+        with the same parameters).
+
+        Args:
+            other: ColumnProfile
+
+        """
+        self.count += other.count
+        self.missing += other.missing
+        if other.numeric is not None:
+            self.numeric = other.numeric if self.numeric is None else self.numeric and other.numeric
+        self.numeric_range = _union(self.numeric_range, other.numeric_range)
+        self.text_range = _union(self.text_range, other.text_range)
+        self.distinct.merge(other.distinct)
+        self.quantile_sketch.merge(other.quantile_sketch)
+        self.frequent.merge(other.frequent)
+
+    def summary(self, k=5, quantiles=QUANTILES):
+        """
+        Summary of the profile.
+
+        Args:
+            k: number of most frequent values (default 5)
+            quantiles: list of quantiles of numeric columns (default
+            QUANTILES)
+
+        Returns:
+            summary: dictionary with the keys kind ('numeric' or
+            'text'), count, missing, missing_ratio, distinct, min,
+            max, one key per quantile (e.g. 'q0.5', NaN for text
+            columns), top (list of (value, count) pairs) and
+            top_error (maximum undercount of the top counts)
+
+        """
+        total = self.count + self.missing
+        low, high = (self.numeric_range if self.numeric else self.text_range) or (None, None)
+        q = self.quantile_sketch.quantiles(quantiles) if self.numeric else np.full(len(quantiles), np.nan)
+        return {
+            "kind": 'numeric' if self.numeric else 'text',
+            "count": self.count,
+            "missing": self.missing,
+            "missing_ratio": self.missing/total if total > 0 else np.nan,
+            "distinct": min(self.distinct.estimate(), self.count),
+            "min": low,
+            "max": high,
+            **{f"q{quantile:g}": value for quantile, value in zip(quantiles, q)},
+            "top": list(self.frequent.top(k).items()),
+            "top_error": self.frequent.error,
+        }
+
+def read_chunks(source, columns=None, chunk_size=CHUNK_SIZE, **read_csv_kwargs):
+    """
+    Iterate over a dataset in chunks of rows, without loading it.
+
+    Args:
+        source: Pandas DataFrame or path of a TSV/CSV file (possibly
+        compressed) or of a Parquet file
+        columns: columns to read (default None, i.e. all columns)
+        chunk_size: number of rows of a chunk (default CHUNK_SIZE)
+        read_csv_kwargs: options passed to pd.read_csv, by default
+        the separator follows the extension and every column is
+        read as text (dtype=str)
+
+    Returns:
+        chunks: iterator of DataFrames
+
+    """
+    if isinstance(source, pd.DataFrame):
+        data = source if columns is None else source[columns]
+        return (data.iloc[start:start + chunk_size] for start in range(0, len(data), chunk_size))
+    if str(source).endswith(".parquet"):
+        batches = pq.ParquetFile(source).iter_batches(batch_size=chunk_size, columns=columns)
+        return (batch.to_pandas() for batch in batches)
+    name = str(source).removesuffix(".gz").removesuffix(".bz2").removesuffix(".zip")
+    kwargs = {"sep": '\t' if name.endswith(".tsv") else ',', "dtype": str, "usecols": columns, **read_csv_kwargs}
+    return pd.read_csv(source, chunksize=chunk_size, **kwargs)
+
+def profile_columns(chunks, **profile_kwargs):
+    """
+    Profile every column of a dataset in one pass over its chunks.
+
+    Args:
+        chunks: iterable of DataFrames with the same columns (e.g.
+        read_chunks)
+        profile_kwargs: parameters of ColumnProfile (precision,
+        quantile_capacity, top_capacity)
+
+    Returns:
+        profiles: dictionary of ColumnProfile by column, which can
+        be merged with the profiles of other parts of the dataset
+
+    """
+    profiles = {}
+    for chunk in chunks:
+        for col in chunk.columns:
+            if col not in profiles:
+                profiles[col] = ColumnProfile(col, **profile_kwargs)
+            profiles[col].update(chunk[col])
+    return profiles
+
+def profile_report(profiles, k=5, quantiles=QUANTILES):
+    """
+    Report of column profiles.
+
+    Args:
+        profiles: dictionary of ColumnProfile by column
+        k: number of most frequent values (default 5)
+        quantiles: list of quantiles of numeric columns (default
+        QUANTILES)
+
+    Returns:
+        report: DataFrame with one row per column (see
+        ColumnProfile.summary)
+
+    """
+    report = pd.DataFrame([profile.summary(k, quantiles) for profile in profiles.values()],
+                          index=pd.Index(list(profiles), name="column"))
+    return report
+
+def profile_dataset(source, columns=None, chunk_size=CHUNK_SIZE, k=5, quantiles=QUANTILES, **read_csv_kwargs):
+    """
+    Profile a dataset streamed in chunks of rows, so that large files
+    (e.g. the raw IMDB dumps) can be inspected before deciding what
+    to load: per column missing ratio, approximate distinct count,
+    minimum and maximum, approximate quantiles and most frequent
+    values, computed in a single pass with bounded memory. The IMDB
+    dumps must be read with their options (READ_OPTIONS of
+    src/scripts/imdb_filtering.py), otherwise their missing values
+    (\\N) are counted as values.
+
+    Args:
+        source: Pandas DataFrame or path of a TSV/CSV file (possibly
+        compressed) or of a Parquet file
+        columns: columns to profile (default None, i.e. all columns)
+        chunk_size: number of rows read at once (default CHUNK_SIZE)
+        k: number of most frequent values (default 5)
+        quantiles: list of quantiles of numeric columns (default
+        QUANTILES)
+        read_csv_kwargs: options passed to pd.read_csv (see
+        read_chunks)
+
+    Returns:
+        report: DataFrame with one row per column and the columns
+        kind, count, missing, missing_ratio, distinct, min, max, one
+        column per quantile (e.g. q0.5), top and top_error (see
+        ColumnProfile.summary)
+
+    """
+    profiles = profile_columns(read_chunks(source, columns, chunk_size, **read_csv_kwargs))
+    return profile_report(profiles, k, quantiles)
+
+def print_profile(report):
+    """
+    Print a profile report column by column.
+
+    Args:
+        report: DataFrame returned by profile_dataset
+
+    """
+    quantile_cols = [col for col in report.columns if col.startswith("q")]
+    for col, row in report.iterrows():
+        print(f"{col} ({row['kind']}): {row['count']} values, missing ratio {row['missing_ratio']:.2f}, "
+              f"~{row['distinct']} distinct, min {row['min']}, max {row['max']}")
+        if row['kind'] == 'numeric':
+            print("    quantiles: " + ", ".join(f"{q[1:]}: {row[q]:g}" for q in quantile_cols))
+        print("    most frequent: " + ", ".join(f"{value} ({count})" for value, count in row['top']))
+
+def _union(value_range, other):
+    # Smallest range containing two (min, max) ranges, None standing for an empty range
+    if value_range is None or other is None:
+        return other if value_range is None else value_range
+    return min(value_range[0], other[0]), max(value_range[1], other[1])
+
+def _to_numbers(series, uniques):
+    # Distinct values as floats, or None when some of them are not numbers
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return uniques.astype(np.float64)
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_datetime64_any_dtype(series):
+        return None
+    if pd.to_numeric(pd.Series(uniques[:NUMERIC_SAMPLE]), errors='coerce').isna().any():
+        return None
+    numbers = pd.to_numeric(pd.Series(uniques), errors='coerce').to_numpy(dtype=np.float64)
+    return None if np.isnan(numbers).any() else numbers
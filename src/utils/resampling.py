@@ -0,0 +1,175 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Maximum number of resampled values held in memory at once by each worker
+MAX_BATCH_ELEMENTS = 2**24
+
+# Statistics computed on a matrix of resamples (one replicate per row)
+ONE_SAMPLE_STATISTICS = {
+    "mean": lambda x: x.mean(axis=1),
+    "median": lambda x: np.median(x, axis=1),
+    "std": lambda x: x.std(axis=1, ddof=1),
+}
+TWO_SAMPLE_STATISTICS = {
+    "diff_means": lambda x, y: x.mean(axis=1) - y.mean(axis=1),
+    "diff_medians": lambda x, y: np.median(x, axis=1) - np.median(y, axis=1),
+}
+
+# Data shared with the workers of the process pool (set once per worker by _init_worker)
+_worker_data = None
+
+def bootstrap_indices(n, n_replicates, size=None, rng=None):
+    """
+    Draw the indices of bootstrap replicates, sampling with
+    replacement.
+
+    Args:
+        n: number of observations
+        n_replicates: number of replicates
+        size: number of observations of each replicate (default
+        None, i.e. n)
+        rng: numpy Generator or seed (default None)
+
+    Returns:
+        indices: numpy array of shape (n_replicates, size)
+
+    """
+    rng = np.random.default_rng(rng)
+    # 32-bit indices are drawn about twice as fast
+    dtype = np.int32 if n < 2**31 else np.int64
+    return rng.integers(0, n, size=(n_replicates, n if size is None else size), dtype=dtype)
+
+def bootstrap_replicates(data, statistic="mean", n_replicates=1000, seed=None, n_jobs=1):
+    """
+    Compute a statistic on bootstrap replicates of one or two
+    samples. Replicates are drawn in batches of index matrices and
+    the statistic is computed on all the replicates of a batch at
+    once. Each batch has its own random stream derived from seed,
+    so the result does not depend on n_jobs.
+
+    Args:
+        data: np.array or Pandas series, or tuple of two of them
+        for two-sample statistics (each sample is resampled
+        independently)
+        statistic: name of a statistic in ONE_SAMPLE_STATISTICS or
+        TWO_SAMPLE_STATISTICS, or function taking one matrix of
+        resamples per sample (one replicate per row) and returning
+        one value per replicate (default "mean")
+        n_replicates: number of replicates (default 1000)
+        seed: seed of the random generator (default None)
+        n_jobs: number of processes, batches are computed in a
+        process pool when greater than 1 (default 1)
+
+    Returns:
+        replicates: numpy array with the statistic of each replicate
+
+    """
+    samples = data if isinstance(data, tuple) else (data,)
+    samples = tuple(np.asarray(sample, dtype=float) for sample in samples)
+    if any(len(sample) == 0 for sample in samples):
+        raise Exception("Samples must not be empty")
+    _get_statistic(statistic, len(samples))
+
+    batch_size = max(1, MAX_BATCH_ELEMENTS//sum(len(sample) for sample in samples))
+    sizes = [min(batch_size, n_replicates - start) for start in range(0, n_replicates, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(statistic, size, batch_seed) for size, batch_seed in zip(sizes, seeds)]
+
+    if n_jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(samples,)) as executor:
+            results = list(executor.map(_replicate_batch, tasks))
+    else:
+        results = [_replicate_batch(task, samples) for task in tasks]
+    return np.concatenate(results) if results else np.empty(0)
+
+def confidence_interval(replicates, alpha=0.05):
+    """
+    Percentile confidence interval from bootstrap replicates.
+
+    Args:
+        replicates: numpy array of replicates of a statistic
+        alpha: significance level (default 0.05)
+
+    Returns:
+        lower/upper: bounds of the (1 - alpha) interval
+
+    """
+    lower, upper = np.quantile(replicates, [alpha/2, 1 - alpha/2])
+    return lower, upper
+
+def bootstrap_ci(data, statistic="mean", n_replicates=1000, alpha=0.05, seed=None, n_jobs=1):
+    """
+    Estimate a statistic with its bootstrap confidence interval.
+
+    Args:
+        data: np.array or Pandas series, or tuple of two of them
+        statistic: statistic as in bootstrap_replicates (default
+        "mean")
+        n_replicates: number of replicates (default 1000)
+        alpha: significance level (default 0.05)
+        seed: seed of the random generator (default None)
+        n_jobs: number of processes (default 1)
+
+    Returns:
+        result: dictionary with the statistic on the original data
+        ("estimate"), the bounds of the interval ("lower", "upper")
+        and the standard error of the replicates ("std_error")
+
+    """
+    samples = data if isinstance(data, tuple) else (data,)
+    func = _get_statistic(statistic, len(samples))
+    estimate = func(*[np.asarray(sample, dtype=float)[np.newaxis, :] for sample in samples])[0]
+    replicates = bootstrap_replicates(data, statistic, n_replicates, seed, n_jobs)
+    lower, upper = confidence_interval(replicates, alpha)
+    return {"estimate": estimate, "lower": lower, "upper": upper, "std_error": replicates.std(ddof=1)}
+
+def equalize_lengths(data1, data2, seed=1):
+    """
+    Consider the shortest dataset, and bootstrap random values
+    from it to equal the length of the longest one.
+
+    Args:
+        data1: np.array or Pandas series
+        data2: np.array or Pandas series
+        seed: seed of the random generator (default 1)
+
+    Returns:
+        shortest_data/longest_data: new datasets with equal
+        length
+
+    """
+    if len(data1) == len(data2):
+        return data1, data2
+    shortest_data, longest_data = (data2, data1) if len(data1) > len(data2) else (data1, data2)
+
+    indices = bootstrap_indices(len(shortest_data), 1, len(longest_data) - len(shortest_data), seed)[0]
+    if isinstance(shortest_data, pd.Series):
+        samp = shortest_data.iloc[indices]
+        shortest_data = pd.concat([shortest_data, samp], ignore_index=True)
+    else:
+        shortest_data = np.concatenate([shortest_data, np.asarray(shortest_data)[indices]])
+
+    return shortest_data, longest_data.copy()
+
+def _get_statistic(statistic, n_samples):
+    # Statistics are passed to the workers by name (lambdas can't be pickled) and resolved here
+    if callable(statistic):
+        return statistic
+    statistics = ONE_SAMPLE_STATISTICS if n_samples == 1 else TWO_SAMPLE_STATISTICS
+    if n_samples > 2 or statistic not in statistics:
+        raise Exception(f"Unknown statistic {statistic} for {n_samples} sample(s), "
+                        f"valid ones are: {', '.join(statistics)}")
+    return statistics[statistic]
+
+def _replicate_batch(task, samples=None):
+    statistic, size, seed = task
+    samples = _worker_data if samples is None else samples
+    rng = np.random.default_rng(seed)
+    resamples = [sample[bootstrap_indices(len(sample), size, rng=rng)] for sample in samples]
+    return _get_statistic(statistic, len(samples))(*resamples)
+
+def _init_worker(samples):
+    global _worker_data
+    _worker_data = samples
@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+
+from dataset_store import dataset_name
+
+# Compact dtypes of the columns of each dataset: pyarrow-backed strings for IDs and free text, categoricals for
+# columns with few distinct values and nullable small integers for years, counts and orderings. Comma-separated
+# lists (genres, countries, ...) of the merged datasets stay strings, as they are split and combined row by row.
+# Columns not listed keep the dtype inferred by pd.read_csv
+_ID = 'string[pyarrow]'
+_TEXT = 'string[pyarrow]'
+_CATEGORY = 'category'
+_YEAR = 'Int16'
+
+SCHEMAS = {
+    "movies_complete": {
+        "freebase_id_movie": _ID, "wikidata_id_movie": _ID, "wikipedia_id_movie": 'Int32', "imdb_id_movie": _ID,
+        "tmdb_id_movie": 'Int32', "wikipediaLink": _TEXT, "primaryTitle": _TEXT, "originalTitle": _TEXT,
+        "description_wikidata": _TEXT, "release_date": _TEXT, "release_year": _YEAR, "runtimeMinutes": 'Int32',
+        "original_language": _CATEGORY, "languages": _TEXT, "countries": _TEXT, "genres_original": _TEXT,
+        "genres_wikidata": _TEXT, "genres_IMDB_TMDB": _TEXT, "numVotes_imdb": 'Int32', "production_companies": _TEXT,
+        "overview_tmdb": _TEXT, "keywords_tmdb": _TEXT,
+    },
+    "people_complete": {
+        "univocal_id_actor": _ID, "freebase_id_actor": _ID, "wikidata_id_actor": _ID, "imdb_id_actor": _ID,
+        "wikipediaLink_actor": _TEXT, "nameSurname_actor": _TEXT, "givenName_actor": _TEXT, "familyName_actor": _TEXT,
+        "gender": _CATEGORY, "date_of_birth": _TEXT, "year_of_birth": _YEAR, "date_of_death": _TEXT,
+        "year_of_death": _YEAR, "place_of_birth": _TEXT, "citizenship": _CATEGORY, "language": _CATEGORY,
+        "freebase_id_etnicity": _CATEGORY,
+    },
+    "movie_actor_complete": {
+        "freebase_id_movie": _ID, "wikidata_id_movie": _ID, "wikipedia_id_movie": 'Int32', "imdb_id_movie": _ID,
+        "title_movie": _TEXT, "univocal_id_actor": _ID, "freebase_id_actor": _ID, "wikidata_id_actor": _ID,
+        "imdb_id_actor": _ID, "name_actor": _TEXT, "role": _CATEGORY, "character_name": _TEXT, "ordering": 'Int16',
+    },
+    "wikidata_people_country": {
+        "wikidataID": _ID, "nameSurname": _TEXT, "placeOfBirth": _CATEGORY, "country": _CATEGORY,
+        "continent": _CATEGORY,
+    },
+    "title.basics.onlymovies": {
+        "tconst": _ID, "titleType": _CATEGORY, "primaryTitle": _TEXT, "originalTitle": _TEXT, "isAdult": 'Int8',
+        "startYear": _YEAR, "endYear": _YEAR, "runtimeMinutes": 'Int32', "genres": _CATEGORY,
+    },
+    "title.ratings.onlymovies": {
+        "tconst": _ID, "averageRating": 'float32', "numVotes": 'Int32',
+    },
+    "title.principals.onlymovies": {
+        "tconst": _ID, "ordering": 'Int16', "nconst": _ID, "category": _CATEGORY, "job": _TEXT, "characters": _TEXT,
+    },
+    "title.crew.onlymovies": {
+        "tconst": _ID, "directors": _TEXT, "writers": _TEXT,
+    },
+    "name.basics.onlymovies": {
+        "nconst": _ID, "primaryName": _TEXT, "birthYear": _YEAR, "deathYear": _YEAR, "primaryProfession": _CATEGORY,
+        "knownForTitles": _TEXT,
+    },
+    "title.akas.onlymovies": {
+        "titleId": _ID, "ordering": 'Int16', "title": _TEXT, "region": _CATEGORY, "language": _CATEGORY,
+        "types": _CATEGORY, "attributes": _CATEGORY, "isOriginalTitle": 'Int8',
+    },
+}
+
+def read_dataset(path, name=None, schema=None, **read_csv_kwargs):
+    """
+    Read a TSV/CSV dataset of the project applying the dtypes of its
+    schema. Strings and categoricals are parsed directly with their
+    dtype, integer columns are converted after parsing: a column
+    whose values are not all integers in the range of the dtype
+    keeps the parsed dtype.
+
+    Args:
+        path: path of the file
+        name: name of the dataset in SCHEMAS (default None, i.e.
+        derived from the file name, e.g. "movies_complete")
+        schema: dictionary {column: dtype} (default None, i.e.
+        SCHEMAS[name], empty if the dataset is not in SCHEMAS)
+        read_csv_kwargs: options passed to pd.read_csv, sep
+        defaults to a tab for .tsv files
+
+    Returns:
+        df: Pandas DataFrame
+
+    """
+    df, _ = _read_with_schema(path, name, schema, read_csv_kwargs)
+    return df
+
+def memory_report(paths, **read_csv_kwargs):
+    """
+    Compare the memory used by datasets read with the default dtypes
+    of pd.read_csv and with their schema (each file is read twice).
+
+    Args:
+        paths: list of paths of the datasets
+        read_csv_kwargs: options passed to pd.read_csv
+
+    Returns:
+        report: DataFrame with one row per dataset and the columns
+        dataset, rows, default_mb, schema_mb, ratio (default_mb
+        out of schema_mb) and unconverted (columns of the schema
+        kept with the parsed dtype)
+
+    """
+    rows = []
+    for path in paths:
+        kwargs = _default_kwargs(path, read_csv_kwargs)
+        kwargs.setdefault("low_memory", False)
+        default = pd.read_csv(path, **kwargs)
+        default_mb = default.memory_usage(index=True, deep=True).sum()/2**20
+        del default
+        df, unconverted = _read_with_schema(path, None, None, read_csv_kwargs)
+        schema_mb = df.memory_usage(index=True, deep=True).sum()/2**20
+        rows.append({"dataset": dataset_name(path), "rows": len(df), "default_mb": default_mb, "schema_mb": schema_mb,
+                     "ratio": default_mb/schema_mb if schema_mb > 0 else np.nan, "unconverted": ", ".join(unconverted)})
+    return pd.DataFrame(rows)
+
+def _default_kwargs(path, read_csv_kwargs):
+    # Tab separator for .tsv files unless specified
+    kwargs = dict(read_csv_kwargs)
+    if "sep" not in kwargs and "delimiter" not in kwargs and ".tsv" in path:
+        kwargs["sep"] = '\t'
+    return kwargs
+
+def _read_with_schema(path, name, schema, read_csv_kwargs):
+    # Read the file, returning the columns of the schema whose integer conversion failed
+    schema = schema if schema is not None else SCHEMAS.get(name or dataset_name(path), {})
+    integer_cols = {col: dtype for col, dtype in schema.items()
+                    if pd.api.types.is_integer_dtype(pd.api.types.pandas_dtype(dtype))}
+    parse_dtypes = {col: dtype for col, dtype in schema.items() if col not in integer_cols}
+    kwargs = _default_kwargs(path, read_csv_kwargs)
+    if isinstance(kwargs.get("dtype"), dict):
+        parse_dtypes.update(kwargs.pop("dtype"))
+    elif "dtype" in kwargs:
+        # A single dtype for all the columns replaces the schema
+        parse_dtypes, integer_cols = kwargs.pop("dtype"), {}
+    kwargs.setdefault("low_memory", False)
+    df = pd.read_csv(path, dtype=parse_dtypes, **kwargs)
+
+    unconverted = []
+    for col, dtype in integer_cols.items():
+        if col in df.columns:
+            converted = _to_nullable_integer(df[col], dtype)
+            if converted is None:
+                unconverted.append(col)
+            else:
+                df[col] = converted
+    return df, unconverted
+
+def _to_nullable_integer(series, dtype):
+    # None when some values are not integers representable with dtype
+    values = pd.to_numeric(series, errors='coerce')
+    if (values.isna() != series.isna()).any():
+        return None
+    finite = values.dropna().to_numpy(dtype=float)
+    info = np.iinfo(pd.api.types.pandas_dtype(dtype).numpy_dtype)
+    if len(finite) > 0 and ((finite % 1 != 0).any() or finite.min() < info.min or finite.max() > info.max):
+        return None
+    return values.astype(dtype)
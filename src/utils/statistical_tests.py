@@ -0,0 +1,226 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from exploratory_analysis import print_tests_results
+
+def group_pearson(df, group_col, x_col, y_col, sep=None, min_count=3, correction='fdr_bh', alpha=0.05):
+    """
+    Pearson correlation test between two columns within each group
+    of a DataFrame, computed for all the groups at once from sums
+    accumulated in a single pass (instead of one filtered copy and
+    one pearsonr call per group). Rows with a missing value are
+    ignored.
+
+    Args:
+        df: Pandas DataFrame
+        group_col: column defining the groups (e.g. high_budget,
+        countries)
+        x_col: first column to correlate
+        y_col: second column to correlate
+        sep: separator of the values of group_col if they are
+        lists (e.g. ','), a row then belongs to the group of each
+        of its values (default None, i.e. one group per value)
+        min_count: minimum number of rows of a tested group
+        (default 3)
+        correction: multiple testing correction of the p-values
+        (see adjust_p_values, default 'fdr_bh')
+        alpha: significance level (default 0.05)
+
+    Returns:
+        results: DataFrame with one row per group (see
+        print_tests_table) and the columns group_col, n, statistic
+        (correlation coefficient), p_val, p_adj, reject,
+        statistic_name and null_hyp
+
+    """
+    groups, n, sums, cross, _ = _sufficient_statistics(df, group_col, [x_col, y_col], sep)
+    cov_xx = cross[:, 0, 0] - sums[:, 0]**2/np.maximum(n, 1)
+    cov_yy = cross[:, 1, 1] - sums[:, 1]**2/np.maximum(n, 1)
+    cov_xy = cross[:, 0, 1] - sums[:, 0]*sums[:, 1]/np.maximum(n, 1)
+    tested = (n >= min_count) & (cov_xx > 0) & (cov_yy > 0)
+
+    r = np.full(len(groups), np.nan)
+    r[tested] = np.clip(cov_xy[tested]/np.sqrt(cov_xx[tested]*cov_yy[tested]), -1, 1)
+    # Same p-value as pearsonr, from the t statistic with n - 2 degrees of freedom
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = r*np.sqrt((n - 2)/(1 - r**2))
+    p_val = 2*stats.t.sf(np.abs(t), n - 2)
+    return _results_table(group_col, groups, {"n": n, "statistic": r}, p_val, correction, alpha,
+                          'Pearson correlation', 'Features are not correlated')
+
+def group_mean_tests(df, group_col, metric, reference=None, test='t', equal_var=True, sep=None, min_count=2,
+                     correction='fdr_bh', alpha=0.05):
+    """
+    Test, for every group of a DataFrame at once, whether the mean
+    of metric in the group differs from the mean in the rest of the
+    rows (or in a reference group), from sums accumulated in a
+    single pass. Rows with a missing metric are ignored.
+
+    Args:
+        df: Pandas DataFrame
+        group_col: column defining the groups (e.g. primary
+        company, genres)
+        metric: column whose means are compared
+        reference: group to compare the other groups to (default
+        None, i.e. each group is compared to the rest of the rows)
+        test: 't' for ttest_ind, 'z' for the z-test of statsmodels
+        (ztest with pooled variance) (default 't')
+        equal_var: False for Welch's t-test (default True)
+        sep: separator of the values of group_col if they are
+        lists, a row then belongs to the group of each of its
+        values (default None)
+        min_count: minimum number of rows on each side of a test
+        (default 2)
+        correction: multiple testing correction of the p-values
+        (see adjust_p_values, default 'fdr_bh')
+        alpha: significance level (default 0.05)
+
+    Returns:
+        results: DataFrame with one row per tested group (see
+        print_tests_table) and the columns group_col, n, n_other,
+        mean, mean_other, statistic, df, p_val, p_adj, reject,
+        statistic_name and null_hyp
+
+    """
+    if test not in ['t', 'z']:
+        raise Exception("test must be 't' or 'z'")
+    groups, n, sums, cross, total = _sufficient_statistics(df, group_col, [metric], sep)
+    sums, squares = sums[:, 0], cross[:, 0, 0]
+    if reference is None:
+        n_other, sums_other, squares_other = total[0] - n, total[1][0] - sums, total[2][0, 0] - squares
+        compared = np.ones(len(groups), dtype=bool)
+    else:
+        if reference not in groups:
+            raise Exception(reference, "is not a group of", group_col)
+        position = groups.get_loc(reference)
+        n_other, sums_other, squares_other = n[position], sums[position], squares[position]
+        compared = np.arange(len(groups)) != position
+
+    mean, mean_other = sums/np.maximum(n, 1), sums_other/np.maximum(n_other, 1)
+    var = (squares - sums*mean)/np.maximum(n - 1, 1)
+    var_other = (squares_other - sums_other*mean_other)/np.maximum(n_other - 1, 1)
+    tested = compared & (n >= min_count) & (n_other >= min_count)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if equal_var or test == 'z':
+            dof = (n + n_other - 2).astype(float)
+            pooled = ((n - 1)*var + (n_other - 1)*var_other)/dof
+            statistic = (mean - mean_other)/np.sqrt(pooled*(1/n + 1/n_other))
+        else:
+            se2, se2_other = var/n, var_other/n_other
+            dof = (se2 + se2_other)**2/(se2**2/(n - 1) + se2_other**2/(n_other - 1))
+            statistic = (mean - mean_other)/np.sqrt(se2 + se2_other)
+    statistic, dof = np.where(tested, statistic, np.nan), np.where(tested, dof, np.nan)
+    p_val = 2*(stats.norm.sf(np.abs(statistic)) if test == 'z' else stats.t.sf(np.abs(statistic), dof))
+
+    columns = {"n": n, "n_other": np.broadcast_to(n_other, n.shape), "mean": _restore_mean(mean, total),
+               "mean_other": _restore_mean(np.broadcast_to(mean_other, mean.shape), total),
+               "statistic": statistic, "df": dof}
+    other = "the other rows" if reference is None else str(reference)
+    results = _results_table(group_col, groups, columns, p_val, correction, alpha,
+                             ('T' if test == 't' else 'Z') + '-statistic',
+                             f'The mean of {metric} is the same as in {other}', compared)
+    return results
+
+def adjust_p_values(p_values, method='fdr_bh'):
+    """
+    Correct p-values for multiple testing. Missing p-values are
+    ignored and stay missing.
+
+    Args:
+        p_values: array of p-values
+        method: 'bonferroni', 'holm', 'fdr_bh' (Benjamini-Hochberg)
+        or None for no correction (default 'fdr_bh')
+
+    Returns:
+        p_adj: numpy array of corrected p-values
+
+    """
+    p_values = np.asarray(p_values, dtype=float)
+    p_adj = p_values.copy()
+    valid = ~np.isnan(p_values)
+    p, m = p_values[valid], valid.sum()
+    if method is None or m == 0:
+        return p_adj
+    if method == 'bonferroni':
+        adjusted = p*m
+    elif method == 'holm':
+        order = np.argsort(p, kind='stable')
+        adjusted = np.empty(m)
+        adjusted[order] = np.maximum.accumulate(p[order]*(m - np.arange(m)))
+    elif method == 'fdr_bh':
+        order = np.argsort(p, kind='stable')[::-1]
+        adjusted = np.empty(m)
+        adjusted[order] = np.minimum.accumulate(p[order]*m/np.arange(m, 0, -1))
+    else:
+        raise Exception("Unknown correction method", method)
+    p_adj[valid] = np.minimum(adjusted, 1)
+    return p_adj
+
+def print_tests_table(results, alpha=0.05, adjusted=True):
+    """
+    Print each row of a table of tests with print_tests_results.
+
+    Args:
+        results: DataFrame returned by group_pearson or
+        group_mean_tests
+        alpha: significance level (default 0.05)
+        adjusted: True to use the corrected p-values, False for
+        the raw ones (default True)
+
+    """
+    group_col = results.columns[0]
+    for _, row in results.iterrows():
+        print(f"{group_col} = {row[group_col]} ({row['n']} rows):")
+        print_tests_results(row['statistic'], row['p_adj'] if adjusted else row['p_val'], row['statistic_name'],
+                            row['null_hyp'], alpha)
+        print()
+
+def _sufficient_statistics(df, group_col, columns, sep):
+    # Number of rows, sums and sums of products of the columns for each group (rows with missing values are
+    # dropped), and the same statistics over all the rows. Values are centered on their mean to limit cancellations
+    values = df[columns].to_numpy(dtype=float, na_value=np.nan)
+    keys = df[group_col]
+    valid = ~np.isnan(values).any(axis=1) & keys.notna().to_numpy()
+    values, keys = values[valid], keys[valid]
+    center = values.mean(axis=0) if len(values) > 0 else np.zeros(len(columns))
+    values = values - center
+    products = (values[:, :, None]*values[:, None, :]).reshape(len(values), -1)
+    total = (len(values), values.sum(axis=0), products.sum(axis=0).reshape(len(columns), len(columns)), center)
+
+    if sep is None:
+        codes, groups = pd.factorize(keys, sort=True)
+        rows = np.arange(len(codes))
+    else:
+        # A row is counted once per distinct value of its list
+        lists = keys.astype(str).str.split(sep)
+        tokens = lists.explode()
+        rows = np.repeat(np.arange(len(keys)), lists.str.len().to_numpy())
+        codes, groups = pd.factorize(tokens.to_numpy(), sort=True)
+        _, first = np.unique(rows*max(len(groups), 1) + codes, return_index=True)
+        rows, codes = rows[first], codes[first]
+    groups = pd.Index(groups, name=group_col)
+
+    n = np.bincount(codes, minlength=len(groups))
+    sums = np.column_stack([np.bincount(codes, weights=values[rows, i], minlength=len(groups))
+                            for i in range(len(columns))])
+    cross = np.column_stack([np.bincount(codes, weights=products[rows, i], minlength=len(groups))
+                             for i in range(products.shape[1])]).reshape(len(groups), len(columns), len(columns))
+    return groups, n, sums, cross, total
+
+def _restore_mean(mean, total):
+    # Mean of the original (not centered) values
+    return mean + total[3][0]
+
+def _results_table(group_col, groups, columns, p_val, correction, alpha, statistic_name, null_hyp, kept=None):
+    # Tidy table of the tests, with the corrected p-values
+    results = pd.DataFrame({group_col: groups, **columns})
+    results["p_val"] = p_val
+    if kept is not None:
+        results = results[kept].reset_index(drop=True)
+    results["p_adj"] = adjust_p_values(results["p_val"].to_numpy(), correction)
+    results["reject"] = results["p_adj"] < alpha
+    results["statistic_name"] = statistic_name
+    results["null_hyp"] = null_hyp
+    return results